@@ -1,40 +1,78 @@
-from dash import Dash, dcc, html, Input, Output
+from dash import Dash, dcc, html, Input, Output, State, ctx, Patch, ClientsideFunction, no_update
+from dash.exceptions import PreventUpdate
+from flask import jsonify
 import dash_bootstrap_components as dbc
-import plotly.express as px
-import pandas as pd
 import numpy as np
-from urllib.request import urlopen
-import json
-
-with urlopen('https://raw.githubusercontent.com/plotly/datasets/master/geojson-counties-fips.json') as response:
-    counties = json.load(response)
-
-# # load json county file
-# j = pd.read_json('data/processed/geojson-counties-fips.json')
-# counties = {
-#     'type': 'FeatureCollection',
-#     'features': j['features'].to_list()
-# }
+import os
+import uuid
+from src.counties import load_counties, county_geojson
+from src.filters import selected_states
+from src.cache import LRUCache, normalize_inputs
+from src.lod import POINT_BUDGET
+from src.spatial import parse_viewport, with_margin, in_bounds
+from src.figures import ScatterFigure, HeatmapFigure
+from src.serialize import configure_json
+from src.columnar import CLIENTSIDE, encode_columns
+from src.partitions import BridgeData
+from src.jobs import JobQueue, JobDropped
+from src.metrics import Metrics
+from src.profiling import profiled
+from src.history import HistoryStore, county_change
+
+# load the county geometry levels drawn by the heatmap (written by src/counties.py)
+counties = load_counties()
+
+# callback responses are encoded with orjson when available
+configure_json()
 
 app = Dash(__name__, external_stylesheets=[dbc.themes.LUX])
 server = app.server 
 
-# import bridge dataframe
-df = pd.read_csv('https://raw.githubusercontent.com/austin-shih/bridgemap_data/main/data/processed/nbi_clean.csv', 
-                        dtype = {"eval_rating_v":'category', "route_type":"category", 'eval_rating': np.int8, 'deck_condition': np.int8,
-                                   'superstructure_condition': np.int8, 'substructure_condition': np.int8, 'fips': np.int32,
-                                   'year_built': np.int16, 'num_span': np.int16, 'max_span': np.float16, 'bridge_length':np.float32,
-                                   'bridge_width': np.float16})
-
-# df = pd.read_csv('data/processed/nbi_clean.csv')
-# change county FIPS to string and pad string
-df['fips'] = df['fips'].map(str)
-df['fips'] = df['fips'].str.zfill(5)
-state = np.append(df['state_name'].unique(), 'All')             # initial state options
-route = np.append(df['route_type'].unique(), 'All')             # initial route options
-route_num = np.append(df['route_num'].unique(), 'All')          # initial route number options
-bridge_type = np.append(df['bridge_type'].unique(), 'All')      # initial bridge type options
-bridge_mat = np.append(df['bridge_material'].unique(), 'All')   # initial bridge material options
+# heatmap layout and colorbar built once
+heatmap = HeatmapFigure()
+
+# scatter layout of the national county clusters of partitioned data
+national_scatter = ScatterFigure()
+
+# most states whose bridges are loaded for a national scatter view, more are drawn as county clusters
+VIEW_STATES = int(os.environ.get('BRIDGEMAP_VIEW_STATES', 4))
+
+# bytes held by a cached selection: its row positions and county summary
+def selection_bytes(selection):
+    rows = selection.get('rows')
+    return (rows.nbytes if rows is not None else 0) + int(selection['summary'].memory_usage(deep=True).sum())
+
+# memoized filter results shared by both map callbacks, bounded by entries and by megabytes
+selection_cache = LRUCache(int(os.environ.get('BRIDGEMAP_CACHE_SIZE', 64)),
+                           int(float(os.environ.get('BRIDGEMAP_CACHE_MB', 64)) * 1e6), selection_bytes)
+
+# map callbacks run as background jobs, superseded jobs of a session are cancelled or dropped
+jobs = JobQueue()
+
+# per-stage callback timings, served at /metrics and in Server-Timing headers
+metrics = Metrics()
+
+# open the national summary and state partitions, cached selections are dropped on reload
+def load_data():
+    global data, history
+
+    # states are loaded and indexed on first use; client-side mode sends the whole table to the
+    # browser so it loads it up front
+    data = BridgeData(partitioned=not CLIENTSIDE)
+
+    # earlier releases, read from the partitioned history store per query
+    history = HistoryStore()
+    selection_cache.clear()
+
+load_data()
+state = np.append(data.options['state_name'], 'All')             # initial state options
+route = np.append(data.options['route_type'], 'All')             # initial route options
+bridge_type = np.append(data.options['bridge_type'], 'All')      # initial bridge type options
+bridge_mat = np.append(data.options['bridge_material'], 'All')   # initial bridge material options
+release = [{'label': 'Current (January 2023)', 'value': 'current'}] + \
+          [{'label': str(r), 'value': r} for r in history.releases]   # release options
+compare = [{'label': 'None', 'value': 'None'}] + \
+          [{'label': str(r), 'value': r} for r in history.releases]   # base release options of the change view
 
 # function to update length slide to log scale
 def transform_value(value):
@@ -75,7 +113,7 @@ row29 = html.Tr([html.Td("1"), html.Td("This value of rating code not used")])
 row20 = html.Tr([html.Td("0"), html.Td("Bridge closed")])
 table_body2 = [html.Tbody([row21, row22, row23, row24, row25, row26, row27, row28, row29, row20])]
 
-app.layout = dbc.Container([
+layout = dbc.Container([
     html.H1("US Highway Bridge Map", style={'textAlign': 'start'}),
     html.P("Dashboard to Visualize US Interstate, Numbered, and State highway bridges from the National Bridge Inventory Database", 
            style={'textAlign': 'start'}),
@@ -99,7 +137,7 @@ app.layout = dbc.Container([
                     # dropdown for highway number
                     html.Br(),
                     html.Label('Highway Number'),
-                    dcc.Dropdown(route_num, 'All', id='hwy_num2'),
+                    dcc.Dropdown(['All'], 'All', id='hwy_num2'),
                     # dropdown for bridge type
                     html.Br(),
                     html.Label('Bridge Type'),
@@ -148,6 +186,8 @@ app.layout = dbc.Container([
                     html.Br(),
                     html.H4("Highway Bridges Scatterplot (bubble size by length)", style={'textAlign': 'start'}),
                     dcc.Graph(id='us_map_scatter', figure={}, style={'height':'70vh'}),
+                    dcc.Store(id='scatter_view'),
+                    dcc.Store(id='scatter_render'),
                     html.Div('Data accessed January 13, 2023. Latest version can be found below:', style={'font-size': 12}),
                     dcc.Link(html.A('USDOT BTS'), id='data_link2',  href="https://geodata.bts.gov/datasets/national-bridge-inventory/about", style={'font-size': 12})
                 ], width=9, style={"height": "100%"})  
@@ -161,6 +201,13 @@ app.layout = dbc.Container([
                     html.Br(),
                     html.Div(id='bridge_count1'),
                     html.Div(id='eval_avg1'),
+                    # dropdowns for the release shown and the release the county ratings are compared with
+                    html.Br(),
+                    html.Label('Release'),
+                    dcc.Dropdown(release, 'current', id='release_sel1', clearable=False, disabled=CLIENTSIDE),
+                    html.Br(),
+                    html.Label('Rating change since release'),
+                    dcc.Dropdown(compare, 'None', id='compare_sel1', clearable=False, disabled=CLIENTSIDE),
                     # dropdown for states
                     html.Br(),
                     html.Label('State'),
@@ -172,7 +219,7 @@ app.layout = dbc.Container([
                     # dropdown for highway number
                     html.Br(),
                     html.Label('Highway Number'),
-                    dcc.Dropdown(route_num, 'All', id='hwy_num1'),
+                    dcc.Dropdown(['All'], 'All', id='hwy_num1'),
                     # dropdown for bridge type
                     html.Br(),
                     html.Label('Bridge Type'),
@@ -221,6 +268,10 @@ app.layout = dbc.Container([
                     html.Br(),
                     html.H4('Mean Highway Bridge Evaluation Rating by County', style={'textAlign': 'start'}),
                     dcc.Graph(id='us_map_heatmap', figure={}, style={'height':'70vh'}),
+                    dcc.Store(id='heatmap_render'),
+                    # client-side mode: filter columns shipped once with the layout, geometry from the server
+                    dcc.Store(id='heatmap_columns', data=encode_columns(data.national.df, data.national.engine, data.national.cube) if CLIENTSIDE else None),
+                    dcc.Store(id='heatmap_geometry'),
                     html.Div('Data accessed January 13, 2023. Latest version can be found below:', style={'font-size': 12}),
                     dcc.Link(html.A('USDOT BTS'), id='data_link1',  href="https://geodata.bts.gov/datasets/national-bridge-inventory/about", style={'font-size': 12})
                 ], width=9, style={"height": "80%"})  
@@ -258,70 +309,173 @@ app.layout = dbc.Container([
     ])
 ])
 
+# every page load gets its own session id, background jobs are keyed by session and output
+def serve_layout():
+    return html.Div([dcc.Store(id='session_id', data=str(uuid.uuid4())), layout])
+
+app.layout = serve_layout
+
+# background job and filter cache statistics
+@server.route('/stats')
+def stats():
+    return jsonify({'jobs': jobs.stats(), 'cache': selection_cache.stats(), 'states': data.stats()})
+
+# statistics that only go up, exported as prometheus counters
+JOB_COUNTERS = ('submitted', 'completed', 'cancelled', 'dropped', 'failed')
+CACHE_COUNTERS = ('hits', 'misses')
+
+# job queue, filter cache and state cache statistics {name: (help, value)}, counters when counter
+def metric_values(counter):
+    values = {}
+    for prefix, help, stats, counters in (('jobs', 'Background job queue', jobs.stats(), JOB_COUNTERS),
+                                          ('cache', 'Selection cache', selection_cache.stats(), CACHE_COUNTERS),
+                                          ('states', 'Loaded state cache', data.tables.stats(), CACHE_COUNTERS)):
+        for k, v in stats.items():
+            if (k in counters) == counter:
+                name = 'bridgemap_{}_{}{}'.format(prefix, k, '_total' if counter else '')
+                values[name] = ('{} {}'.format(help, k), v)
+    return values
+
+metrics.instrument(server, lambda: metric_values(False), lambda: metric_values(True))
+
+# filter bridges and summarize by county, memoized on the normalized callback inputs.
+# The summary comes from the county cubes of the selected states when the sliders are at their full
+# range and no highway number is selected (national selections of partitioned data use the national
+# summary, or a scan of the partitions); otherwise the filter engine selects the rows, which are
+# summarized by county. The row positions are only kept when a callback needs the bridges
+def select_bridges(state, route, b_type, year, length_range, span_num, eval, hwy_num, with_rows=False):
+    key = normalize_inputs(state, route, b_type, year, length_range, span_num, eval, hwy_num)
+
+    # slider ranges in data units (length slider is log scale)
+    low_len, high_len = [transform_value(v) for v in length_range]
+    ranges = (tuple(year), (low_len, high_len), tuple(span_num), tuple(eval))
+
+    selection = selection_cache.get(key)
+    if selection is None:
+        rows = None
+        with metrics.stage('load'):
+            view = data.view(state)
+        with metrics.stage('filter'):
+            summary = (view.summary if view is not None else data.summary.query)(state, route, b_type, *ranges, hwy_num)
+            if summary is None and view is not None:
+                rows = view.query(state, route, b_type, *ranges, hwy_num)
+        if summary is not None:
+            df_sum, count = summary
+        elif view is None:
+            with metrics.stage('scan'):
+                df_sum, count = data.scan_summary(state, route, b_type, *ranges, hwy_num)
+        else:
+            with metrics.stage('aggregate'):
+                df_sum, count = view.summarize(rows)
+        metrics.count('selected', count)
+        avg_total = df_sum['eval_rating'].mean()
+
+        selection = {
+            'rows': rows,
+            'summary': df_sum,
+            'count': count,
+            'count_text': 'Number of Bridges Selected: {}'.format(count),
+            'length_text': 'Selected length range: [{:0.2f}, {:0.2f}]'.format(low_len, high_len),
+            'mean_text': 'Mean evaluation rating: {:0.2f}'.format(avg_total)
+        }
+        selection_cache.put(key, selection)
+
+    # rows of the selected states, a national selection of partitioned data has none
+    if with_rows and selection['rows'] is None:
+        with metrics.stage('load'):
+            view = data.view(state)
+        if view is not None:
+            with metrics.stage('filter'):
+                selection['rows'] = view.query(state, route, b_type, *ranges, hwy_num)
+            # store it again so the cache counts the bytes of the rows
+            selection_cache.put(key, selection)
+    return selection
+
+# county summary of a release, or the change of the county ratings since a base release, memoized
+# like select_bridges. The current release is the loaded dataset, earlier releases are read from the
+# history store
+def select_release(state, route, b_type, year, length_range, span_num, eval, hwy_num, release, base):
+    if release == 'current' and base == 'None':
+        return select_bridges(state, route, b_type, year, length_range, span_num, eval, hwy_num)
+    key = (release, base) + normalize_inputs(state, route, b_type, year, length_range, span_num, eval, hwy_num)
+
+    selection = selection_cache.get(key)
+    if selection is None:
+        low_len, high_len = [transform_value(v) for v in length_range]
+        ranges = (tuple(year), (low_len, high_len), tuple(span_num), tuple(eval))
+        if release == 'current':
+            current = select_bridges(state, route, b_type, year, length_range, span_num, eval, hwy_num)
+            df_sum, count = current['summary'], current['count']
+        else:
+            with metrics.stage('history'):
+                df_sum, count = history.county_summary(release, state, route, b_type, *ranges, hwy_num)
+            metrics.count('selected', count)
+        if base == 'None':
+            mean_text = 'Mean evaluation rating: {:0.2f}'.format(df_sum['eval_rating'].mean())
+        else:
+            with metrics.stage('history'):
+                base_sum = history.county_summary(base, state, route, b_type, *ranges, hwy_num)[0]
+                df_sum = county_change(df_sum, base_sum)
+            mean_text = 'Mean county rating change since {}: {:+0.2f}'.format(base, df_sum['eval_rating'].mean())
+
+        selection = {
+            'summary': df_sum,
+            'count': count,
+            'count_text': 'Number of Bridges Selected: {}'.format(count),
+            'length_text': 'Selected length range: [{:0.2f}, {:0.2f}]'.format(low_len, high_len),
+            'mean_text': mean_text
+        }
+        selection_cache.put(key, selection)
+    return selection
+
+# highway number options of the dropdown filters, loaded on demand and narrowed by the search text
 @app.callback(
-    Output('us_map_heatmap', 'figure'),
-    Output('bridge_count1', 'children'),
-    Output('bridge_length1', 'children'),
-    Output('eval_avg1', 'children'),
     Output('hwy_num1', 'options'),
+    Input('hwy_num1', 'search_value'),
     Input('state_sel1', 'value'),
     Input('highway_sel1', 'value'),
     Input('type_sel1', 'value'),
-    Input('year_slider1', 'value'),
-    Input('length_slider1', 'value'),
-    Input('span_slider1', 'value'),
-    Input('eval_slider1', 'value'),
-    Input('hwy_num1', 'value')
+    State('hwy_num1', 'value')
 )
-def update_heatmap(state, route, b_type, year, length_range, span_num, eval, hwy_num):
-    dff = df
+def update_hwy_options1(search, state, route, b_type, value):
+    return data.route_options.options(state, route, b_type, search, value)
 
-    # update length range
-    transformed_value_len = [transform_value(v) for v in length_range]
-    low_len = transformed_value_len[0]
-    high_len = transformed_value_len[1]
-
-    # update span range
-    low_span = span_num[0]
-    high_span = span_num[1]
-
-    # update eval rating
-    low_eval = eval[0]
-    high_eval = eval[1]
-
-    # update year range
-    low_year = year[0]
-    high_year = year[1]
-
-    # filter dataframe
-    if state == 'All':
-        pass
-    elif not state:
-        pass
-    elif ('All' in state):
-        pass
-    else:
-        dff = dff[dff['state_name'].isin(state)]
-    if route != 'All':
-        dff = dff[dff['route_type'] == route]
-    if b_type != 'All':
-        dff = dff[dff['bridge_type'] == b_type]
-    dff = dff.query('year_built >= @low_year & year_built <= @high_year')
-    dff = dff.query('bridge_length >= @low_len & bridge_length <= @high_len')
-    dff = dff.query('num_span >= @low_span & num_span <= @high_span')
-    dff = dff.query('eval_rating >= @low_eval & eval_rating <= @high_eval')
-
-    # update route number dropdown
-    route_list = np.append(dff['route_num'].unique(), 'All')
-    if hwy_num == 'None':
-        pass
-    if hwy_num != 'All':
-        dff = dff[dff['route_num'] == hwy_num]
-    
-    # summary dff
-    df_sum = dff.drop(dff[(dff['eval_rating'] == -1)].index).loc[:, ('fips', 'state_abv', 'state_name', 'eval_rating', 'latitude', 'longitude')].groupby(['fips', 'state_abv', 'state_name'], as_index=False).mean()
-    df_sum['count'] = dff.loc[:,('fips', 'eval_rating')].groupby('fips', as_index=False).count().iloc[:,1].tolist()
-    avg_total = df_sum['eval_rating'].mean()
+@app.callback(
+    Output('hwy_num2', 'options'),
+    Input('hwy_num2', 'search_value'),
+    Input('state_sel2', 'value'),
+    Input('highway_sel2', 'value'),
+    Input('type_sel2', 'value'),
+    State('hwy_num2', 'value')
+)
+def update_hwy_options2(search, state, route, b_type, value):
+    return data.route_options.options(state, route, b_type, search, value)
+
+# county geometry of every county in the selected states, it does not depend on the other filters
+# so the browser keeps it while the filters change
+def heatmap_geometry(state, level):
+    states = selected_states(state)
+    fips = data.summary.fips[np.isin(data.summary.fips_state_name, states)] if states else data.summary.fips
+    return county_geojson(counties[level], fips)
+
+# key of the geometry held by the browser
+def geometry_key(state, level):
+    return '{}:{}'.format(level, ','.join(sorted(selected_states(state))))
+
+def update_heatmap(state, route, b_type, year, length_range, span_num, eval, hwy_num, release, base, rendered, session):
+    metrics.callback('heatmap')
+    try:
+        return jobs.run((session, 'us_map_heatmap'), render_heatmap,
+                        state, route, b_type, year, length_range, span_num, eval, hwy_num, release, base, rendered)
+    except JobDropped:
+        raise PreventUpdate
+
+# profiled in the job thread, tagged with the normalized filter inputs
+@profiled('heatmap', lambda *args: normalize_inputs(*args[:8]))
+def render_heatmap(state, route, b_type, year, length_range, span_num, eval, hwy_num, release, base, rendered):
+
+    selection = select_release(state, route, b_type, year, length_range, span_num, eval, hwy_num, release, base)
+    df_sum = selection['summary']
 
     # update figure zoom and location
     if state == 'All':
@@ -340,37 +494,84 @@ def update_heatmap(state, route, b_type, year, length_range, span_num, eval, hwy
         centre = {"lat": lat, "lon": long}
         zoom = 4
 
-    fig = px.choropleth_mapbox(df_sum, 
-                                geojson=counties, 
-                                locations='fips', 
-                                color='eval_rating',
-                                color_continuous_scale="RdBu",
-                                range_color=(0, 9),
-                                mapbox_style="carto-positron",
-                                zoom=zoom, 
-                                center = centre,
-                                hover_name='fips',
-                                hover_data=['state_name', 'eval_rating', 'count'],
-                                height = 700
+    # coarse county borders at national zoom, finer borders for state selections. The change view has
+    # its own color axis, so switching views sends the whole figure
+    level = 'coarse' if zoom == 3 else 'fine'
+    change = base != 'None'
+    key = geometry_key(state, level) + (':change' if change else '')
+
+    with metrics.stage('figure'):
+        if rendered == key:
+            # geometry and layout are already in the browser, only send the county values and view
+            fig = Patch()
+            for name, values in heatmap.arrays(df_sum).items():
+                fig['data'][0][name] = values
+            fig['layout']['mapbox']['center'] = centre
+            fig['layout']['mapbox']['zoom'] = zoom
+        else:
+            fig = heatmap.figure(df_sum, heatmap_geometry(state, level), centre, zoom, change)
+    metrics.count('counties', len(df_sum))
+
+    return fig, selection['count_text'], selection['length_text'], selection['mean_text'], key
+
+# server-side heatmap, or geometry only when the browser filters the heatmap
+if not CLIENTSIDE:
+    app.callback(
+        Output('us_map_heatmap', 'figure'),
+        Output('bridge_count1', 'children'),
+        Output('bridge_length1', 'children'),
+        Output('eval_avg1', 'children'),
+        Output('heatmap_render', 'data'),
+        Input('state_sel1', 'value'),
+        Input('highway_sel1', 'value'),
+        Input('type_sel1', 'value'),
+        Input('year_slider1', 'value'),
+        Input('length_slider1', 'value'),
+        Input('span_slider1', 'value'),
+        Input('eval_slider1', 'value'),
+        Input('hwy_num1', 'value'),
+        Input('release_sel1', 'value'),
+        Input('compare_sel1', 'value'),
+        State('heatmap_render', 'data'),
+        State('session_id', 'data')
+    )(update_heatmap)
+else:
+    app.clientside_callback(
+        ClientsideFunction(namespace='bridgemap', function_name='update_heatmap'),
+        Output('us_map_heatmap', 'figure'),
+        Output('bridge_count1', 'children'),
+        Output('bridge_length1', 'children'),
+        Output('eval_avg1', 'children'),
+        Input('state_sel1', 'value'),
+        Input('highway_sel1', 'value'),
+        Input('type_sel1', 'value'),
+        Input('year_slider1', 'value'),
+        Input('length_slider1', 'value'),
+        Input('span_slider1', 'value'),
+        Input('eval_slider1', 'value'),
+        Input('hwy_num1', 'value'),
+        Input('heatmap_geometry', 'data'),
+        State('heatmap_columns', 'data')
     )
 
-    fig.update_layout(
-        coloraxis_colorbar=dict(title="Bridge Evaluation Rate", 
-                                thicknessmode="pixels", 
-                                lenmode="pixels", 
-                                yanchor="top",y=1, 
-                                ticks="outside", 
-                                tickvals=[0,1,2,3,4,5,6,7,8,9],
-                                ticktext=['0-Closed', '1-N/A', 
-                                            '2-Intolerable, replacement', '3-Intolerable, corrective',
-                                            '4-Meets tolerable crit.', '5-Above tolerable crit.', '6-Equal min. crit.',
-                                            '7-Above min. crit.', '8-Equal desirable crit.', '9-Superior desirable crit.'],
-                                dtick=10
-                                ),
-        margin={"r":0,"t":60,"l":0,"b":0}
+    @app.callback(
+        Output('heatmap_geometry', 'data'),
+        Output('heatmap_render', 'data'),
+        Input('state_sel1', 'value'),
+        State('heatmap_render', 'data')
     )
-
-    return fig, 'Number of Bridges Selected: {}'.format(dff.shape[0]), 'Selected length range: [{:0.2f}, {:0.2f}]'.format(low_len, high_len), 'Mean evaluation rating: {:0.2f}'.format(avg_total), route_list
+    def update_heatmap_geometry(state, rendered):
+        zoom = 3 if state == 'All' or not state else 4
+        level = 'coarse' if zoom == 3 else 'fine'
+        key = geometry_key(state, level)
+        if rendered == key:
+            return no_update, no_update
+        geometry = {
+            'geojson': heatmap_geometry(state, level),
+            'layout': heatmap.layout,
+            'hovertemplate': heatmap.hovertemplate
+        }
+        return geometry, key
 
 
 @app.callback(
@@ -378,7 +579,8 @@ def update_heatmap(state, route, b_type, year, length_range, span_num, eval, hwy
     Output('bridge_count2', 'children'),
     Output('bridge_length2', 'children'),
     Output('eval_avg2', 'children'),
-    Output('hwy_num2', 'options'),
+    Output('scatter_view', 'data'),
+    Output('scatter_render', 'data'),
     Input('state_sel2', 'value'),
     Input('highway_sel2', 'value'),
     Input('type_sel2', 'value'),
@@ -386,119 +588,97 @@ def update_heatmap(state, route, b_type, year, length_range, span_num, eval, hwy
     Input('length_slider2', 'value'),
     Input('span_slider2', 'value'),
     Input('eval_slider2', 'value'),
-    Input('hwy_num2', 'value')
+    Input('hwy_num2', 'value'),
+    Input('us_map_scatter', 'relayoutData'),
+    State('scatter_view', 'data'),
+    State('scatter_render', 'data'),
+    State('session_id', 'data')
 )
-def update_scattermap(state, route, b_type, year, length_range, span_num, eval, hwy_num):
-    dff = df
-    # filter dataframe
-
-    # update length range
-    transformed_value_len = [transform_value(v) for v in length_range]
-    low_len = transformed_value_len[0]
-    high_len = transformed_value_len[1]
-
-    # update span range
-    low_span = span_num[0]
-    high_span = span_num[1]
-
-    # update eval rating
-    low_eval = eval[0]
-    high_eval = eval[1]
-
-    # update year range
-    low_year = year[0]
-    high_year = year[1]
-
-    # filter dataframe
-    if state == 'All':
-        pass
-    elif not state:
-        pass
-    elif ('All' in state):
-        pass
-    else:
-        dff = dff[dff['state_name'].isin(state)]
-    if route != 'All':
-        dff = dff[dff['route_type'] == route]
-    if b_type != 'All':
-        dff = dff[dff['bridge_type'] == b_type]
-    dff = dff.query('year_built >= @low_year & year_built <= @high_year')
-    dff = dff.query('bridge_length >= @low_len & bridge_length <= @high_len')
-    dff = dff.query('num_span >= @low_span & num_span <= @high_span')
-    dff = dff.query('eval_rating >= @low_eval & eval_rating <= @high_eval')
-
-    # update route number dropdown
-    route_list = np.append(dff['route_num'].unique(), 'All')
-    if hwy_num == 'None':
-        pass
-    if hwy_num != 'All':
-        dff = dff[dff['route_num'] == hwy_num]
-
-    # summary dff
-    df_sum = dff.drop(dff[(dff['eval_rating'] == -1)].index).loc[:, ('fips', 'state_abv', 'state_name', 'eval_rating', 'latitude', 'longitude')].groupby(['fips', 'state_abv', 'state_name'], as_index=False).mean()
-    df_sum['count'] = dff.loc[:,('fips', 'eval_rating')].groupby('fips', as_index=False).count().iloc[:,1].tolist()
-    avg_total = df_sum['eval_rating'].mean()
-
-    # update figure zoom and location
-    if state == 'All':
-        lat = 38
-        long = -95.7129
-        zoom = 3
-    elif not state:
-        lat = 38
-        long = -95.7129
+def update_scattermap(state, route, b_type, year, length_range, span_num, eval, hwy_num, relayout, view, rendered, session):
+    metrics.callback('scatter')
+    try:
+        return jobs.run((session, 'us_map_scatter'), render_scattermap,
+                        state, route, b_type, year, length_range, span_num, eval, hwy_num, relayout, view, rendered)
+    except JobDropped:
+        raise PreventUpdate
+
+@profiled('scatter', lambda *args: normalize_inputs(*args[:8]))
+def render_scattermap(state, route, b_type, year, length_range, span_num, eval, hwy_num, relayout, view, rendered):
+
+    selection = select_bridges(state, route, b_type, year, length_range, span_num, eval, hwy_num, with_rows=True)
+    df_sum = selection['summary']
+
+    # visible map extent, kept until the state selection recentres the map
+    revision = str(normalize_inputs(state, route, b_type, year, length_range, span_num, eval, hwy_num)[0])
+    if not view or view['revision'] != revision:
+        view = None
+    if ctx.triggered_id == 'us_map_scatter':
+        viewport = parse_viewport(relayout)
+        if viewport is not None:
+            view = dict(viewport, revision=revision)
+
+    # update figure zoom, the figure is centred on the plotted points
+    if state == 'All' or not state:
         zoom = 3
     else:
-        lat = df_sum['latitude'].mean()
-        long = df_sum['longitude'].mean()
         zoom = 4
 
-    # scatter plot
-    fig = px.scatter_mapbox(dff, 
-                            lat='latitude', lon='longitude', 
-                            size=dff['bridge_length']*50,
-                            size_max=30,
-                            hover_name="feature_intersect", 
-                            hover_data={'state_name': True,
-                                        'eval_rating': True, 
-                                        "eval_rating_v": True,
-                                        'deck_condition': True,
-                                        'superstructure_condition':True,
-                                        'substructure_condition': True, 
-                                        "bridge_material": True, 
-                                        "bridge_type": True,
-                                        'year_built': True,
-                                        'num_span':True,
-                                        'max_span':':.3f',
-                                        'bridge_length': ':.3f',
-                                        'bridge_width': ':.3f'},
-                            color='eval_rating',
-                            range_color = [0, 9],
-                            color_continuous_scale="rdbu", 
-                            opacity=1,
-                            zoom=zoom,
-                            height=700,
-                            mapbox_style="open-street-map"
-    )
-
-    fig.update_layout(
-        mapbox_style="open-street-map",
-        coloraxis_colorbar=dict(title="Bridge Evaluation Rate", 
-                                thicknessmode="pixels", 
-                                lenmode="pixels", 
-                                yanchor="top",y=1, 
-                                ticks="outside", 
-                                tickvals=[0,1,2,3,4,5,6,7,8,9],
-                                ticktext=['0-Failed', '1-"Imminent" Failure', 
-                                            '2-Critical', '3-Serious',
-                                            '4-Poor', '5-Fair', '6-Satisfactory',
-                                            '7-Good', '8-Very Good', '9-Excellent'],
-                                dtick=10
-                                ),
-        margin={"r":0,"t":50,"l":0,"b":0}
-    )
-
-    return fig, 'Number of Bridges Selected: {}'.format(dff.shape[0]), 'Selected length range: [{:0.2f}, {:0.2f}]'.format(low_len, high_len), 'Mean evaluation rating: {:0.2f}'.format(avg_total), route_list
+    # national selection of partitioned data: county clusters of the summary, the bridges of the
+    # states reaching into the map are loaded once few enough of them are visible
+    bridges = data.view(state)
+    if bridges is None:
+        clusters = df_sum
+        states = []
+        if view is not None:
+            with metrics.stage('viewport'):
+                clusters = clusters[in_bounds(clusters['latitude'], clusters['longitude'], with_margin(view))]
+                states = data.states_in(with_margin(view))
+        if 0 < len(states) <= VIEW_STATES:
+            with metrics.stage('load'):
+                bridges = data.view(states)
+            rows = select_bridges(states, route, b_type, year, length_range, span_num, eval, hwy_num, with_rows=True)['rows']
+    else:
+        rows = selection['rows']
+    if view is not None:
+        zoom = view['zoom']
+
+    if bridges is None:
+        metrics.count('visible', int(clusters['count'].sum()))
+        with metrics.stage('figure'):
+            fig = national_scatter.clusters(clusters, zoom, revision)
+        metrics.count('plotted', len(clusters))
+    else:
+        # only send bridges inside the visible extent plus a margin
+        if view is not None:
+            with metrics.stage('viewport'):
+                rows = np.intersect1d(rows, bridges.viewport(*with_margin(view)), assume_unique=True)
+        metrics.count('visible', len(rows))
+
+        # figures reuse the prebuilt layout and only fill the selected arrays
+        if len(rows) > POINT_BUDGET:
+            # level of detail: bridges aggregated into grid cells above the point budget
+            with metrics.stage('aggregate'):
+                clusters = bridges.clusters(rows, zoom)
+            with metrics.stage('figure'):
+                fig = bridges.scatter.clusters(clusters, zoom, revision)
+            metrics.count('plotted', len(clusters))
+        else:
+            with metrics.stage('figure'):
+                fig = bridges.points(rows, zoom, revision)
+            metrics.count('plotted', len(rows))
+
+    # after the first render only the trace arrays are sent, the layout is kept in the browser
+    # and only recentred when the state selection changes
+    if rendered is not None:
+        patch = Patch()
+        patch['data'][0] = fig['data'][0]
+        if rendered != revision:
+            patch['layout']['mapbox']['center'] = fig['layout']['mapbox']['center']
+            patch['layout']['mapbox']['zoom'] = fig['layout']['mapbox']['zoom']
+            patch['layout']['uirevision'] = revision
+        fig = patch
+
+    return fig, selection['count_text'], selection['length_text'], selection['mean_text'], view, revision
 
 if __name__ == '__main__':
     app.run_server(debug=True)
@@ -0,0 +1,154 @@
+// Author: Austin Shih
+// Date: 18 Oct 2026
+
+// Client-side heatmap filtering (BRIDGEMAP_CLIENTSIDE=1).
+// The heatmap_columns store holds the filter columns as base64 typed arrays (src/columnar.py),
+// the heatmap_geometry store the county geometry and layout sent by the server.
+
+const TYPED_ARRAYS = {
+    i1: Int8Array, u1: Uint8Array, i2: Int16Array, u2: Uint16Array,
+    i4: Int32Array, u4: Uint32Array, f4: Float32Array, f8: Float64Array
+};
+
+const US_CENTRE = {lat: 38, lon: -95.7129};
+
+// decoded columns, kept per store object
+let decoded = null;
+let decodedFrom = null;
+
+// typed array from a {dtype, bdata} spec
+function decodeArray(spec) {
+    const bytes = Uint8Array.from(atob(spec.bdata), c => c.charCodeAt(0));
+    return new TYPED_ARRAYS[spec.dtype](bytes.buffer);
+}
+
+function decodeColumns(store) {
+    if (decodedFrom !== store) {
+        decoded = {};
+        for (const col in store.columns) {
+            decoded[col] = decodeArray(store.columns[col]);
+        }
+        decodedFrom = store;
+    }
+    return decoded;
+}
+
+// length slider to metres (log scale), as transform_value in app.py
+function transformValue(value) {
+    return value === 0 ? 0 : Math.pow(10, value);
+}
+
+// state dropdown value as a list of state names, empty for all states
+function selectedStates(state) {
+    if (typeof state === 'string') {
+        state = [state];
+    }
+    if (!state || !state.length || state.includes('All')) {
+        return [];
+    }
+    return state;
+}
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    bridgemap: {
+        update_heatmap: function(state, route, b_type, year, length_range, span_num, eval_range, hwy_num, geometry, store) {
+            const no_update = window.dash_clientside.no_update;
+            if (!geometry || !store) {
+                return [no_update, no_update, no_update, no_update];
+            }
+            const cols = decodeColumns(store);
+            const tables = store.tables;
+            const counties = store.counties;
+            const nCounties = counties.fips.length;
+
+            // dropdown filters as codes, -2 never matches and -1 matches every row
+            const code = (col, value) => {
+                const found = tables[col].indexOf(value);
+                return value === 'All' ? -1 : found === -1 ? -2 : found;
+            };
+            const routeCode = code('route_type', route);
+            const typeCode = code('bridge_type', b_type);
+            const hwyCode = code('route_num', hwy_num);
+            const states = selectedStates(state);
+            const countyIn = new Uint8Array(nCounties);
+            for (let c = 0; c < nCounties; c++) {
+                countyIn[c] = !states.length || states.includes(tables.state_name[counties.state[c]]) ? 1 : 0;
+            }
+
+            // slider bounds, float32 lengths are compared with float32 bounds
+            const lowLen = transformValue(length_range[0]);
+            const highLen = transformValue(length_range[1]);
+            const lenLow = Math.fround(lowLen), lenHigh = Math.fround(highLen);
+
+            // filter and aggregate by county in one pass
+            const count = new Float64Array(nCounties);
+            const rated = new Float64Array(nCounties);
+            const ratingSum = new Float64Array(nCounties);
+            let total = 0;
+            for (let i = 0; i < store.n_rows; i++) {
+                const c = cols.county[i];
+                if (!countyIn[c]
+                    || (routeCode !== -1 && cols.route_type[i] !== routeCode)
+                    || (typeCode !== -1 && cols.bridge_type[i] !== typeCode)
+                    || cols.year_built[i] < year[0] || cols.year_built[i] > year[1]
+                    || cols.bridge_length[i] < lenLow || cols.bridge_length[i] > lenHigh
+                    || cols.num_span[i] < span_num[0] || cols.num_span[i] > span_num[1]
+                    || cols.eval_rating[i] < eval_range[0] || cols.eval_rating[i] > eval_range[1]
+                    || (hwyCode !== -1 && cols.route_num[i] !== hwyCode)) {
+                    continue;
+                }
+                total++;
+                count[c]++;
+                if (cols.eval_rating[i] !== -1) {
+                    rated[c]++;
+                    ratingSum[c] += cols.eval_rating[i];
+                }
+            }
+
+            // county summary of the counties with rated bridges
+            const locations = [], z = [], customdata = [];
+            let latSum = 0, lonSum = 0;
+            for (let c = 0; c < nCounties; c++) {
+                if (rated[c] > 0) {
+                    locations.push(counties.fips[c]);
+                    z.push(ratingSum[c] / rated[c]);
+                    customdata.push([tables.state_name[counties.state[c]], String(count[c])]);
+                    latSum += counties.latitude[c];
+                    lonSum += counties.longitude[c];
+                }
+            }
+            const mean = z.length ? z.reduce((a, b) => a + b, 0) / z.length : NaN;
+
+            // figure zoom and location
+            let centre = US_CENTRE, zoom = 3;
+            if (state !== 'All' && state && state.length) {
+                centre = {lat: latSum / locations.length, lon: lonSum / locations.length};
+                zoom = 4;
+            }
+            const layout = Object.assign({}, geometry.layout, {
+                mapbox: Object.assign({}, geometry.layout.mapbox, {center: centre, zoom: zoom})
+            });
+            const figure = {
+                data: [{
+                    type: 'choroplethmapbox',
+                    geojson: geometry.geojson,
+                    locations: locations,
+                    z: z,
+                    hovertext: locations,
+                    customdata: customdata,
+                    coloraxis: 'coloraxis',
+                    hovertemplate: geometry.hovertemplate,
+                    subplot: 'mapbox'
+                }],
+                layout: layout
+            };
+
+            return [
+                figure,
+                'Number of Bridges Selected: ' + total,
+                'Selected length range: [' + lowLen.toFixed(2) + ', ' + highLen.toFixed(2) + ']',
+                'Mean evaluation rating: ' + (isNaN(mean) ? 'nan' : mean.toFixed(2))
+            ];
+        }
+    }
+});
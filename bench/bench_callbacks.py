@@ -0,0 +1,178 @@
+# Author: Austin Shih
+# Date: 18 Oct 2026
+
+"""Times the map callback stages (filter, aggregation, figure build, json serialization) on synthetic data
+Usage: bench/bench_callbacks.py [--rows=<rows>] [--repeat=<repeat>] [--out_file=<out_file>] [--compare=<compare>]
+Options:
+--rows=<rows>            Comma separated table sizes [default: 100000,600000,6000000]
+--repeat=<repeat>        Timed runs per stage, the fastest is kept [default: 5]
+--out_file=<out_file>    Path of the json results, defaults to bench/results/callbacks_<commit>.json
+--compare=<compare>      Path of earlier json results to compare against
+"""
+
+# python bench/bench_callbacks.py --rows=100000,600000 --compare=bench/results/callbacks_0bb3b29.json
+
+# Every selection is timed on the components used by app.py without the selection cache:
+#   heatmap: filter (county cube, or filter engine for moved sliders and highway numbers), aggregation
+#            (county summary of the selected rows), figure (choropleth) and serialize (json)
+#   scatter: filter (filter engine), aggregation (grid clusters above the point budget), figure
+#            and serialize
+# The cleared and unknown highway number selections are regression checks: an empty selection has to
+# stay an integer row selection and render an empty map.
+
+import os
+import sys
+import json
+import time
+import platform
+import subprocess
+from datetime import datetime
+import numpy as np
+from docopt import docopt
+from plotly.io.json import to_json_plotly
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.filters import FilterEngine, selected_states
+from src.cube import CountyCube
+from src.figures import ScatterFigure, HeatmapFigure, US_CENTRE
+from src.lod import POINT_BUDGET, cluster_bridges
+from src.options import RouteOptions
+from src.counties import index_features, county_geojson
+from src.serialize import configure_json
+from bench.synthetic import make_bridges, make_counties
+
+# representative selections: name and the 8 callback inputs (length slider in log10 metres)
+SELECTIONS = [
+    ('national state highways', ('All', 'State highway', 'All', [1697, 2023], [0, 5], [0, 771], [-1, 9], 'All')),
+    ('national interstates', ('All', 'Interstate highway', 'All', [1697, 2023], [0, 5], [0, 771], [-1, 9], 'All')),
+    ('national all', ('All', 'All', 'All', [1697, 2023], [0, 5], [0, 771], [-1, 9], 'All')),
+    ('texas slab bridges', (['Texas'], 'All', 'Slab', [1697, 2023], [0, 5], [0, 771], [-1, 9], 'All')),
+    ('west coast sliders', (['California', 'Oregon', 'Washington'], 'All', 'All', [1950, 1989], [1, 3], [1, 9], [3, 7], 'All')),
+    ('national slider drag', ('All', 'All', 'All', [1923, 1987], [0.37, 2.81], [0, 771], [-1, 9], 'All')),
+    ('texas interstate 35', (['Texas'], 'Interstate highway', 'All', [1697, 2023], [0, 5], [0, 771], [-1, 9], 'I- 35')),
+    ('texas cleared hwy number', (['Texas'], 'All', 'All', [1697, 2023], [0, 5], [0, 771], [-1, 9], None)),
+    ('texas unknown hwy number', (['Texas'], 'All', 'All', [1697, 2023], [0, 5], [0, 771], [-1, 9], 'no such route'))
+]
+
+# fastest of repeated calls in milliseconds, and the last result
+def timed(fn, repeat):
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+# slider values in data units, as select_bridges in app.py
+def data_ranges(year, length_range, span_num, eval):
+    length = tuple(0 if v == 0 else 10 ** v for v in length_range)
+    return (tuple(year), length, tuple(span_num), tuple(eval))
+
+def bench_size(n, repeat):
+    df = make_bridges(n)
+    features = index_features(make_counties(df))
+
+    startup = {}
+    startup['engine'], engine = timed(lambda: FilterEngine(df), 1)
+    startup['cube'], cube = timed(lambda: CountyCube(df), 1)
+    startup['scatter'], scatter = timed(lambda: ScatterFigure(df), 1)
+    startup['options'], options = timed(lambda: RouteOptions(df), 1)
+    heatmap = HeatmapFigure()
+
+    selections = []
+    for name, (state, route, b_type, year, length_range, span_num, eval, hwy_num) in SELECTIONS:
+        ranges = data_ranges(year, length_range, span_num, eval)
+        result = {'name': name}
+
+        # heatmap
+        stages = {}
+        stages['filter'], summary = timed(lambda: cube.query(state, route, b_type, *ranges, hwy_num), repeat)
+        if summary is None:
+            stages['filter'], rows = timed(lambda: engine.query(state, route, b_type, *ranges, hwy_num), repeat)
+            stages['aggregation'], summary = timed(lambda: cube.summarize(rows), repeat)
+        else:
+            stages['aggregation'] = 0.0
+        df_sum, count = summary
+        states = selected_states(state)
+        fips = cube.fips[np.isin(cube.fips_state_name, states)] if states else cube.fips
+        zoom = 4 if states else 3
+        centre = {'lat': df_sum['latitude'].mean(), 'lon': df_sum['longitude'].mean()} if states else US_CENTRE
+        stages['figure'], fig = timed(lambda: heatmap.figure(df_sum, county_geojson(features, fips), centre, zoom), repeat)
+        stages['serialize'], payload = timed(lambda: to_json_plotly(fig), repeat)
+        result['heatmap'] = {'selected': count, 'counties': len(df_sum), 'bytes': len(payload), 'ms': stages}
+
+        # scatter at the national or state zoom, without a viewport
+        stages = {}
+        stages['filter'], rows = timed(lambda: engine.query(state, route, b_type, *ranges, hwy_num), repeat)
+        assert rows.dtype.kind == 'i', 'rows of {} selected as {}'.format(name, rows.dtype)
+        if len(rows) > POINT_BUDGET:
+            stages['aggregation'], clusters = timed(lambda: cluster_bridges(df, rows, zoom), repeat)
+            stages['figure'], fig = timed(lambda: scatter.clusters(clusters, zoom), repeat)
+            points = len(clusters)
+        else:
+            stages['aggregation'] = 0.0
+            stages['figure'], fig = timed(lambda: scatter.points(rows, zoom), repeat)
+            points = len(rows)
+        stages['serialize'], payload = timed(lambda: to_json_plotly(fig), repeat)
+        result['scatter'] = {'selected': len(rows), 'points': points, 'bytes': len(payload), 'ms': stages}
+
+        selections.append(result)
+    return {'rows': n, 'startup_ms': startup, 'selections': selections}
+
+# short hash of the checked out commit, None outside a git checkout
+def git_commit():
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)))
+        return out.stdout.strip() or None
+    except OSError:
+        return None
+
+# stage totals per size, view and selection
+def stage_totals(results):
+    return {(size['rows'], view, s['name']): sum(s[view]['ms'].values())
+            for size in results['sizes'] for s in size['selections'] for view in ('heatmap', 'scatter')}
+
+def print_results(results, previous=None):
+    before = stage_totals(previous) if previous else {}
+    print('{:>9} {:<8} {:<26} {:>9} {:>9} {:>9} {:>9} {:>10} {:>9}'.format(
+        'rows', 'view', 'selection', 'filter', 'aggreg.', 'figure', 'json', 'bytes', 'vs prev'))
+    for size in results['sizes']:
+        for s in size['selections']:
+            for view in ('heatmap', 'scatter'):
+                ms = s[view]['ms']
+                key = (size['rows'], view, s['name'])
+                change = '{:>8.2f}x'.format(sum(ms.values()) / before[key]) if key in before else ''
+                print('{:>9} {:<8} {:<26} {:>9.2f} {:>9.2f} {:>9.2f} {:>9.2f} {:>10} {:>9}'.format(
+                    size['rows'], view, s['name'], ms['filter'], ms['aggregation'], ms['figure'], ms['serialize'],
+                    s[view]['bytes'], change))
+
+def main(rows, repeat, out_file, compare):
+    configure_json()
+    commit = git_commit()
+    results = {
+        'commit': commit,
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'point_budget': POINT_BUDGET,
+        'sizes': [bench_size(int(n), int(repeat)) for n in rows.split(',')]
+    }
+
+    previous = None
+    if compare:
+        with open(compare) as f:
+            previous = json.load(f)
+    print_results(results, previous)
+
+    out_file = out_file or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results',
+                                        'callbacks_{}.json'.format(commit or 'local'))
+    os.makedirs(os.path.dirname(out_file), exist_ok=True)
+    with open(out_file, 'w') as f:
+        json.dump(results, f, indent=1)
+    print('results written to {}'.format(out_file))
+
+if __name__ == "__main__":
+    opt = docopt(__doc__)
+    main(opt['--rows'], opt['--repeat'], opt['--out_file'], opt['--compare'])
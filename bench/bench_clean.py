@@ -0,0 +1,141 @@
+# Author: Austin Shih
+# Date: 18 Oct 2026
+
+"""Times the stages of the cleaning pipeline (read, route filter, decode, write) on the raw NBI file
+Usage: bench/bench_clean.py [--raw=<raw>] [--rows=<rows>] [--chunk_size=<chunk_size>] [--workers=<workers>] [--out_file=<out_file>] [--compare=<compare>]
+Options:
+--raw=<raw>                  Path of the raw NBI .csv file [default: data/raw/nbi_raw.csv]
+--rows=<rows>                Clean a synthetic raw file of this many bridges instead of --raw
+--chunk_size=<chunk_size>    Raw rows read and cleaned at a time [default: 100000]
+--workers=<workers>          Comma separated process counts of a parallel cleaning scaling run, e.g. 1,2,4,8
+--out_file=<out_file>        Path of the json results, defaults to bench/results/clean_<commit>.json
+--compare=<compare>          Path of earlier json results to compare against
+"""
+
+# python bench/bench_clean.py
+# python bench/bench_clean.py --rows=1000000 --compare=bench/results/clean_7c9aabb.json
+# python bench/bench_clean.py --rows=1000000 --workers=1,2,4,8
+
+# The stages are generators feeding each other, so the time spent pulling a chunk out of a stage
+# includes its upstream stages; the time of a stage is its cumulative time minus the upstream time.
+# The decode stage also formats the csv text of every chunk and types its rows, so a process pool runs
+# both in parallel.
+# The scaling run times the whole raw -> csv clean for every process count against a serial run and
+# checks that the parallel csv is byte for byte the serial one.
+
+import os
+import sys
+import json
+import time
+import hashlib
+import tempfile
+import platform
+from datetime import datetime
+from docopt import docopt
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.clean import REL_COLS, read_raw, select_routes, decode_chunks, write_chunks, clean_chunks
+from bench.bench_callbacks import git_commit
+from bench.synthetic import write_raw
+
+STAGES = ['read', 'select', 'decode', 'write']
+
+# pass chunks through and add the time spent producing them to totals[name]
+def timed(chunks, totals, name):
+    chunks = iter(chunks)
+    totals[name] = 0.0
+    while True:
+        start = time.perf_counter()
+        try:
+            chunk = next(chunks)
+        except StopIteration:
+            return
+        finally:
+            totals[name] += time.perf_counter() - start
+        yield chunk
+
+# stage times in milliseconds and rows written for one run of the pipeline
+def bench_clean(raw, chunk_size, out_file):
+    totals = {}
+    chunks = timed(read_raw(raw, REL_COLS, chunk_size), totals, 'read')
+    chunks = timed(select_routes(chunks), totals, 'select')
+    chunks = timed(decode_chunks(chunks), totals, 'decode')
+    start = time.perf_counter()
+    rows = sum(len(keys) for _, keys in write_chunks(chunks, out_file))
+    totals['write'] = time.perf_counter() - start
+
+    ms = {}
+    upstream = 0.0
+    for stage in STAGES:
+        ms[stage] = (totals[stage] - upstream) * 1000
+        upstream = totals[stage]
+    ms['total'] = totals['write'] * 1000
+    return ms, rows
+
+# milliseconds of a serial and parallel clean per process count, and whether each csv matches the serial one
+def bench_workers(raw, chunk_size, counts, tmp):
+    out = os.path.join(tmp, 'nbi_workers.csv')
+    results = {}
+    for workers in [1] + [n for n in counts if n != 1]:
+        start = time.perf_counter()
+        chunks = select_routes(read_raw(raw, REL_COLS, chunk_size))
+        for rows, keys in write_chunks(decode_chunks(chunks) if workers == 1 else clean_chunks(chunks, workers), out):
+            pass
+        ms = (time.perf_counter() - start) * 1000
+        with open(out, 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        results[workers] = {'ms': ms, 'identical': digest == results[1]['sha256'] if workers != 1 else True,
+                            'sha256': digest}
+    return {n: results[n] for n in sorted(results) if n in counts}
+
+def main(raw, rows, chunk_size, workers, out_file, compare):
+    commit = git_commit()
+    with tempfile.TemporaryDirectory() as tmp:
+        if rows:
+            raw = os.path.join(tmp, 'nbi_raw.csv')
+            print('writing synthetic raw file of {} bridges...'.format(rows))
+            write_raw(int(rows), raw)
+        raw_bytes = os.path.getsize(raw)
+        ms, clean_rows = bench_clean(raw, int(chunk_size), os.path.join(tmp, 'nbi_clean.csv'))
+        counts = [int(n) for n in workers.split(',')] if workers else []
+        scaling = bench_workers(raw, int(chunk_size), counts, tmp) if counts else None
+
+    results = {
+        'commit': commit,
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'raw': 'synthetic {}'.format(rows) if rows else raw,
+        'raw_bytes': raw_bytes,
+        'chunk_size': int(chunk_size),
+        'rows': clean_rows,
+        'ms': ms
+    }
+    if scaling:
+        results['cpus'] = os.cpu_count()
+        results['workers'] = scaling
+
+    previous = json.load(open(compare)) if compare else None
+    print('{:<8} {:>12} {:>12}'.format('stage', 'ms', 'vs prev'))
+    for stage in STAGES + ['total']:
+        change = '{:>11.2f}x'.format(ms[stage] / previous['ms'][stage]) if previous else ''
+        print('{:<8} {:>12.1f} {:>12}'.format(stage, ms[stage], change))
+    print('{} bridges cleaned from {:.1f} MB'.format(clean_rows, raw_bytes / 1e6))
+
+    if scaling:
+        serial = scaling[1]['ms'] if 1 in scaling else None
+        print('\n{:<8} {:>12} {:>10} {:>10}   ({} cpus)'.format('workers', 'ms', 'speedup', 'identical', os.cpu_count()))
+        for n, run in scaling.items():
+            speedup = '{:>9.2f}x'.format(serial / run['ms']) if serial else ''
+            print('{:<8} {:>12.1f} {:>10} {:>10}'.format(n, run['ms'], speedup, 'yes' if run['identical'] else 'NO'))
+
+    out_file = out_file or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results',
+                                        'clean_{}.json'.format(commit or 'local'))
+    os.makedirs(os.path.dirname(out_file), exist_ok=True)
+    with open(out_file, 'w') as f:
+        json.dump(results, f, indent=1)
+    print('results written to {}'.format(out_file))
+
+if __name__ == "__main__":
+    opt = docopt(__doc__)
+    main(opt['--raw'], opt['--rows'], opt['--chunk_size'], opt['--workers'], opt['--out_file'], opt['--compare'])
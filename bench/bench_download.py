@@ -0,0 +1,173 @@
+# Author: Austin Shih
+# Date: 18 Oct 2026
+
+"""Checks src/download.py against a local http server and times the download
+Usage: bench/bench_download.py [--size=<size>] [--chunk_size=<chunk_size>]
+Options:
+--size=<size>                Megabytes of the served csv file [default: 50]
+--chunk_size=<chunk_size>    Bytes written at a time [default: 1048576]
+"""
+
+# python bench/bench_download.py --size=200
+
+# The server stands in for the open data portal: it sends an ETag, answers conditional requests with
+# 304 Not Modified and Range / If-Range requests with 206 Partial Content, can drop the connection
+# part way through a response and can gzip the body (only when asked for, or always, like a server
+# ignoring Accept-Encoding). Every scenario has to leave a local file identical to the served one.
+
+import os
+import sys
+import gzip
+import time
+import hashlib
+import tempfile
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from docopt import docopt
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.download import download
+
+
+class RawFileHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append(dict(self.headers))
+        body, etag = server.body, '"{}"'.format(hashlib.sha256(server.body).hexdigest()[:16])
+
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+
+        status, start = 200, 0
+        byte_range = self.headers.get('Range')
+        if byte_range and self.headers.get('If-Range', etag) == etag:
+            start = int(byte_range.split('=')[1].split('-')[0])
+            if start >= len(body):
+                self.send_response(416)
+                self.send_header('Content-Range', 'bytes */{}'.format(len(body)))
+                self.end_headers()
+                return
+            status = 206
+        payload = body[start:]
+
+        encoding = 'identity'
+        accepted = self.headers.get('Accept-Encoding', '')
+        if server.gzip == 'always' or (server.gzip == 'accepted' and 'gzip' in accepted):
+            encoding = 'gzip'
+            payload = gzip.compress(payload, compresslevel=1)
+
+        self.send_response(status)
+        self.send_header('ETag', etag)
+        self.send_header('Content-Type', 'text/csv')
+        self.send_header('Content-Length', str(len(payload)))
+        if encoding != 'identity':
+            self.send_header('Content-Encoding', encoding)
+        if status == 206:
+            self.send_header('Content-Range', 'bytes {}-{}/{}'.format(start, len(body) - 1, len(body)))
+        self.end_headers()
+
+        # drop the connection a third of the way through the first response
+        if server.drop_after is not None:
+            payload, server.drop_after = payload[:int(len(payload) * server.drop_after)], None
+            self.wfile.write(payload)
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+# serve body on a free local port in a background thread
+def start_server(body):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), RawFileHandler)
+    server.body, server.gzip, server.drop_after, server.requests = body, None, None, []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+# csv text of about size bytes
+def make_body(size, seed=0):
+    row = 'STATE_CODE_001,STRUCTURE_NUMBER_008,{},LAT_016,LONG_017\n'
+    rows, length, i = [], 0, seed
+    while length < size:
+        line = row.format(i)
+        rows.append(line)
+        length += len(line)
+        i += 1
+    return ''.join(rows).encode()
+
+# download from the server into out_file, returns the seconds taken
+def run(server, out_file, chunk_size):
+    url = 'http://127.0.0.1:{}/nbi_raw.csv'.format(server.server_address[1])
+    server.requests.clear()
+    start = time.perf_counter()
+    download(url, out_file, chunk_size, retries=3)
+    return time.perf_counter() - start
+
+def identical(path, body):
+    with open(path, 'rb') as f:
+        return f.read() == body
+
+def main(size, chunk_size):
+    body = make_body(int(float(size) * 1e6))
+    server = start_server(body)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        out_file = os.path.join(tmp, 'nbi_raw.csv')
+
+        seconds = run(server, out_file, chunk_size)
+        results.append(('fresh download', identical(out_file, body), seconds))
+
+        mtime = os.path.getmtime(out_file)
+        seconds = run(server, out_file, chunk_size)
+        results.append(('unchanged file skipped', os.path.getmtime(out_file) == mtime, seconds))
+
+        os.remove(out_file)
+        os.remove(out_file + '.manifest.json')
+        server.drop_after = 1 / 3
+        seconds = run(server, out_file, chunk_size)
+        resumed = any('Range' in r for r in server.requests)
+        results.append(('dropped connection resumed', resumed and identical(out_file, body), seconds))
+
+        # a partial file of an earlier version is restarted once the If-Range validator fails
+        os.replace(out_file, out_file + '.part')
+        with open(out_file + '.manifest.json') as f:
+            manifest = f.read()
+        with open(out_file + '.manifest.json', 'w') as f:
+            f.write(manifest.replace('"complete": true', '"complete": false'))
+        with open(out_file + '.part', 'r+b') as f:
+            f.truncate(len(body) // 2)
+        body = server.body = make_body(len(body), seed=7)
+        seconds = run(server, out_file, chunk_size)
+        results.append(('stale partial file restarted', identical(out_file, body), seconds))
+
+        # gzip only when the client asks for it, the downloader asks for the plain bytes
+        os.remove(out_file)
+        os.remove(out_file + '.manifest.json')
+        server.gzip, server.drop_after = 'accepted', 1 / 3
+        seconds = run(server, out_file, chunk_size)
+        resumed = any('Range' in r for r in server.requests)
+        results.append(('gzip offered, resumed', resumed and identical(out_file, body), seconds))
+
+        # gzip regardless of Accept-Encoding: the body is decoded and fetched again when dropped
+        os.remove(out_file)
+        os.remove(out_file + '.manifest.json')
+        server.gzip, server.drop_after = 'always', 1 / 3
+        seconds = run(server, out_file, chunk_size)
+        results.append(('gzip forced, restarted', identical(out_file, body), seconds))
+    server.shutdown()
+
+    print('{:<32} {:>6} {:>10} {:>10}'.format('scenario', 'ok', 's', 'MB/s'))
+    for name, ok, seconds in results:
+        print('{:<32} {:>6} {:>10.3f} {:>10.1f}'.format(name, 'yes' if ok else 'NO', seconds, len(body) / 1e6 / seconds))
+    if not all(ok for name, ok, seconds in results):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    opt = docopt(__doc__)
+    main(opt['--size'], int(opt['--chunk_size']))
@@ -0,0 +1,80 @@
+# Author: Austin Shih
+# Date: 18 Oct 2026
+
+"""Compares scatterplot figure build time of plotly.express and the lean figure builder
+Usage: bench/bench_figures.py [--snapshot=<snapshot>] [--rows=<rows>] [--repeat=<repeat>]
+Options:
+--snapshot=<snapshot>    Path to the columnar snapshot [default: data/processed/nbi_clean.feather]
+--rows=<rows>            Comma separated selection sizes [default: 1000,5000,20000]
+--repeat=<repeat>        Number of timed builds per case [default: 5]
+"""
+
+# python bench/bench_figures.py --rows=1000,20000
+
+import os
+import sys
+import time
+import numpy as np
+import plotly.express as px
+from docopt import docopt
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.dataset import read_snapshot
+from src.figures import ScatterFigure, SCATTER_COLORBAR
+
+# scatter figure as built by update_scattermap before the lean builder
+def px_scatter(df, rows, zoom):
+    dff = df.take(rows)
+    fig = px.scatter_mapbox(dff,
+                            lat='latitude', lon='longitude',
+                            size=dff['bridge_length']*50,
+                            size_max=30,
+                            hover_name="feature_intersect",
+                            hover_data={'state_name': True,
+                                        'eval_rating': True,
+                                        "eval_rating_v": True,
+                                        'deck_condition': True,
+                                        'superstructure_condition':True,
+                                        'substructure_condition': True,
+                                        "bridge_material": True,
+                                        "bridge_type": True,
+                                        'year_built': True,
+                                        'num_span':True,
+                                        'max_span':':.3f',
+                                        'bridge_length': ':.3f',
+                                        'bridge_width': ':.3f'},
+                            color='eval_rating',
+                            range_color = [0, 9],
+                            color_continuous_scale="rdbu",
+                            opacity=1,
+                            zoom=zoom,
+                            height=700,
+                            mapbox_style="open-street-map")
+    fig.update_layout(mapbox_style="open-street-map", coloraxis_colorbar=SCATTER_COLORBAR,
+                      margin={"r":0,"t":50,"l":0,"b":0})
+    return fig
+
+# best build time of repeated calls
+def time_build(build, repeat):
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        build()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def main(snapshot, rows, repeat):
+    df = read_snapshot(snapshot)
+    scatter = ScatterFigure(df)
+    rng = np.random.default_rng(0)
+
+    print('{:>8} {:>12} {:>12} {:>10}'.format('rows', 'px s', 'lean s', 'speedup'))
+    for n in [int(n) for n in rows.split(',')]:
+        selected = np.sort(rng.choice(len(df), min(n, len(df)), replace=False))
+        px_time = time_build(lambda: px_scatter(df, selected, 3), int(repeat))
+        lean_time = time_build(lambda: scatter.points(selected, 3), int(repeat))
+        print('{:>8} {:>12.4f} {:>12.4f} {:>9.1f}x'.format(len(selected), px_time, lean_time, px_time / lean_time))
+
+if __name__ == "__main__":
+    opt = docopt(__doc__)
+    main(opt['--snapshot'], opt['--rows'], opt['--repeat'])
@@ -0,0 +1,55 @@
+# Author: Austin Shih
+# Date: 18 Oct 2026
+
+"""Compares heatmap response size and serialization time for each county geometry level
+Usage: bench/bench_geometry.py [--counties_dir=<counties_dir>] [--state=<state>] [--repeat=<repeat>]
+Options:
+--counties_dir=<counties_dir>    Directory with the levels written by src/counties.py [default: data/processed]
+--state=<state>                  Two digit state fips used for the state view [default: 06]
+--repeat=<repeat>                Number of timed builds per case [default: 3]
+"""
+
+# python bench/bench_geometry.py --state=06
+
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+import plotly.express as px
+from docopt import docopt
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.counties import LEVELS, load_counties, county_geojson
+
+# build and serialize a choropleth like update_heatmap, returns (bytes, build s, serialize s)
+def time_heatmap(features, fips, zoom, repeat):
+    df_sum = pd.DataFrame({'fips': fips, 'eval_rating': np.random.default_rng(0).uniform(0, 9, len(fips))})
+    build, serialize = [], []
+    for i in range(repeat):
+        start = time.perf_counter()
+        fig = px.choropleth_mapbox(df_sum, geojson=county_geojson(features, fips), locations='fips',
+                                   color='eval_rating', range_color=(0, 9), zoom=zoom,
+                                   mapbox_style="carto-positron")
+        mid = time.perf_counter()
+        payload = fig.to_json()
+        end = time.perf_counter()
+        build.append(mid - start)
+        serialize.append(end - mid)
+    return len(payload), min(build), min(serialize)
+
+def main(counties_dir, state, repeat):
+    counties = load_counties(counties_dir, LEVELS)
+    national = sorted(counties['full'])
+    state_fips = [f for f in national if f.startswith(state)]
+
+    cases = [('national', 'full', national, 3), ('national', 'coarse', national, 3),
+             ('state ' + state, 'full', state_fips, 4), ('state ' + state, 'fine', state_fips, 4)]
+    print('{:<10} {:<8} {:>12} {:>10} {:>12}'.format('view', 'level', 'bytes', 'build s', 'serialize s'))
+    for view, level, fips, zoom in cases:
+        size, build, serialize = time_heatmap(counties[level], fips, zoom, int(repeat))
+        print('{:<10} {:<8} {:>12} {:>10.3f} {:>12.3f}'.format(view, level, size, build, serialize))
+
+if __name__ == "__main__":
+    opt = docopt(__doc__)
+    main(opt['--counties_dir'], opt['--state'], opt['--repeat'])
@@ -0,0 +1,47 @@
+# Author: Austin Shih
+# Date: 18 Oct 2026
+
+"""Reports the in-memory size of each bridge table column before and after the compact table layer
+Usage: bench/bench_memory.py [--snapshot=<snapshot>]
+Options:
+--snapshot=<snapshot>    Path to the columnar snapshot [default: data/processed/nbi_clean.feather]
+"""
+
+# python bench/bench_memory.py
+
+import os
+import sys
+from docopt import docopt
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.dataset import read_snapshot
+
+# columns that were already categorical before the compact table layer
+LEGACY_CATEGORIES = ['route_type', 'eval_rating_v']
+
+# previous representation: text columns as python object strings, fips as zero padded strings
+# and int64 state / county codes
+def object_table(df):
+    df = df.copy()
+    text = [col for col in df.select_dtypes(exclude='number').columns if col not in LEGACY_CATEGORIES]
+    df[text] = df[text].astype(object)
+    df['fips'] = df['fips'].map(str).str.zfill(5)
+    df[['state_fips', 'county_code']] = df[['state_fips', 'county_code']].astype('int64')
+    return df
+
+def main(snapshot):
+    after = read_snapshot(snapshot)
+    before = object_table(after)
+    before_bytes = before.memory_usage(deep=True, index=False)
+    after_bytes = after.memory_usage(deep=True, index=False)
+
+    print('{:<26} {:>16} {:>12} {:>12} {:>8}'.format('column', 'dtype', 'before MB', 'after MB', 'ratio'))
+    for col in after.columns:
+        print('{:<26} {:>16} {:>12.2f} {:>12.2f} {:>7.1f}x'.format(
+            col, str(after[col].dtype), before_bytes[col] / 1e6, after_bytes[col] / 1e6, before_bytes[col] / after_bytes[col]))
+    print('{:<26} {:>16} {:>12.2f} {:>12.2f} {:>7.1f}x'.format(
+        'total', '', before_bytes.sum() / 1e6, after_bytes.sum() / 1e6, before_bytes.sum() / after_bytes.sum()))
+
+if __name__ == "__main__":
+    opt = docopt(__doc__)
+    main(opt['--snapshot'])
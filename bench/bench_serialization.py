@@ -0,0 +1,62 @@
+# Author: Austin Shih
+# Date: 18 Oct 2026
+
+"""Measures bytes on the wire and server serialization time of scatterplot responses
+Usage: bench/bench_serialization.py [--snapshot=<snapshot>] [--rows=<rows>] [--repeat=<repeat>]
+Options:
+--snapshot=<snapshot>    Path to the columnar snapshot [default: data/processed/nbi_clean.feather]
+--rows=<rows>            Comma separated selection sizes [default: 1000,20000,100000]
+--repeat=<repeat>        Number of timed encodings per case [default: 5]
+"""
+
+# python bench/bench_serialization.py --rows=20000
+
+import os
+import sys
+import time
+import numpy as np
+from docopt import docopt
+from plotly.io.json import to_json_plotly
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.dataset import read_snapshot
+from src.figures import ScatterFigure
+from src.serialize import compact_figure, plotlyjs_version
+
+# best encoding time and payload bytes, the figure is prepared inside the timed section
+def time_encode(make_figure, engine, repeat):
+    times = []
+    for i in range(repeat):
+        fig = make_figure()
+        start = time.perf_counter()
+        payload = to_json_plotly(fig, engine=engine)
+        times.append(time.perf_counter() - start)
+    return len(payload.encode()), min(times)
+
+def main(snapshot, rows, repeat):
+    df = read_snapshot(snapshot)
+    plain = ScatterFigure(df, compact=False)
+    rng = np.random.default_rng(0)
+    print('bundled plotly.js {} (typed arrays need v2.28+)'.format(plotlyjs_version()))
+
+    print('{:>8} {:<22} {:>12} {:>12}'.format('rows', 'encoding', 'bytes', 'seconds'))
+    for n in [int(n) for n in rows.split(',')]:
+        selected = np.sort(rng.choice(len(df), min(n, len(df)), replace=False))
+        fig = plain.points(selected, 3)
+        cases = [
+            ('json (before)', lambda: fig, 'json'),
+            ('orjson', lambda: fig, 'orjson'),
+            ('orjson + narrowed', lambda: compact_figure(copy_fig(fig), typed=False), 'orjson'),
+            ('orjson + typed arrays', lambda: compact_figure(copy_fig(fig), typed=True), 'orjson')
+        ]
+        for name, make_figure, engine in cases:
+            size, seconds = time_encode(make_figure, engine, int(repeat))
+            print('{:>8} {:<22} {:>12} {:>12.4f}'.format(len(selected), name, size, seconds))
+
+# copy of the trace dicts so compaction leaves the original figure untouched
+def copy_fig(fig):
+    return {'data': [dict(trace, marker=dict(trace['marker'])) for trace in fig['data']], 'layout': fig['layout']}
+
+if __name__ == "__main__":
+    opt = docopt(__doc__)
+    main(opt['--snapshot'], opt['--rows'], opt['--repeat'])
@@ -0,0 +1,83 @@
+# Author: Austin Shih
+# Date: 18 Oct 2026
+
+"""Measures dashboard data load time from the columnar snapshot and from the processed .csv file, and
+the startup time and memory of the app data with and without the state partitions
+Usage: bench/bench_startup.py [--snapshot=<snapshot>] [--csv=<csv>] [--repeat=<repeat>]
+Options:
+--snapshot=<snapshot>    Path to the columnar snapshot [default: data/processed/nbi_clean.feather]
+--csv=<csv>              Path or url of the processed .csv file [default: data/processed/nbi_clean.csv]
+--repeat=<repeat>        Number of timed loads per path [default: 3]
+"""
+
+# python bench/bench_startup.py --csv=https://raw.githubusercontent.com/austin-shih/bridgemap_data/main/data/processed/nbi_clean.csv
+
+# Memory is the peak of the python and numpy allocations traced while the data is built; memory mapped
+# partition files are not counted since their pages are only read in from the page cache on use.
+
+import os
+import sys
+import time
+import tracemalloc
+from docopt import docopt
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.dataset import read_csv, read_snapshot
+from src.partitions import SUMMARY_PATH, BridgeData, partition_path
+
+# time a load function
+def time_load(load, path, repeat):
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        df = load(path)
+        times.append(time.perf_counter() - start)
+    return min(times), df.shape[0]
+
+# seconds and peak traced megabytes of a call, and its result
+def time_memory(build):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build()
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] / 1e6
+    tracemalloc.stop()
+    return seconds, peak, result
+
+# startup of the whole table against the national summary, and the first load of the largest state
+def bench_partitions():
+    results = {}
+    results['full'] = time_memory(lambda: BridgeData(partitioned=False))[:2]
+    seconds, peak, data = time_memory(lambda: BridgeData(partitioned=True))
+    results['summary'] = seconds, peak
+    largest = max(data.state_fips, key=lambda s: os.path.getsize(partition_path(data.state_fips[s])))
+    results['+ ' + largest] = time_memory(lambda: data.view([largest]))[:2]
+    return results
+
+def main(snapshot, csv, repeat):
+    repeat = int(repeat)
+    results = {}
+    if os.path.exists(snapshot):
+        results['snapshot'] = time_load(read_snapshot, snapshot, repeat)
+    else:
+        print('snapshot {} not found, run src/clean.py first'.format(snapshot))
+    if csv.startswith('http') or os.path.exists(csv):
+        results['csv'] = time_load(read_csv, csv, repeat)
+    else:
+        print('csv {} not found, it is written by a full run of src/clean.py'.format(csv))
+
+    for name, (seconds, rows) in results.items():
+        print('{:<10} {:>10.3f} s  {:>8} rows'.format(name, seconds, rows))
+    if 'snapshot' in results and 'csv' in results:
+        print('speedup    {:>10.1f} x'.format(results['csv'][0] / results['snapshot'][0]))
+
+    if os.path.exists(SUMMARY_PATH):
+        print('\n{:<20} {:>10} {:>10}'.format('app data', 's', 'peak MB'))
+        for name, (seconds, peak) in bench_partitions().items():
+            print('{:<20} {:>10.3f} {:>10.1f}'.format(name, seconds, peak))
+    else:
+        print('state partitions {} not found, run src/clean.py first'.format(SUMMARY_PATH))
+
+if __name__ == "__main__":
+    opt = docopt(__doc__)
+    main(opt['--snapshot'], opt['--csv'], opt['--repeat'])
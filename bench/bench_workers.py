@@ -0,0 +1,155 @@
+# Author: Austin Shih
+# Date: 18 Oct 2026
+
+"""Checks that the memory of each gunicorn worker stays roughly constant as workers are added (Linux only)
+Usage: bench/bench_workers.py [--workers=<workers>] [--port=<port>] [--requests=<requests>] [--tolerance=<tolerance>]
+Options:
+--workers=<workers>        Comma separated worker counts [default: 1,2,4]
+--port=<port>              Port gunicorn binds to [default: 8765]
+--requests=<requests>      Page and map callback requests sent before measuring [default: 20]
+--tolerance=<tolerance>    Largest allowed growth of the private memory per worker [default: 1.25]
+"""
+
+# python bench/bench_workers.py --workers=1,2,4,8
+
+# Resident memory (RSS) counts shared pages in every process, so the check uses the private memory
+# (USS) of each worker and the proportional set size (PSS) of the whole server. With the preloaded,
+# memory mapped dataset the private memory per worker should not grow with the number of workers
+# and the total PSS should grow by far less than one copy of the data per worker.
+# Every round also sends the heatmap and scatter callbacks for a different state, so with state
+# partitions the workers load and index states as they would in use; the states loaded by each
+# worker are part of its private memory.
+
+import os
+import sys
+import time
+import json
+import subprocess
+from urllib.request import urlopen, Request
+from urllib.error import URLError
+from docopt import docopt
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Rss, Pss and private (Uss) memory in MB from /proc/<pid>/smaps_rollup
+def process_memory(pid):
+    fields = {}
+    with open('/proc/{}/smaps_rollup'.format(pid)) as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                fields[parts[0].rstrip(':')] = int(parts[1]) / 1024
+    return {
+        'rss': fields['Rss'],
+        'pss': fields['Pss'],
+        'uss': fields['Private_Clean'] + fields['Private_Dirty']
+    }
+
+# pids of the child processes of a process
+def child_pids(pid):
+    children = []
+    for name in os.listdir('/proc'):
+        if name.isdigit():
+            try:
+                with open('/proc/{}/stat'.format(name)) as f:
+                    if int(f.read().rsplit(')', 1)[1].split()[1]) == pid:
+                        children.append(int(name))
+            except (OSError, IndexError):
+                pass
+    return children
+
+# wait until the server answers and all workers are up
+def wait_ready(server, port, workers, timeout=300):
+    start = time.time()
+    while time.time() - start < timeout:
+        if server.poll() is not None:
+            raise RuntimeError('gunicorn exited with code {}'.format(server.returncode))
+        try:
+            urlopen('http://127.0.0.1:{}/'.format(port), timeout=5).read()
+            if len(child_pids(server.pid)) >= workers:
+                return
+        except (URLError, OSError):
+            pass
+        time.sleep(0.5)
+    raise RuntimeError('gunicorn did not start within {} s'.format(timeout))
+
+# props of every component of the layout by id
+def component_props(node, props):
+    if isinstance(node, list):
+        for child in node:
+            component_props(child, props)
+    elif isinstance(node, dict) and 'props' in node:
+        if 'id' in node['props']:
+            props[node['props']['id']] = node['props']
+        component_props(node['props'].get('children'), props)
+    return props
+
+# server-side heatmap and scatter callbacks, with the initial values of their inputs and states
+def map_callbacks(base):
+    props = component_props(json.load(urlopen(base + '/_dash-layout', timeout=30)), {})
+    props['session_id'] = {'data': 'bench-workers'}
+    callbacks = []
+    for dep in json.load(urlopen(base + '/_dash-dependencies', timeout=30)):
+        if dep.get('clientside_function') or not any(out in dep['output'] for out in
+                                                     ('us_map_heatmap.figure', 'us_map_scatter.figure')):
+            continue
+        outputs = [dict(zip(('id', 'property'), out.split('.', 1))) for out in dep['output'].strip('.').split('...')]
+        callbacks.append({
+            'output': dep['output'],
+            'outputs': outputs,
+            'inputs': [dict(i, value=props.get(i['id'], {}).get(i['property'])) for i in dep['inputs']],
+            'state': [dict(s, value=props.get(s['id'], {}).get(s['property'])) for s in dep['state']]
+        })
+    states = [s for s in props['state_sel1']['options'] if s != 'All']
+    return callbacks, states
+
+# run a map callback with one state selected, as the browser does when the state dropdown changes
+def post_callback(base, callback, state):
+    body = dict(callback, inputs=[dict(i, value=[state]) if i['id'].startswith('state_sel') else i
+                                  for i in callback['inputs']])
+    body['changedPropIds'] = [next('{}.{}'.format(i['id'], i['property']) for i in body['inputs']
+                                   if i['id'].startswith('state_sel'))]
+    request = Request(base + '/_dash-update-component', data=json.dumps(body).encode(),
+                      headers={'Content-Type': 'application/json'})
+    urlopen(request, timeout=120).read()
+
+# start gunicorn with the repository config, warm it up and measure master and workers
+def measure(workers, port, requests):
+    server = subprocess.Popen(['gunicorn', '--workers', str(workers), '--bind', '127.0.0.1:{}'.format(port)],
+                              cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_ready(server, port, workers)
+        base = 'http://127.0.0.1:{}'.format(port)
+        callbacks, states = map_callbacks(base)
+        for i in range(requests):
+            for path in ['/', '/_dash-layout', '/_dash-dependencies']:
+                urlopen(base + path, timeout=30).read()
+            for callback in callbacks:
+                post_callback(base, callback, states[i % len(states)])
+        master = process_memory(server.pid)
+        children = [process_memory(pid) for pid in child_pids(server.pid)]
+    finally:
+        server.terminate()
+        server.wait()
+    return {
+        'workers': workers,
+        'rss': sum(m['rss'] for m in children) / len(children),
+        'uss': sum(m['uss'] for m in children) / len(children),
+        'pss': master['pss'] + sum(m['pss'] for m in children)
+    }
+
+def main(workers, port, requests, tolerance):
+    results = [measure(int(n), int(port), int(requests)) for n in workers.split(',')]
+
+    print('{:>8} {:>16} {:>16} {:>16}'.format('workers', 'RSS/worker MB', 'USS/worker MB', 'total PSS MB'))
+    for r in results:
+        print('{:>8} {:>16.1f} {:>16.1f} {:>16.1f}'.format(r['workers'], r['rss'], r['uss'], r['pss']))
+
+    growth = results[-1]['uss'] / results[0]['uss']
+    print('private memory per worker grew {:.2f}x (tolerance {}x)'.format(growth, tolerance))
+    if growth > float(tolerance):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    opt = docopt(__doc__)
+    main(opt['--workers'], opt['--port'], opt['--requests'], opt['--tolerance'])
@@ -0,0 +1,265 @@
+# Author: Austin Shih
+# Date: 18 Oct 2026
+
+"""Generates a synthetic bridge table with the nbi_clean.csv schema (or the raw NBI schema) for benchmarks at any scale
+Usage: bench/synthetic.py --rows=<rows> --out_file=<out_file> [--seed=<seed>] [--raw]
+Options:
+--rows=<rows>            Number of bridges to generate
+--out_file=<out_file>    Path of the .csv or .feather file to write
+--seed=<seed>            Random seed [default: 0]
+--raw                    Write a raw NBI .csv file (all route types and territories) for src/clean.py
+"""
+
+# python bench/synthetic.py --rows=600000 --out_file=data/synthetic/nbi_600k.feather
+# python bench/synthetic.py --rows=1000000 --out_file=data/synthetic/nbi_raw_1m.csv --raw
+
+# States are sampled by their share of highway bridges in the inventory and bridges are spread over
+# the real number of counties around the state centre. Route types, bridge types, materials, owners,
+# years, sizes and ratings follow distributions close to the January 2023 processed data.
+
+import os
+import sys
+import numpy as np
+import pandas as pd
+from docopt import docopt
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.dataset import DTYPES, write_snapshot
+from src.codes import ROUTE_TYPES as ROUTE_CODES, OWNERS as OWNER_CODES, MATERIALS, STRUCTURE_TYPES
+
+# state fips, abbreviation, name (as written by src/clean.py), bridges (thousands), counties, centre
+STATES = [
+    (1, 'AL', 'Alabama', 16.1, 67, 32.8, -86.8), (2, 'AK', 'Alaska', 1.6, 30, 61.4, -150.0),
+    (4, 'AZ', 'Arizona', 8.4, 15, 34.2, -111.7), (5, 'AR', 'Arkansas', 12.9, 75, 34.9, -92.4),
+    (6, 'CA', 'California', 25.8, 58, 37.2, -119.5), (8, 'CO', 'Colorado', 8.9, 64, 39.0, -105.5),
+    (9, 'CT', 'Connecticut', 4.3, 8, 41.6, -72.7), (10, 'DE', 'Delaware', 0.9, 3, 39.0, -75.5),
+    (11, 'DC', 'District of Columbia', 0.25, 1, 38.9, -77.0), (12, 'FL', 'Florida', 12.6, 67, 28.6, -82.4),
+    (13, 'GA', 'Georgia', 15.0, 159, 32.7, -83.4), (15, 'HI', 'Hawaii', 1.1, 5, 20.8, -156.3),
+    (16, 'ID', 'Idaho', 4.5, 44, 44.4, -114.6), (17, 'IL', 'Illinois', 26.8, 102, 40.0, -89.2),
+    (18, 'IN', 'Indiana', 19.3, 92, 39.9, -86.3), (19, 'IA', 'Iowa', 23.9, 99, 42.1, -93.5),
+    (20, 'KS', 'Kansas', 25.0, 105, 38.5, -98.4), (21, 'KY', 'Kentucky', 14.4, 120, 37.5, -85.3),
+    (22, 'LA', 'Louisiana', 12.8, 64, 31.1, -92.0), (23, 'ME', 'Maine', 2.5, 16, 45.4, -69.2),
+    (24, 'MD', 'Maryland', 5.4, 24, 39.0, -76.8), (25, 'MA', 'Massachusett', 5.2, 14, 42.3, -71.8),
+    (26, 'MI', 'Michigan', 11.3, 83, 44.3, -85.4), (27, 'MN', 'Minnesot', 15.0, 87, 46.3, -94.3),
+    (28, 'MS', 'Mississippi', 16.9, 82, 32.7, -89.7), (29, 'MO', 'Missouri', 24.5, 115, 38.4, -92.5),
+    (30, 'MT', 'Montana', 5.3, 56, 47.0, -109.6), (31, 'NE', 'Nebraska', 15.0, 93, 41.5, -99.8),
+    (32, 'NV', 'Nevada', 2.0, 17, 39.3, -116.6), (33, 'NH', 'New Hampshire', 2.5, 10, 43.7, -71.6),
+    (34, 'NJ', 'New Jersey', 6.8, 21, 40.2, -74.7), (35, 'NM', 'New Mexico', 4.0, 33, 34.4, -106.1),
+    (36, 'NY', 'New York', 17.5, 62, 42.9, -75.5), (37, 'NC', 'North Carolina', 18.8, 100, 35.6, -79.4),
+    (38, 'ND', 'North Dakota', 4.3, 53, 47.5, -100.5), (39, 'OH', 'Ohio', 27.0, 88, 40.3, -82.8),
+    (40, 'OK', 'Oklahoma', 23.0, 77, 35.6, -97.5), (41, 'OR', 'Oregon', 8.2, 36, 43.9, -120.6),
+    (42, 'PA', 'Pennsylvania', 23.0, 67, 40.9, -77.8), (44, 'RI', 'Rhode Island', 0.8, 5, 41.7, -71.5),
+    (45, 'SC', 'South Carolina', 9.4, 46, 33.9, -80.9), (46, 'SD', 'South Dakota', 5.8, 66, 44.4, -100.2),
+    (47, 'TN', 'Tennessee', 20.0, 95, 35.9, -86.4), (48, 'TX', 'Texas', 55.0, 254, 31.5, -99.3),
+    (49, 'UT', 'Utah', 3.1, 29, 39.3, -111.7), (50, 'VT', 'Vermont', 2.8, 14, 44.1, -72.7),
+    (51, 'VA', 'Virginia', 13.9, 133, 37.5, -78.8), (53, 'WA', 'Washington', 8.4, 39, 47.4, -120.5),
+    (54, 'WV', 'West Virginia', 7.3, 55, 38.6, -80.6), (55, 'WI', 'Wisconsin', 14.3, 72, 44.6, -89.9),
+    (56, 'WY', 'Wyoming', 3.1, 23, 43.0, -107.5)
+]
+
+# category labels and sampling weights
+ROUTE_TYPES = {'Interstate highway': 0.27, 'U.S. numbered highway': 0.23, 'State highway': 0.50}
+ROUTE_PREFIX = {'Interstate highway': 'I- ', 'U.S. numbered highway': 'US Hwy ', 'State highway': 'State Rte/Hwy '}
+ROUTE_NUMBERS = {'Interstate highway': 99, 'U.S. numbered highway': 400, 'State highway': 999}
+BRIDGE_TYPES = {
+    'Stringer/Multi-beam or Girder': 0.42, 'Culvert (includes frame culverts)': 0.25, 'Slab': 0.12,
+    'Box Beam or Girders - Multiple': 0.05, 'Tee Beam': 0.04, 'Frame (except frame culverts)': 0.02,
+    'Girder and Floorbeam System': 0.02, 'Box Beam or Girders - Single or Spread': 0.02,
+    'Truss - Thru': 0.01, 'Arch - Deck': 0.01, 'Channel Beam': 0.01, 'Other': 0.005,
+    'Truss - Deck': 0.001, 'Arch - Thru': 0.001, 'Suspension': 0.0003, 'Stayed Girder': 0.0002,
+    'Movable - Lift': 0.0005, 'Movable - Bascule': 0.001, 'Movable - Swing': 0.0005, 'Tunnel': 0.0002,
+    'Mixed types': 0.001, 'Segmental Box Girder': 0.001, 'Orthotropic': 0.0001
+}
+BRIDGE_MATERIALS = {
+    'Concrete': 0.28, 'Prestressed concrete (post-tension)': 0.22, 'Steel': 0.18, 'Concrete continuous': 0.12,
+    'Steel continuous': 0.12, 'Prestressed concrete continuous (post-tension)': 0.04, 'Wood or Timber': 0.025,
+    'Masonry': 0.005, 'Aluminum, Wrought Iron, or Cast Iron': 0.001, 'Other': 0.004
+}
+OWNERS = {
+    'State Highway Agency': 0.92, 'County Highway Agency': 0.03, 'City or Municipal Highway Agency': 0.025,
+    'Town or Township Highway Agency': 0.01, 'State Park, Forest, or Reservation Agency': 0.005,
+    'Railroad': 0.005, 'Private (other than railroad)': 0.003, 'Bureau of Indian Affairs': 0.002
+}
+# eval_rating -1 (no rating) to 9
+RATING_WEIGHTS = [0.02, 0.001, 0.001, 0.003, 0.01, 0.04, 0.12, 0.24, 0.33, 0.18, 0.055]
+RATING_NAMES = ['None', 'Failed', 'Imminent Failure', 'Critical', 'Serious', 'Poor', 'Fair', 'Satisfactory',
+                'Good', 'Very Good', 'Excellent']
+
+# categorical column sampled from {label: weight}
+def sample_category(rng, weights, n):
+    labels = list(weights)
+    p = np.array([weights[label] for label in labels])
+    return pd.Categorical.from_codes(rng.choice(len(labels), n, p=p / p.sum()), labels)
+
+# condition ratings around the overall rating, -1 (N) for culverts
+def sample_condition(rng, rating, culvert):
+    condition = np.clip(rating + rng.integers(0, 3, len(rating)), 0, 9)
+    condition[(rating == -1) | culvert] = -1
+    return condition.astype(np.int8)
+
+# synthetic processed bridge table with the column order and dtypes of the snapshot
+def make_bridges(n, seed=0):
+    rng = np.random.default_rng(seed)
+    states = pd.DataFrame(STATES, columns=['fips', 'abv', 'name', 'bridges', 'counties', 'lat', 'lon'])
+
+    # state and county
+    state = rng.choice(len(states), n, p=states['bridges'] / states['bridges'].sum())
+    counties = states['counties'].to_numpy()[state]
+    county_index = (rng.power(0.7, n) * counties).astype(np.int16)
+    county_code = (county_index * 2 + 1).astype(np.int16)
+    state_fips = states['fips'].to_numpy()[state].astype(np.int8)
+
+    # location: counties on a grid around the state centre
+    side = np.ceil(np.sqrt(counties))
+    spread = np.sqrt(counties) * 0.35
+    latitude = states['lat'].to_numpy()[state] + ((county_index // side) - side / 2) / side * spread + rng.normal(0, 0.1, n)
+    longitude = states['lon'].to_numpy()[state] + ((county_index % side) - side / 2) / side * spread * 1.3 + rng.normal(0, 0.1, n)
+
+    # routes: small route numbers are the most common
+    route_type = sample_category(rng, ROUTE_TYPES, n)
+    labels = []
+    codes = np.empty(n, dtype=np.int32)
+    for code, name in enumerate(route_type.categories):
+        rows = np.flatnonzero(route_type.codes == code)
+        numbers = np.minimum(rng.zipf(1.3, len(rows)), ROUTE_NUMBERS[name])
+        codes[rows] = len(labels) + numbers - 1
+        labels.extend(ROUTE_PREFIX[name] + str(number) for number in range(1, ROUTE_NUMBERS[name] + 1))
+    route_num = pd.Categorical.from_codes(codes, labels)
+
+    # structure
+    bridge_type = sample_category(rng, BRIDGE_TYPES, n)
+    culvert = np.asarray(bridge_type == 'Culvert (includes frame culverts)')
+    num_span = np.clip(rng.geometric(0.4, n), 1, 771).astype(np.int16)
+    num_span[culvert] = rng.integers(1, 4, culvert.sum())
+    max_span = np.round(np.clip(rng.lognormal(2.7, 0.6, n), 1, 1000), 1)
+    bridge_length = np.round(np.clip(max_span * num_span * rng.uniform(0.9, 1.2, n), 6.1, 100000), 1)
+    bridge_width = np.round(np.clip(rng.normal(13, 5, n), 3, 100), 1)
+    year_built = np.clip(np.round(rng.normal(1972, 19, n)), 1697, 2022).astype(np.int16)
+
+    # ratings
+    eval_rating = (rng.choice(11, n, p=RATING_WEIGHTS) - 1).astype(np.int8)
+    feature_names = np.array(["'{} {}'".format(kind, i) for kind in ['CREEK', 'RIVER', 'BRANCH', 'I-', 'US', 'SR', 'RR']
+                              for i in range(2000)], dtype=object)
+    feature_intersect = feature_names[np.minimum(rng.zipf(1.2, n), len(feature_names)) - 1]
+
+    df = pd.DataFrame({
+        'latitude': latitude,
+        'longitude': longitude,
+        'state_fips': state_fips,
+        'county_code': county_code,
+        'route_type': route_type,
+        'route_num': route_num,
+        'feature_intersect': feature_intersect,
+        'owner': sample_category(rng, OWNERS, n),
+        'year_built': year_built,
+        'bridge_material': sample_category(rng, BRIDGE_MATERIALS, n),
+        'bridge_type': bridge_type,
+        'num_span': num_span,
+        'max_span': max_span,
+        'bridge_length': bridge_length,
+        'bridge_width': bridge_width,
+        'deck_condition': sample_condition(rng, eval_rating, culvert),
+        'superstructure_condition': sample_condition(rng, eval_rating, culvert),
+        'substructure_condition': sample_condition(rng, eval_rating, culvert),
+        'eval_rating': eval_rating,
+        'state_abv': pd.Categorical.from_codes(state, states['abv']),
+        'state_name': pd.Categorical.from_codes(state, states['name']),
+        'fips': state_fips.astype(np.int32) * 1000 + county_code,
+        'eval_rating_v': pd.Categorical.from_codes(eval_rating + 1, RATING_NAMES)
+    })
+    return df.astype(DTYPES)
+
+# square county polygons around the bridges of each county, in place of the county geometry
+def make_counties(df):
+    lat = df.groupby('fips')['latitude'].agg(['min', 'max'])
+    lon = df.groupby('fips')['longitude'].agg(['min', 'max'])
+    features = []
+    for fips in lat.index:
+        south, north = lat.loc[fips]
+        west, east = lon.loc[fips]
+        ring = [[west, south], [east, south], [east, north], [west, north], [west, south]]
+        features.append({'type': 'Feature', 'id': '{:05d}'.format(fips), 'properties': {},
+                         'geometry': {'type': 'Polygon', 'coordinates': [ring]}})
+    return {'type': 'FeatureCollection', 'features': features}
+
+# raw columns read by src/clean.py, in the order of the NBI file
+RAW_COLUMNS = ['LATDD', 'LONGDD', 'STATE_CODE', 'COUNTY_COD', 'ROUTE_PREF', 'ROUTE_NUMB', 'FEATURES_D', 'STRUCTURE_', 'OWNER_022',
+               'YEAR_BUILT', 'STRUCTUR_2', 'STRUCTUR_3', 'MAIN_UNIT_', 'MAX_SPAN_L', 'STRUCTUR_4', 'DECK_WIDTH',
+               'DECK_COND_', 'SUPERSTRUC', 'SUBSTRUCTU', 'STRUCTURAL']
+
+# share of the raw inventory on county, city and other roads, and in the territories (Puerto Rico)
+OTHER_ROUTES = 0.55
+TERRITORY = 0.004
+
+# code of every label in a code table
+def encode(labels, table):
+    codes = {label: code for code, label in table.items()}
+    return np.asarray(labels.map(codes)).astype(np.int64)
+
+# rating text as in the raw file, none_code for -1
+def rating_text(values, none_code):
+    return np.where(values == -1, none_code, values.astype(str))
+
+# synthetic raw NBI table: the clean table encoded back to NBI codes, plus bridges on other routes,
+# bridges in the territories and unused columns so the file is as wide as the national file
+def make_raw(n, seed=0, unused=100):
+    rng = np.random.default_rng(seed)
+    df = make_bridges(n, seed)
+    route_pref = encode(df['route_type'], ROUTE_CODES)
+    other = rng.random(n) < OTHER_ROUTES
+    route_pref[other] = rng.integers(4, 9, other.sum())
+    state_code = df['state_fips'].to_numpy().astype(np.int64)
+    state_code[rng.random(n) < TERRITORY] = 72
+
+    raw = pd.DataFrame({
+        'LATDD': df['latitude'],
+        'LONGDD': df['longitude'],
+        'STATE_CODE': state_code,
+        'COUNTY_COD': df['county_code'].astype(np.int64),
+        'ROUTE_PREF': route_pref,
+        'ROUTE_NUMB': df['route_num'].astype(str).str.rsplit(' ', n=1).str[-1].str.zfill(5),
+        'FEATURES_D': df['feature_intersect'].astype(object),
+        'STRUCTURE_': pd.Series(rng.integers(0, 10 ** 15, n)).astype(str).str.zfill(15),
+        'OWNER_022': encode(df['owner'], OWNER_CODES),
+        'YEAR_BUILT': df['year_built'].astype(np.int64),
+        'STRUCTUR_2': encode(df['bridge_material'], MATERIALS),
+        'STRUCTUR_3': encode(df['bridge_type'], STRUCTURE_TYPES),
+        'MAIN_UNIT_': df['num_span'].astype(np.int64),
+        'MAX_SPAN_L': df['max_span'].astype(np.float64).round(1),
+        'STRUCTUR_4': df['bridge_length'].astype(np.float64).round(1),
+        'DECK_WIDTH': df['bridge_width'].astype(np.float64).round(1),
+        'DECK_COND_': rating_text(df['deck_condition'].to_numpy(), 'N'),
+        'SUPERSTRUC': rating_text(df['superstructure_condition'].to_numpy(), 'N'),
+        'SUBSTRUCTU': rating_text(df['substructure_condition'].to_numpy(), 'N'),
+        'STRUCTURAL': rating_text(df['eval_rating'].to_numpy(), '*')
+    }, columns=RAW_COLUMNS)
+    filler = pd.DataFrame({'UNUSED_{:03d}'.format(i): rng.integers(0, 100, n) if i % 2 else np.round(rng.random(n) * 100, 2)
+                           for i in range(unused)}, index=raw.index)
+    return pd.concat([raw, filler], axis=1)
+
+def main(rows, out_file, seed, raw):
+    if raw:
+        write_raw(int(rows), out_file, int(seed))
+        print('{} raw bridges written to {}'.format(rows, out_file))
+        return
+
+    df = make_bridges(int(rows), int(seed))
+    if out_file.endswith('.feather'):
+        write_snapshot(df, out_file)
+    else:
+        if os.path.dirname(out_file):
+            os.makedirs(os.path.dirname(out_file), exist_ok=True)
+        df.to_csv(out_file, index=False)
+    print('{} bridges written to {}'.format(len(df), out_file))
+
+# raw file written in parts so large files do not need the whole table in memory
+def write_raw(rows, out_file, seed=0, part=500000):
+    if os.path.dirname(out_file):
+        os.makedirs(os.path.dirname(out_file), exist_ok=True)
+    for i, start in enumerate(range(0, rows, part)):
+        raw = make_raw(min(part, rows - start), seed + i)
+        raw.to_csv(out_file, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+
+if __name__ == "__main__":
+    opt = docopt(__doc__)
+    main(opt['--rows'], opt['--out_file'], opt['--seed'], opt['--raw'])
@@ -0,0 +1,30 @@
+# Author: Austin Shih
+# Date: 18 Oct 2026
+
+"""Gunicorn settings for the dashboard (gunicorn reads ./gunicorn.conf.py by default).
+The app is preloaded in the master so the national summary, route options and county geometry (or
+the whole snapshot and its indexes without state partitions) are built once before the workers fork
+and shared copy-on-write between them. The states selected in a worker are loaded by that worker.
+"""
+
+# gunicorn
+# WEB_CONCURRENCY=4 gunicorn
+
+import gc
+import os
+
+wsgi_app = 'app:server'
+bind = '0.0.0.0:{}'.format(os.environ.get('PORT', 8000))
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+# request threads per worker, also the default size of the map callback job pool (src/jobs.py)
+threads = int(os.environ.get('BRIDGEMAP_THREADS', 4))
+
+# import app.py (and build the shared data) in the master before forking
+preload_app = True
+
+# the master has loaded the app: freeze the shared objects so the garbage collector in the
+# workers does not write to their pages and turn them into private copies
+def when_ready(server):
+    gc.collect()
+    gc.freeze()
+    server.log.info('bridge data loaded, %d objects shared with the workers', gc.get_freeze_count())
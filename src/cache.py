@@ -0,0 +1,74 @@
+# Author: Austin Shih
+# Date: 18 Oct 2026
+
+"""In-process LRU cache for the map callback filter results.
+Keys are the normalized callback inputs, so equivalent selections (e.g. 'All', [] and ['All']
+for the state dropdown) share one entry. A selection can hold the row positions of every selected
+bridge, so besides the number of entries the cache can be bounded by the bytes they hold.
+"""
+
+from collections import OrderedDict
+import threading
+
+from src.filters import selected_states
+
+
+class LRUCache:
+
+    # sizeof(value) gives the bytes of an entry when the cache is bounded by maxbytes
+    def __init__(self, maxsize=64, maxbytes=None, sizeof=None):
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.sizeof = sizeof
+        self.hits = 0
+        self.misses = 0
+        self.nbytes = 0
+        self._items = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    # cached value or None, counts hits and misses
+    def get(self, key):
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key]
+            self.misses += 1
+            return None
+
+    # store value, evicting the least recently used entries over maxsize or maxbytes (the newest entry
+    # is kept even when it is larger than maxbytes). Storing a value again recounts its bytes
+    def put(self, key, value):
+        size = self.sizeof(value) if self.sizeof is not None else 0
+        with self._lock:
+            self.nbytes += size - self._sizes.get(key, 0)
+            self._items[key] = value
+            self._sizes[key] = size
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize or (self.maxbytes is not None and self.nbytes > self.maxbytes
+                                                      and len(self._items) > 1):
+                old, _ = self._items.popitem(last=False)
+                self.nbytes -= self._sizes.pop(old)
+
+    # drop every entry, e.g. when the dataset is reloaded
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._sizes.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        stats = {'size': len(self._items), 'maxsize': self.maxsize, 'hits': self.hits, 'misses': self.misses}
+        if self.maxbytes is not None:
+            stats.update({'bytes': self.nbytes, 'maxbytes': self.maxbytes})
+        return stats
+
+
+# hashable key from the 8 map callback inputs
+def normalize_inputs(state, route, b_type, year, length_range, span_num, eval, hwy_num):
+    return (tuple(sorted(selected_states(state))), route, b_type, tuple(year), tuple(length_range),
+            tuple(span_num), tuple(eval), hwy_num)
@@ -1,141 +1,405 @@
 # Author: Austin Shih
 # Date: 22 Feb 2022
 
-"""Cleans raw National Bridge Inventory Data and writes the output to a .csv file
-Usage: src/clean.py --in_file=<in_file> --out_file=<out_file>
+"""Cleans raw National Bridge Inventory Data and writes the output to a .csv file and a typed columnar snapshot
+Usage: src/clean.py --in_file=<in_file> --out_file=<out_file> [--chunk_size=<chunk_size>] [--workers=<workers>] [--incremental]
 Options:
---in_file=<in_file>      Path to raw data folder
---out_file=<out_file>    Path to directory where the processed data should be written
+--in_file=<in_file>          Path to raw data folder holding nbi_raw.csv
+--out_file=<out_file>        Path to directory where the processed data should be written (the app reads data/processed)
+--chunk_size=<chunk_size>    Raw rows read and cleaned at a time [default: 100000]
+--workers=<workers>          Processes decoding the chunks in parallel, 1 cleans serially [default: 1]
+--incremental                Only decode bridges that are new or changed since the previous snapshot
 """
 
 # python src/clean.py --in_file=data/raw --out_file=data/processed
+# python src/clean.py --in_file=data/raw --out_file=data/processed --workers=4
+# python src/clean.py --in_file=data/raw --out_file=data/processed --incremental
+# python src/clean.py --in_file=data/raw/2021 --out_file=data/releases/2021
+
+# The raw file is read in chunks of the relevant columns only and every chunk goes through
+# select -> route filter -> decode -> write, appending to the processed csv, so memory use
+# is bounded by the chunk size instead of the size of the national file.
+#
+# With --workers above 1 the route filtered chunks are decoded by a process pool as they are read and
+# written back in raw order, so the processed csv is byte for byte the one written by a serial run.
+#
+# Every processed file is written to the --out_file directory under the name the app reads from
+# data/processed, so an earlier release cleaned to its own directory leaves the live data alone.
+#
+# A full run also writes the typed snapshot, the record keys and one partition per state
+# (src/partitions.py) chunk by chunk, then a national summary merged from the county cubes of the
+# states, so the app only loads the states a user selects.
+#
+# Every processed bridge has a record key (state code, structure number and a hash of its raw
+# values) in nbi_keys.feather, in the row order of the snapshot. An incremental refresh hashes the
+# new raw release, reuses the snapshot rows whose raw values are unchanged and only decodes new and
+# changed bridges and appends the inserted, changed and deleted structures to nbi_changes.csv. The
+# reused and decoded rows are staged like the chunks of a full run, then written to the snapshot and
+# the partitions of the states with changed bridges; the partitions of the other states are kept
+# unless the categories of the table changed. A refresh without changes writes nothing else. The
+# processed csv is only written by a full run, a refresh that changes the snapshot removes it.
 
 # Imports 
 from docopt import docopt
+from datetime import datetime
 import pandas as pd
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+import pyarrow as pa
+from pyarrow import ipc
+import tempfile
+import io
 # import geopandas as gpd
 import os
-
-opt = docopt(__doc__)
-
-def main(in_file, out_file):
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.dataset import SNAPSHOT_PATH, read_csv, read_snapshot, to_pandas, to_arrow, SnapshotWriter
+from src.partitions import PARTITION_DIR, SUMMARY_PATH, ROUTES_PATH, PartitionWriter
+from src.codes import (TERRITORIES, STATE_ABV, STATE_NAMES, ROUTE_TYPES, OWNERS, MATERIALS, STRUCTURE_TYPES,
+                       RATINGS, decode, zero_pad, fips_codes, route_numbers, rating_numbers)
+
+# select relevant columns
+REL_COLS = [#'X',
+            #'Y',
+            #'FID',
+            #'OBJECTID',
+            'LATDD',      # latitude (converted) 16
+            'LONGDD',     # longitude (converted) 17
+            'STATE_CODE', # state code 1
+            #'HIGHWAY_DI', # highway district 2
+            'COUNTY_COD', # county code 3
+            #'PLACE_CODE', # place code 4
+            #'RECORD_TYP', # record type (route on or under structure) 5a
+            'ROUTE_PREF', # route prefix (type of highway/route) 5b
+            #'SERVICE_LE', # designated level of service 5c
+            'ROUTE_NUMB', # route number 5d
+            #'DIRECTION_', # direction suffix 5e
+            'FEATURES_D', # features intersected 6
+            #'FACILITY_C', # facilites carried by structure (similar to route) 7 
+            'STRUCTURE_', # structure number 8 (record key, not written to the processed data)
+            #'LOCATION_0', # location 9
+            #'MIN_VERT_C', # min vertical clearance 10
+            #'KILOPOINT_', # kilometerpoint 11
+            #'BASE_HWY_N', # base highway network? 12
+            #'LRS_INV_RO', # LRS route number 13a
+            #'SUBROUTE_N', # LRS subroute number 13b
+            #'TOLL_020',   # toll status 20
+            #'MAINTENANC', # maintenance responsibility 21
+            'OWNER_022',  # owner 22
+            #'FUNCTIONAL', # functional class 26
+            'YEAR_BUILT', # year built 27
+            #'DESIGN_LOA', # design load 31
+            #'APPR_WIDTH', # approach road width 32
+            #'MEDIAN_COD', # bridge median 33
+            #'DEGREES_SK', # skew 34
+            #'STRUCTUR_1', # structure flaired? 35
+            #'NAVIGATION', # navigation control 38
+            #'NAV_VERT_C', # navigation vertical clearance 39
+            #'NAV_HORR_C', # navigation horizonatl clearance 40
+            #'SERVICE_ON', # type of service 'on' bridge 42a
+            #'SERVICE_UN', # tyoe if service 'under' bridge 42b
+            'STRUCTUR_2', # structure kind 43a
+            'STRUCTUR_3', # structure type 43b
+            #'APPR_KIND_', # approach kind 44a
+            #'APPR_TYPE_', # approach type 44b
+            'MAIN_UNIT_', # number of spans in main unit 45
+            #'APPR_SPANS', # number of approach spans 46
+            #'HORR_CLR_M', # Total horizontal clearance (available max clearance) 47
+            'MAX_SPAN_L', # length of max span 48
+            'STRUCTUR_4', # structure length 49
+            #'LEFT_CURB_', # left curb width 50a
+            #'RIGHT_CURB', # right curb width 50b
+            #'ROADWAY_WI', # roadway width (road + curbs) 51
+            'DECK_WIDTH', # deck width (out-to-out) 52
+            #'VERT_CLR_O', # min vertical clearance over 53
+            #'VERT_CLR_U', # min vertical clearance under, ref. feature 54a
+            #'VERT_CLR_1', # min vertical clearance under, from feature 54b
+            #'LAT_UND_RE', # min lateral underclearance on right, ref. feature 55a
+            #'LAT_UND_MT', # min lateral underclearance on right, from feature 55b
+            #'LEFT_LAT_U', # min lateral underclearace on left, from feature 56
+            'DECK_COND_', # deck condition 68
+            'SUPERSTRUC', # superstructure condition 59
+            'SUBSTRUCTU', # substructure condition 60
+            #'CHANNEL_CO', # channel condition
+            #'CULVERT_CO', # culvert condition
+            'STRUCTURAL'] # structural evaluation 67
+            #'DECK_GEOME', # deck geometry evaluation 68
+            #'UNDCLRENCE', # underclearance evaluation 69
+            #'WATERWAY_E', # waterway evaluation (adequacy) 71
+            #'APPR_ROAD_', # approach roadway (alignment) evaluation (adequacy) 72
+            #'DATE_OF_IN', # date of inspection (mmyy) 90
+            #'INSPECT_FR', # inspection frequency 91
+            #'BRIDGE_IMP', # bridge improvement cost 94
+            #'ROADWAY_IM', # roadway improvement cost 95
+            #'TOTAL_IMP_', # total improvement cost 96
+            #'YEAR_OF_IM', # year of improvement cost estimate 97
+            #'STRAHNET_H', # STRAHNET highway designation 100
+            #'PARALLEL_S', # parallel structure designation 101
+            #'TRAFFIC_DI', # direction of traffic 102
+            #'HIGHWAY_SY', # on National Highway System (NHS)? 104
+            #'FEDERAL_LA', # federal lands highway 105
+            #'YEAR_RECON', # year reconstructed 106
+            #'DECK_STRUC', # deck stucture type 107
+            #'SURFACE_TY', # type of wear surface 108a
+            #'MEMBRANE_T', # type of membrane 108b
+            #'DECK_PROTE', # deck protection 108c
+            #'NATIONAL_N', # designated national network for trucks? 110
+            #'BRIDGE_LEN', # does bridge meet min NBIS length? 112
+            #'SCOUR_CRIT', # scour critical bridges 113
+            #'MIN_NAV_CL'] # min navigation vertical clearance 116
+
+# explicit raw column types, so every chunk is parsed the same way as the whole file. Rating columns
+# hold 'N' / '*' codes and route numbers are handled as text
+RAW_DTYPES = {'LATDD': np.float64, 'LONGDD': np.float64, 'STATE_CODE': np.int64, 'COUNTY_COD': np.int64,
+              'STRUCTURE_': str, 'ROUTE_PREF': np.int64, 'ROUTE_NUMB': str, 'FEATURES_D': str, 'OWNER_022': np.int64,
+              'YEAR_BUILT': np.int64, 'STRUCTUR_2': np.int64, 'STRUCTUR_3': np.int64, 'MAIN_UNIT_': np.int64,
+              'MAX_SPAN_L': np.float64, 'STRUCTUR_4': np.float64, 'DECK_WIDTH': np.float64,
+              'DECK_COND_': str, 'SUPERSTRUC': str, 'SUBSTRUCTU': str, 'STRUCTURAL': str}
+
+# processed csv, record keys and change log of the processed data
+CSV_PATH = 'data/processed/nbi_clean.csv'
+KEYS_PATH = 'data/processed/nbi_keys.feather'
+CHANGES_PATH = 'data/processed/nbi_changes.csv'
+
+# paths of the processed files in an output directory, named as the app reads them from data/processed
+def processed_paths(out_dir):
+    paths = {'csv': CSV_PATH, 'snapshot': SNAPSHOT_PATH, 'keys': KEYS_PATH, 'changes': CHANGES_PATH,
+             'partitions': PARTITION_DIR, 'summary': SUMMARY_PATH, 'routes': ROUTES_PATH}
+    return {name: os.path.join(out_dir, os.path.basename(path)) for name, path in paths.items()}
+
+def main(in_file, out_file, chunk_size=100000, incremental=False, workers=1):
     
     if os.path.exists(in_file) == False:
         print('Raw data directory does not exist, exiting script')
         exit()
+
+    raw_path = os.path.join(in_file, 'nbi_raw.csv')
+    paths = processed_paths(out_file)
+    if incremental:
+        if os.path.exists(paths['keys']) and os.path.exists(paths['snapshot']):
+            refresh(raw_path, chunk_size, paths)
+            return
+        print('no previous snapshot with record keys, cleaning the full file')
     
-    # Import raw data
-    print('import raw data...')
-    bridges = pd.read_csv('data/raw/nbi_raw.csv')
     # roads = gpd.read_file('data/raw/tl_2016_us_primaryroads/tl_2016_us_primaryroads.shp')
 
     # # clean roads geopandas df
     # print('clean geopandas file')
     # roads = roads.query('RTTYP == "I" | RTTYP == "U" | RTTYP == "S"')
 
-
-    # select relevant columns
-    rel_cols = [#'X',
-                #'Y',
-                #'FID',
-                #'OBJECTID',
-                'LATDD',      # latitude (converted) 16
-                'LONGDD',     # longitude (converted) 17
-                'STATE_CODE', # state code 1
-                #'HIGHWAY_DI', # highway district 2
-                'COUNTY_COD', # county code 3
-                #'PLACE_CODE', # place code 4
-                #'RECORD_TYP', # record type (route on or under structure) 5a
-                'ROUTE_PREF', # route prefix (type of highway/route) 5b
-                #'SERVICE_LE', # designated level of service 5c
-                'ROUTE_NUMB', # route number 5d
-                #'DIRECTION_', # direction suffix 5e
-                'FEATURES_D', # features intersected 6
-                #'FACILITY_C', # facilites carried by structure (similar to route) 7 
-                #'LOCATION_0', # location 9
-                #'MIN_VERT_C', # min vertical clearance 10
-                #'KILOPOINT_', # kilometerpoint 11
-                #'BASE_HWY_N', # base highway network? 12
-                #'LRS_INV_RO', # LRS route number 13a
-                #'SUBROUTE_N', # LRS subroute number 13b
-                #'TOLL_020',   # toll status 20
-                #'MAINTENANC', # maintenance responsibility 21
-                'OWNER_022',  # owner 22
-                #'FUNCTIONAL', # functional class 26
-                'YEAR_BUILT', # year built 27
-                #'DESIGN_LOA', # design load 31
-                #'APPR_WIDTH', # approach road width 32
-                #'MEDIAN_COD', # bridge median 33
-                #'DEGREES_SK', # skew 34
-                #'STRUCTUR_1', # structure flaired? 35
-                #'NAVIGATION', # navigation control 38
-                #'NAV_VERT_C', # navigation vertical clearance 39
-                #'NAV_HORR_C', # navigation horizonatl clearance 40
-                #'SERVICE_ON', # type of service 'on' bridge 42a
-                #'SERVICE_UN', # tyoe if service 'under' bridge 42b
-                'STRUCTUR_2', # structure kind 43a
-                'STRUCTUR_3', # structure type 43b
-                #'APPR_KIND_', # approach kind 44a
-                #'APPR_TYPE_', # approach type 44b
-                'MAIN_UNIT_', # number of spans in main unit 45
-                #'APPR_SPANS', # number of approach spans 46
-                #'HORR_CLR_M', # Total horizontal clearance (available max clearance) 47
-                'MAX_SPAN_L', # length of max span 48
-                'STRUCTUR_4', # structure length 49
-                #'LEFT_CURB_', # left curb width 50a
-                #'RIGHT_CURB', # right curb width 50b
-                #'ROADWAY_WI', # roadway width (road + curbs) 51
-                'DECK_WIDTH', # deck width (out-to-out) 52
-                #'VERT_CLR_O', # min vertical clearance over 53
-                #'VERT_CLR_U', # min vertical clearance under, ref. feature 54a
-                #'VERT_CLR_1', # min vertical clearance under, from feature 54b
-                #'LAT_UND_RE', # min lateral underclearance on right, ref. feature 55a
-                #'LAT_UND_MT', # min lateral underclearance on right, from feature 55b
-                #'LEFT_LAT_U', # min lateral underclearace on left, from feature 56
-                'DECK_COND_', # deck condition 68
-                'SUPERSTRUC', # superstructure condition 59
-                'SUBSTRUCTU', # substructure condition 60
-                #'CHANNEL_CO', # channel condition
-                #'CULVERT_CO', # culvert condition
-                'STRUCTURAL'] # structural evaluation 67
-                #'DECK_GEOME', # deck geometry evaluation 68
-                #'UNDCLRENCE', # underclearance evaluation 69
-                #'WATERWAY_E', # waterway evaluation (adequacy) 71
-                #'APPR_ROAD_', # approach roadway (alignment) evaluation (adequacy) 72
-                #'DATE_OF_IN', # date of inspection (mmyy) 90
-                #'INSPECT_FR', # inspection frequency 91
-                #'BRIDGE_IMP', # bridge improvement cost 94
-                #'ROADWAY_IM', # roadway improvement cost 95
-                #'TOTAL_IMP_', # total improvement cost 96
-                #'YEAR_OF_IM', # year of improvement cost estimate 97
-                #'STRAHNET_H', # STRAHNET highway designation 100
-                #'PARALLEL_S', # parallel structure designation 101
-                #'TRAFFIC_DI', # direction of traffic 102
-                #'HIGHWAY_SY', # on National Highway System (NHS)? 104
-                #'FEDERAL_LA', # federal lands highway 105
-                #'YEAR_RECON', # year reconstructed 106
-                #'DECK_STRUC', # deck stucture type 107
-                #'SURFACE_TY', # type of wear surface 108a
-                #'MEMBRANE_T', # type of membrane 108b
-                #'DECK_PROTE', # deck protection 108c
-                #'NATIONAL_N', # designated national network for trucks? 110
-                #'BRIDGE_LEN', # does bridge meet min NBIS length? 112
-                #'SCOUR_CRIT', # scour critical bridges 113
-                #'MIN_NAV_CL'] # min navigation vertical clearance 116
-
-    bridges = bridges[rel_cols]
-
-    # select only Interstate, US Numbered, and State highways
-    bridges = bridges.query('ROUTE_PREF==1 | ROUTE_PREF==2 | ROUTE_PREF==3')
-
-    # modifying values to make more sense 
-    print('modifying values...')
-    bridges = modify_clean_values(bridges)
+    # clean raw data chunk by chunk and append to the processed csv
+    print('cleaning raw data...')
+    chunks = read_raw(raw_path, REL_COLS, chunk_size)
+    chunks = select_routes(chunks)
     # roads = modify_geo(roads)
-
-    # rename columns for readability
-    print('renaming columns...')
-    bridges = bridges.rename(columns = {
+    os.makedirs(out_file, exist_ok=True)
+    parts = clean_chunks(chunks, workers) if workers > 1 else decode_chunks(chunks)
+    count = write_processed(parts, paths)
+    # roads.to_file('data/processed/us_roads.shp')
+    print('{} bridges written'.format(count))
+
+# decode only the bridges that are new or changed since the previous snapshot and write the merged
+# snapshot, record keys and change log. Only the partitions of the states whose bridges changed are
+# rewritten (all of them when the categories of the table changed), nothing when no bridge changed
+def refresh(raw_path, chunk_size, paths):
+    print('reading previous snapshot...')
+    previous = read_snapshot(paths['snapshot'])
+    previous_keys = pd.read_feather(paths['keys'])
+    previous_categories = {col: list(previous[col].cat.categories) for col in previous.select_dtypes('category')}
+
+    print('comparing raw data with the previous snapshot...')
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(paths['snapshot']) or '.') as tmp:
+        staging = os.path.join(tmp, 'nbi_clean.arrows')
+        chunks = select_routes(read_raw(raw_path, REL_COLS, chunk_size))
+        categories, count = stage_chunks(reuse_chunks(chunks, previous, previous_keys), staging, paths['keys'])
+        # the staged rows are copies, the previous snapshot is unmapped before it is overwritten
+        del previous
+
+        keys = pd.read_feather(paths['keys'])
+        decoded = np.count_nonzero(~np.isin(keys['record_hash'].to_numpy(), previous_keys['record_hash'].to_numpy()))
+        print('{} bridges, {} unchanged, {} decoded'.format(count, count - decoded, decoded))
+        write_changes(previous_keys, keys, paths['changes'])
+        if keys['record_hash'].equals(previous_keys['record_hash']):
+            print('no bridges changed, the snapshot and state partitions are up to date')
+            return
+
+        # the processed csv is only written by a full run, a stale copy is removed
+        if os.path.exists(paths['csv']):
+            print('removing {}, it is rewritten by a full run'.format(paths['csv']))
+            os.remove(paths['csv'])
+        keep = unchanged_states(previous_keys, keys) if categories == previous_categories else []
+        write_staged(staging, categories, paths, keep)
+
+# typed rows and record keys of the raw chunks. Rows whose raw values are in the previous snapshot are
+# taken from it, new and changed rows are decoded
+def reuse_chunks(chunks, previous, previous_keys):
+    # position of the first snapshot row of every raw record hash
+    first = ~previous_keys['record_hash'].duplicated().to_numpy()
+    known = pd.Index(previous_keys['record_hash'][first])
+    positions = np.flatnonzero(first)
+
+    for chunk in chunks:
+        chunk_keys = record_keys(chunk)
+        match = known.get_indexer(chunk_keys['record_hash'])
+        unchanged = match >= 0
+
+        rows = previous.iloc[positions[match[unchanged]]].set_index(chunk.index[unchanged])
+        changed = modify_clean_values(chunk[~unchanged])
+        if len(changed):
+            rows = merge_rows(rows, typed_rows(changed))
+        if len(rows):
+            yield rows, chunk_keys.loc[rows.index]
+
+# rows of two typed frames in index order, categorical columns over the categories of both
+def merge_rows(a, b):
+    dtypes = {col: pd.CategoricalDtype(a[col].cat.categories.union(b[col].cat.categories))
+              for col in a.select_dtypes('category')}
+    return pd.concat([a.astype(dtypes), b.astype(dtypes)]).sort_index()
+
+# states whose bridges are the same, in the same order, in both sets of record keys
+def unchanged_states(previous_keys, keys):
+    before = {code: hashes.to_numpy() for code, hashes in previous_keys.groupby('state_code')['record_hash']}
+    return [code for code, hashes in keys.groupby('state_code')['record_hash']
+            if code in before and np.array_equal(before[code], hashes.to_numpy())]
+
+# typed rows of decoded raw rows, parsed from their csv text like the full snapshot
+def typed_rows(chunk):
+    text = io.StringIO()
+    rename_columns(chunk.drop(columns='STRUCTURE_')).to_csv(text, index=False)
+    text.seek(0)
+    return read_csv(text).set_index(chunk.index)
+
+# structures inserted, changed (raw values differ) or deleted between two sets of record keys
+def write_changes(previous_keys, keys, path):
+    # structures are compared by a hash of their state code and structure number
+    structure = ['state_code', 'structure_number']
+    before = pd.util.hash_pandas_object(previous_keys[structure], index=False).to_numpy()
+    after = pd.util.hash_pandas_object(keys[structure], index=False).to_numpy()
+    kept = np.isin(after, before)
+    new_records = ~np.isin(keys['record_hash'].to_numpy(), previous_keys['record_hash'].to_numpy())
+
+    changes = pd.concat([
+        keys.loc[new_records & ~kept, structure].assign(change='inserted'),
+        keys.loc[new_records & kept, structure].assign(change='changed'),
+        previous_keys.loc[~np.isin(before, after), structure].assign(change='deleted')
+    ], ignore_index=True).drop_duplicates()
+    changes.insert(0, 'refreshed', datetime.now().isoformat(timespec='seconds'))
+    changes.to_csv(path, mode='a', header=not os.path.exists(path), index=False)
+    for change, count in changes['change'].value_counts().items():
+        print('{} structures {}'.format(count, change))
+
+# raw data chunks with the relevant columns only, in rel_cols order
+def read_raw(path, rel_cols, chunk_size):
+    dtypes = {col: RAW_DTYPES[col] for col in rel_cols}
+    for chunk in pd.read_csv(path, usecols=rel_cols, dtype=dtypes, chunksize=chunk_size):
+        yield chunk[rel_cols]
+
+# select only Interstate, US Numbered, and State highways
+def select_routes(chunks):
+    for chunk in chunks:
+        chunk = chunk.query('ROUTE_PREF==1 | ROUTE_PREF==2 | ROUTE_PREF==3')
+        if len(chunk):
+            yield chunk
+
+# modify values to make more sense and rename columns for readability, yields the csv text of the
+# decoded chunks (with the header line), their rows typed as read_csv types the processed csv and
+# the record keys of their rows
+def decode_chunks(chunks):
+    for chunk in chunks:
+        keys = record_keys(chunk)
+        chunk = modify_clean_values(chunk)
+        if len(chunk):
+            text = rename_columns(chunk.drop(columns='STRUCTURE_')).to_csv(index=False)
+            yield text, read_csv(io.StringIO(text)), keys.loc[chunk.index]
+
+# write the csv text of the chunks to one file under a single header, yields the typed rows and
+# record keys of every chunk written
+def write_chunks(chunks, path):
+    with open(path, 'w', newline='') as f:
+        for i, (text, rows, keys) in enumerate(chunks):
+            f.write(text if i == 0 else text.split('\n', 1)[1])
+            yield rows, keys
+
+# write the decoded chunks to the processed csv, the typed snapshot, record keys and state partitions
+# at the processed paths, returns the number of bridges written
+def write_processed(parts, paths):
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(paths['csv']) or '.') as tmp:
+        staging = os.path.join(tmp, 'nbi_clean.arrows')
+        categories, count = stage_chunks(write_chunks(parts, paths['csv']), staging, paths['keys'])
+        if count:
+            write_staged(staging, categories, paths)
+    return count
+
+# stage the typed rows of the chunks in an arrow stream, every batch with its own categories, and
+# write their record keys. Returns the categories used by the rows, sorted as read_csv gives them for
+# the whole csv, and the number of rows, so only a chunk of rows is held in memory
+def stage_chunks(chunks, path, keys_path):
+    categories, count = {}, 0
+    keys, staging = SnapshotWriter(keys_path), None
+    for rows, chunk_keys in chunks:
+        for col in rows.select_dtypes('category'):
+            categories.setdefault(col, set()).update(rows[col].cat.remove_unused_categories().cat.categories)
+        table = to_arrow(rows)
+        if staging is None:
+            # one dictionary type for every chunk, each batch carries its own categories
+            schema = pa.schema([field.with_type(pa.dictionary(pa.int32(), field.type.value_type))
+                                if pa.types.is_dictionary(field.type) else field for field in table.schema])
+            staging = ipc.new_stream(path, schema)
+        staging.write_table(table.cast(schema))
+        keys.write(to_arrow(chunk_keys))
+        count += len(rows)
+    keys.close()
+    if staging is not None:
+        staging.close()
+    return {col: sorted(values) for col, values in categories.items()}, count
+
+# cast the staged rows to the categories of the whole table and append them to the snapshot and the
+# state partitions at the processed paths, then write the national summary. The partitions of the
+# states in keep are left as they are
+def write_staged(path, categories, paths, keep=()):
+    print('saving columnar snapshot and state partitions...')
+    snapshot = SnapshotWriter(paths['snapshot'])
+    states = PartitionWriter(paths['partitions'], paths['summary'], paths['routes'], keep)
+    with pa.memory_map(path) as source:
+        for batch in ipc.open_stream(source):
+            rows = to_pandas(batch)
+            for col, values in categories.items():
+                rows[col] = rows[col].cat.set_categories(values)
+            snapshot.write(to_arrow(rows))
+            states.write(rows)
+    snapshot.close()
+    print('saving national summary...')
+    states.close()
+
+# decoded chunks in raw order from a process pool, as decode_chunks. Chunks are submitted as they are
+# read and at most two chunks per worker are in flight, so the raw rows are never buffered in the parent
+def clean_chunks(chunks, workers):
+    with ProcessPoolExecutor(workers) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(clean_chunk, chunk))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+# csv text and record keys of one raw chunk, as a list of at most one part
+def clean_chunk(chunk):
+    return list(decode_chunks([chunk]))
+
+# state code, structure number and a hash of the raw values of every raw row
+def record_keys(chunk):
+    return pd.DataFrame({
+        'state_code': chunk['STATE_CODE'].astype(np.int16),
+        'structure_number': chunk['STRUCTURE_'],
+        'record_hash': pd.util.hash_pandas_object(chunk[REL_COLS], index=False)
+    }, index=chunk.index)
+
+# rename columns for readability
+def rename_columns(bridges):
+    return bridges.rename(columns = {
                                         'LATDD':      'latitude', 
                                         'LONGDD':     'longitude',
                                         'STATE_CODE': 'state_fips',
@@ -165,16 +429,6 @@ def main(in_file, out_file):
                                         }
                             )
 
-    # save processed data
-    print('saving clean data...')
-    try:
-        bridges.to_csv('data/processed/nbi_clean.csv', index=False)
-        # roads.to_file('data/processed/us_roads.shp')
-    except:
-        os.makedirs(os.path.dirname(out_file))
-        bridges.to_csv('data/processed/nbi_clean.csv', index=False)
-        # roads.to_file('data/processed/us_roads.shp')
-
 # # modify geo df
 # def modify_geo(df):
     
@@ -188,366 +442,67 @@ def main(in_file, out_file):
 
 # modify value function
 def modify_clean_values(df):
-    # modifying values to make more sense 
+    # modifying values to make more sense, every code column is decoded in one vectorized step
+    # with the code tables in src/codes.py
 
     # drop bridges from territories
-    indexState = df[(df['STATE_CODE'] == 60) | (df['STATE_CODE'] == 64) | (df['STATE_CODE'] == 66) | 
-                    (df['STATE_CODE'] == 68) | (df['STATE_CODE'] == 69) | (df['STATE_CODE'] == 70) |
-                    (df['STATE_CODE'] == 72) | (df['STATE_CODE'] == 74) | (df['STATE_CODE'] == 78)].index
-    df = df.drop(indexState)
+    df = df.drop(df.index[np.isin(df['STATE_CODE'], TERRITORIES)])
 
     # add two letter state code
-    df['state_abv'] = df['STATE_CODE']
-    df['state_abv'] = df['state_abv'].replace({
-        1 : 'AL',
-        2 : 'AK',
-        4 : 'AZ',
-        5 : 'AR',
-        6 : 'CA',
-        8 : 'CO',
-        9 : 'CT',
-        10: 'DE',
-        11: 'DC',
-        12: 'FL',
-        13: 'GA',
-        15: 'HI',
-        16: 'ID',
-        17: 'IL',
-        18: 'IN',
-        19: 'IA',
-        20: 'KS',
-        21: 'KY',
-        22: 'LA',
-        23: 'ME',
-        24: 'MD',
-        25: 'MA',
-        26: 'MI',
-        27: 'MN',
-        28: 'MS',
-        29: 'MO',
-        30: 'MT',
-        31: 'NE',
-        32: 'NV',
-        33: 'NH',
-        34: 'NJ',
-        35: 'NM',
-        36: 'NY',
-        37: 'NC',
-        38: 'ND',
-        39: 'OH',
-        40: 'OK',
-        41: 'OR',
-        42: 'PA',
-        44: 'RI',
-        45: 'SC',
-        46: 'SD',
-        47: 'TN',
-        48: 'TX',
-        49: 'UT',
-        50: 'VT',
-        51: 'VA',
-        53: 'WA',
-        54: 'WV',
-        55: 'WI',
-        56: 'WY'
-    })
+    df['state_abv'] = decode(df['STATE_CODE'], STATE_ABV)
 
     # update state names
-    df['state_name'] = df['STATE_CODE'].replace({
-        1: 'Alabama',
-        2: 'Alaska',
-        4: 'Arizona',
-        5: 'Arkansas',
-        6: 'California',
-        8: 'Colorado',
-        9: 'Connecticut',
-        10: 'Delaware',
-        11: 'District of Columbia',
-        12: 'Florida',
-        13: 'Georgia',
-        15: 'Hawaii',
-        16: 'Idaho',
-        17: 'Illinois',
-        18: 'Indiana',
-        19: 'Iowa',
-        20: 'Kansas',
-        21: 'Kentucky',
-        22: 'Louisiana',
-        23: 'Maine',
-        24: 'Maryland',
-        25: 'Massachusett',
-        26: 'Michigan',
-        27: 'Minnesot',
-        28: 'Mississippi',
-        29: 'Missouri',
-        30: 'Montana',
-        31: 'Nebraska',
-        32: 'Nevada',
-        33: 'New Hampshire',
-        34: 'New Jersey',
-        35: 'New Mexico',
-        36: 'New York',
-        37: 'North Carolina',
-        38: 'North Dakota',
-        39: 'Ohio',
-        40: 'Oklahoma',
-        41: 'Oregon',
-        42: 'Pennsylvania',     
-        44: 'Rhode Island',
-        45: 'South Carolina',
-        46: 'South Dakota',
-        47: 'Tennessee',
-        48: 'Texas',
-        49: 'Utah',
-        50: 'Vermont',
-        51: 'Virginia',
-        53: 'Washington',
-        54: 'West Virginia',
-        55: 'Wisconsin',
-        56: 'Wyoming'
-    }) 
+    df['state_name'] = decode(df['STATE_CODE'], STATE_NAMES)
 
     # create full FIPS
-    df['COUNTY_COD'] = df['COUNTY_COD'].map(str)
-    df['COUNTY_COD'] = df['COUNTY_COD'].str.zfill(3)
-    df['STATE_CODE'] = df['STATE_CODE'].map(str)
-    df['STATE_CODE'] = df['STATE_CODE'].str.zfill(2)
-    df['fips'] = df['STATE_CODE'] + df['COUNTY_COD']
-
-    # create full route number
-    df['ROUTE_NUMB'] = df['ROUTE_NUMB'].map(str)
-    df['ROUTE_NUMB'] = df['ROUTE_NUMB'].str.lstrip('0')
-    # define condition
-    mask1 = (df['ROUTE_PREF'] == 1)
-    mask2 = (df['ROUTE_PREF'] == 2)
-    mask3 = (df['ROUTE_PREF'] == 3)
-    # add appropriate hwy prefix 
-    df.loc[mask1, 'ROUTE_NUMB'] = 'I- ' + df['ROUTE_NUMB'].astype(str)
-    df.loc[mask2, 'ROUTE_NUMB'] = 'US Hwy ' + df['ROUTE_NUMB'].astype(str)
-    df.loc[mask3, 'ROUTE_NUMB'] = 'State Rte/Hwy ' + df['ROUTE_NUMB'].astype(str)
+    df['fips'] = fips_codes(df['STATE_CODE'], df['COUNTY_COD'])
+    df['COUNTY_COD'] = zero_pad(df['COUNTY_COD'], 3)
+    df['STATE_CODE'] = zero_pad(df['STATE_CODE'], 2)
+
+    # create full route number with the appropriate hwy prefix
+    df['ROUTE_NUMB'] = route_numbers(df['ROUTE_PREF'], df['ROUTE_NUMB'])
 
     # update route type
-    df['ROUTE_PREF'] = df['ROUTE_PREF'].replace({
-        1: 'Interstate highway',
-        2: 'U.S. numbered highway',
-        3: 'State highway',     
-        4: 'County highway',
-        5: 'City street',
-        6: 'Federal lands road',
-        7: 'State lands road',
-        8: 'Other'
-    })
+    df['ROUTE_PREF'] = decode(df['ROUTE_PREF'], ROUTE_TYPES)
 
     # # add bridge deck area
     # df['deck_area'] = df.STRUCTUR_4 * df.DECK_WIDTH
 
     # # update route service level
-    # df['SERVICE_LE'] = df['SERVICE_LE'].replace({
-    #     0: 'None',
-    #     1: 'Mainline',
-    #     2: 'Alternate',
-    #     3: 'Bypass',
-    #     4: 'Spur',
-    #     5: 'Business',
-    #     6: 'Ramp, Wye, Connector, etc.',
-    #     7: 'Service and/or unclassified frontage road'
-    # })
+    # df['SERVICE_LE'] = decode(df['SERVICE_LE'], SERVICE_LEVELS)
 
     # update owner
-    df['OWNER_022'] = df['OWNER_022'].replace({
-        1: 'State Highway Agency',
-        2: 'County Highway Agency',
-        3: 'Town or Township Highway Agency',
-        4: 'City or Municipal Highway Agency',
-        11: 'State Park, Forest, or Reservation Agency',
-        12: 'Local Park, Forest, or Reservation Agency',
-        21: 'Other State Agencies',
-        25: 'Other Local Agencies',
-        26: 'Private (other than railroad)',
-        27: 'Railroad',
-        31: 'State Toll Authority',
-        32: 'Local Toll Authority',
-        60: 'Other Federal Agencies (not listed below)',
-        61: 'Indian Tribal Government',
-        62: 'Bureau of Indian Affairs',
-        63: 'Bureau of Fish and Wildlife',
-        64: 'U.S. Forest Service',
-        66: 'National Park Service',
-        67: 'Tennessee Valley Authority',
-        68: 'Bureau of Land Management',
-        69: 'Bureau of Reclamation',
-        70: 'Corps of Engineers (Civil)',
-        71: 'Corps of Engineers (Military)',
-        72: 'Air Force',
-        73: 'Navy/Marines',
-        74: 'Army',
-        75: 'NASA',
-        76: 'Metropolitan'
-    })
+    df['OWNER_022'] = decode(df['OWNER_022'], OWNERS)
 
     # # update type of service 'on'
-    # df['SERVICE_ON'] = df['SERVICE_ON'].replace({
-    #     1: 'Highway',
-    #     2: 'Railroad',
-    #     3: 'Pedestrian-bicycle',
-    #     4: 'Highway-railroad',
-    #     5: 'Highway-pedestrian',
-    #     6: 'Overpass structure at an interchange',
-    #     7: 'Third level (Interchange)',
-    #     8: 'Fourth level (Interchange)',
-    #     9: 'Building or plaza',
-    #     0: 'Other'
-    # })
+    # df['SERVICE_ON'] = decode(df['SERVICE_ON'], SERVICE_TYPES)
 
     # update structure material
-    df['STRUCTUR_2'] = df['STRUCTUR_2'].replace({
-        1: 'Concrete',
-        2: 'Concrete continuous',
-        3: 'Steel',
-        4: 'Steel continuous',
-        5: 'Prestressed concrete (post-tension)',
-        6: 'Prestressed concrete continuous (post-tension)',
-        7: 'Wood or Timber',
-        8: 'Masonry',
-        9: 'Aluminum, Wrought Iron, or Cast Iron',
-        0: 'Other'
-    })
+    df['STRUCTUR_2'] = decode(df['STRUCTUR_2'], MATERIALS)
 
     # update structure type
-    df['STRUCTUR_3'] = df['STRUCTUR_3'].replace({
-        1: 'Slab',
-        2: 'Stringer/Multi-beam or Girder',
-        3: 'Girder and Floorbeam System',
-        4: 'Tee Beam',
-        5: 'Box Beam or Girders - Multiple',
-        6: 'Box Beam or Girders - Single or Spread',
-        7: 'Frame (except frame culverts)',
-        8: 'Orthotropic',
-        9: 'Truss - Deck',
-        10: 'Truss - Thru',
-        11: 'Arch - Deck',
-        12: 'Arch - Thru',
-        13: 'Suspension',
-        14: 'Stayed Girder',
-        15: 'Movable - Lift',
-        16: 'Movable - Bascule',
-        17: 'Movable - Swing',
-        18: 'Tunnel',
-        19: 'Culvert (includes frame culverts)',
-        20: 'Mixed types',
-        21: 'Segmental Box Girder',
-        22: 'Channel Beam',
-        0: 'Other'
-    })
+    df['STRUCTUR_3'] = decode(df['STRUCTUR_3'], STRUCTURE_TYPES)
 
     # # update approach material
-    # df['APPR_KIND_'] = df['APPR_KIND_'].replace({
-    #     1: 'Concrete',
-    #     2: 'Concrete continuous',
-    #     3: 'Steel',
-    #     4: 'Steel continuous',
-    #     5: 'Prestressed concrete (post-tension)',
-    #     6: 'Prestressed concrete continuous (post-tension)',
-    #     7: 'Wood or Timber',
-    #     8: 'Masonry',
-    #     9: 'Aluminum, Wrought Iron, or Cast Iron',
-    #     0: 'Other'
-    # })
+    # df['APPR_KIND_'] = decode(df['APPR_KIND_'], MATERIALS)
 
     # # update approach type
-    # df['APPR_TYPE_'] = df['APPR_TYPE_'].replace({
-    #     1: 'Slab',
-    #     2: 'Stringer/Multi-beam or Girder',
-    #     3: 'Girder and Floorbeam System',
-    #     4: 'Tee Beam',
-    #     5: 'Box Beam or Girders - Multiple',
-    #     6: 'Box Beam or Girders - Single or Spread',
-    #     7: 'Frame (except frame culverts)',
-    #     8: 'Orthotropic',
-    #     9: 'Truss - Deck',
-    #     10: 'Truss - Thru',
-    #     11: 'Arch - Deck',
-    #     12: 'Arch - Thru',
-    #     13: 'Suspension',
-    #     14: 'Stayed Girder',
-    #     15: 'Movable - Lift',
-    #     16: 'Movable - Bascule',
-    #     17: 'Movable - Swing',
-    #     18: 'Tunnel',
-    #     19: 'Culvert (includes frame culverts)',
-    #     20: 'Mixed types',
-    #     21: 'Segmental Box Girder',
-    #     22: 'Channel Beam',
-    #     0: 'Other'
-    # })
+    # df['APPR_TYPE_'] = decode(df['APPR_TYPE_'], STRUCTURE_TYPES)
 
     # add verbose structural rating 
-    df['STRUCTURAL'] = df['STRUCTURAL'].replace({'*': '-1'}) # change 'none' to number
-    df['STRUCTURAL'] = pd.to_numeric(df['STRUCTURAL']) # make ratings numeric
-    df['eval_rating_v'] = df['STRUCTURAL']
-
-    df['eval_rating_v'] = df['eval_rating_v'].replace({
-        -1: 'None',
-        0: 'Failed',
-        1: 'Imminent Failure',
-        2: 'Critical',
-        3: 'Serious',
-        4: 'Poor',
-        5: 'Fair',
-        6: 'Satisfactory',
-        7: 'Good',
-        8: 'Very Good',
-        9: 'Excellent'
-    })
+    df['STRUCTURAL'] = rating_numbers(df['STRUCTURAL'], '*') # make ratings numeric, 'none' is -1
+    df['eval_rating_v'] = decode(df['STRUCTURAL'], RATINGS)
 
     # change condition rating to verbose
-    df['DECK_COND_'] = df['DECK_COND_'].replace({'N': '-1'}) # change 'none' to number
-    df['DECK_COND_'] = pd.to_numeric(df['DECK_COND_']) # make ratings numeric
-    # df['DECK_COND_'] = df['DECK_COND_'].replace({
-    #     -1: 'None',
-    #     0: 'Failed',
-    #     1: 'Imminent Failure',
-    #     2: 'Critical',
-    #     3: 'Serious',
-    #     4: 'Poor',
-    #     5: 'Fair',
-    #     6: 'Satisfactory',
-    #     7: 'Good',
-    #     8: 'Very Good',
-    #     9: 'Excellent'
-    # })
-    df['SUPERSTRUC'] = df['SUPERSTRUC'].replace({'N': '-1'}) # change 'none' to number
-    df['SUPERSTRUC'] = pd.to_numeric(df['SUPERSTRUC']) # make ratings numeric
-    # df['SUPERSTRUC'] = df['SUPERSTRUC'].replace({
-    #     -1: 'None',
-    #     0: 'Failed',
-    #     1: 'Imminent Failure',
-    #     2: 'Critical',
-    #     3: 'Serious',
-    #     4: 'Poor',
-    #     5: 'Fair',
-    #     6: 'Satisfactory',
-    #     7: 'Good',
-    #     8: 'Very Good',
-    #     9: 'Excellent'
-    # })
-    df['SUBSTRUCTU'] = df['SUBSTRUCTU'].replace({'N': '-1'}) # change 'none' to number
-    df['SUBSTRUCTU'] = pd.to_numeric(df['SUBSTRUCTU']) # make ratings numeric
-    # df['SUBSTRUCTU'] = df['SUBSTRUCTU'].replace({
-    #     -1: 'None',
-    #     0: 'Failed',
-    #     1: 'Imminent Failure',
-    #     2: 'Critical',
-    #     3: 'Serious',
-    #     4: 'Poor',
-    #     5: 'Fair',
-    #     6: 'Satisfactory',
-    #     7: 'Good',
-    #     8: 'Very Good',
-    #     9: 'Excellent'
-    # })
+    df['DECK_COND_'] = rating_numbers(df['DECK_COND_'], 'N') # make ratings numeric, 'none' is -1
+    # df['DECK_COND_'] = decode(df['DECK_COND_'], RATINGS)
+    df['SUPERSTRUC'] = rating_numbers(df['SUPERSTRUC'], 'N') # make ratings numeric, 'none' is -1
+    # df['SUPERSTRUC'] = decode(df['SUPERSTRUC'], RATINGS)
+    df['SUBSTRUCTU'] = rating_numbers(df['SUBSTRUCTU'], 'N') # make ratings numeric, 'none' is -1
+    # df['SUBSTRUCTU'] = decode(df['SUBSTRUCTU'], RATINGS)
 
     return df
 
 if __name__ == "__main__":
-  main(opt["--in_file"], opt["--out_file"])
\ No newline at end of file
+  opt = docopt(__doc__)
+  main(opt["--in_file"], opt["--out_file"], int(opt["--chunk_size"]), opt["--incremental"], int(opt["--workers"]))
\ No newline at end of file
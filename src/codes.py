@@ -0,0 +1,312 @@
+# Author: Austin Shih
+# Date: 18 Oct 2026
+
+"""National Bridge Inventory code tables and vectorized decoding used by src/clean.py.
+Every column is decoded in one step: a lookup array is built over the code range of the column (or its
+distinct values when the codes are spread out) and indexed with the code array, so the Python level
+work is one entry per distinct code rather than one per bridge.
+"""
+
+import numpy as np
+import pandas as pd
+
+# state codes of the territories, dropped from the dataset
+TERRITORIES = [60, 64, 66, 68, 69, 70, 72, 74, 78]
+
+# two letter state codes
+STATE_ABV = {
+    1: 'AL',
+    2: 'AK',
+    4: 'AZ',
+    5: 'AR',
+    6: 'CA',
+    8: 'CO',
+    9: 'CT',
+    10: 'DE',
+    11: 'DC',
+    12: 'FL',
+    13: 'GA',
+    15: 'HI',
+    16: 'ID',
+    17: 'IL',
+    18: 'IN',
+    19: 'IA',
+    20: 'KS',
+    21: 'KY',
+    22: 'LA',
+    23: 'ME',
+    24: 'MD',
+    25: 'MA',
+    26: 'MI',
+    27: 'MN',
+    28: 'MS',
+    29: 'MO',
+    30: 'MT',
+    31: 'NE',
+    32: 'NV',
+    33: 'NH',
+    34: 'NJ',
+    35: 'NM',
+    36: 'NY',
+    37: 'NC',
+    38: 'ND',
+    39: 'OH',
+    40: 'OK',
+    41: 'OR',
+    42: 'PA',
+    44: 'RI',
+    45: 'SC',
+    46: 'SD',
+    47: 'TN',
+    48: 'TX',
+    49: 'UT',
+    50: 'VT',
+    51: 'VA',
+    53: 'WA',
+    54: 'WV',
+    55: 'WI',
+    56: 'WY'
+}
+
+# state names (as in the January 2023 processed data)
+STATE_NAMES = {
+    1: 'Alabama',
+    2: 'Alaska',
+    4: 'Arizona',
+    5: 'Arkansas',
+    6: 'California',
+    8: 'Colorado',
+    9: 'Connecticut',
+    10: 'Delaware',
+    11: 'District of Columbia',
+    12: 'Florida',
+    13: 'Georgia',
+    15: 'Hawaii',
+    16: 'Idaho',
+    17: 'Illinois',
+    18: 'Indiana',
+    19: 'Iowa',
+    20: 'Kansas',
+    21: 'Kentucky',
+    22: 'Louisiana',
+    23: 'Maine',
+    24: 'Maryland',
+    25: 'Massachusett',
+    26: 'Michigan',
+    27: 'Minnesot',
+    28: 'Mississippi',
+    29: 'Missouri',
+    30: 'Montana',
+    31: 'Nebraska',
+    32: 'Nevada',
+    33: 'New Hampshire',
+    34: 'New Jersey',
+    35: 'New Mexico',
+    36: 'New York',
+    37: 'North Carolina',
+    38: 'North Dakota',
+    39: 'Ohio',
+    40: 'Oklahoma',
+    41: 'Oregon',
+    42: 'Pennsylvania',
+    44: 'Rhode Island',
+    45: 'South Carolina',
+    46: 'South Dakota',
+    47: 'Tennessee',
+    48: 'Texas',
+    49: 'Utah',
+    50: 'Vermont',
+    51: 'Virginia',
+    53: 'Washington',
+    54: 'West Virginia',
+    55: 'Wisconsin',
+    56: 'Wyoming'
+}
+
+# route prefix (type of highway/route) 5b
+ROUTE_TYPES = {
+    1: 'Interstate highway',
+    2: 'U.S. numbered highway',
+    3: 'State highway',
+    4: 'County highway',
+    5: 'City street',
+    6: 'Federal lands road',
+    7: 'State lands road',
+    8: 'Other'
+}
+
+# designated level of service 5c
+SERVICE_LEVELS = {
+    0: 'None',
+    1: 'Mainline',
+    2: 'Alternate',
+    3: 'Bypass',
+    4: 'Spur',
+    5: 'Business',
+    6: 'Ramp, Wye, Connector, etc.',
+    7: 'Service and/or unclassified frontage road'
+}
+
+# owner 22
+OWNERS = {
+    1: 'State Highway Agency',
+    2: 'County Highway Agency',
+    3: 'Town or Township Highway Agency',
+    4: 'City or Municipal Highway Agency',
+    11: 'State Park, Forest, or Reservation Agency',
+    12: 'Local Park, Forest, or Reservation Agency',
+    21: 'Other State Agencies',
+    25: 'Other Local Agencies',
+    26: 'Private (other than railroad)',
+    27: 'Railroad',
+    31: 'State Toll Authority',
+    32: 'Local Toll Authority',
+    60: 'Other Federal Agencies (not listed below)',
+    61: 'Indian Tribal Government',
+    62: 'Bureau of Indian Affairs',
+    63: 'Bureau of Fish and Wildlife',
+    64: 'U.S. Forest Service',
+    66: 'National Park Service',
+    67: 'Tennessee Valley Authority',
+    68: 'Bureau of Land Management',
+    69: 'Bureau of Reclamation',
+    70: 'Corps of Engineers (Civil)',
+    71: 'Corps of Engineers (Military)',
+    72: 'Air Force',
+    73: 'Navy/Marines',
+    74: 'Army',
+    75: 'NASA',
+    76: 'Metropolitan'
+}
+
+# type of service 'on' bridge 42a
+SERVICE_TYPES = {
+    1: 'Highway',
+    2: 'Railroad',
+    3: 'Pedestrian-bicycle',
+    4: 'Highway-railroad',
+    5: 'Highway-pedestrian',
+    6: 'Overpass structure at an interchange',
+    7: 'Third level (Interchange)',
+    8: 'Fourth level (Interchange)',
+    9: 'Building or plaza',
+    0: 'Other'
+}
+
+# structure kind (material) 43a, approach kind 44a
+MATERIALS = {
+    1: 'Concrete',
+    2: 'Concrete continuous',
+    3: 'Steel',
+    4: 'Steel continuous',
+    5: 'Prestressed concrete (post-tension)',
+    6: 'Prestressed concrete continuous (post-tension)',
+    7: 'Wood or Timber',
+    8: 'Masonry',
+    9: 'Aluminum, Wrought Iron, or Cast Iron',
+    0: 'Other'
+}
+
+# structure type 43b, approach type 44b
+STRUCTURE_TYPES = {
+    1: 'Slab',
+    2: 'Stringer/Multi-beam or Girder',
+    3: 'Girder and Floorbeam System',
+    4: 'Tee Beam',
+    5: 'Box Beam or Girders - Multiple',
+    6: 'Box Beam or Girders - Single or Spread',
+    7: 'Frame (except frame culverts)',
+    8: 'Orthotropic',
+    9: 'Truss - Deck',
+    10: 'Truss - Thru',
+    11: 'Arch - Deck',
+    12: 'Arch - Thru',
+    13: 'Suspension',
+    14: 'Stayed Girder',
+    15: 'Movable - Lift',
+    16: 'Movable - Bascule',
+    17: 'Movable - Swing',
+    18: 'Tunnel',
+    19: 'Culvert (includes frame culverts)',
+    20: 'Mixed types',
+    21: 'Segmental Box Girder',
+    22: 'Channel Beam',
+    0: 'Other'
+}
+
+# condition ratings 58-60 and structural evaluation 67, -1 for N or *
+RATINGS = {
+    -1: 'None',
+    0: 'Failed',
+    1: 'Imminent Failure',
+    2: 'Critical',
+    3: 'Serious',
+    4: 'Poor',
+    5: 'Fair',
+    6: 'Satisfactory',
+    7: 'Good',
+    8: 'Very Good',
+    9: 'Excellent'
+}
+
+# route number prefix by route type
+ROUTE_PREFIXES = {
+    1: 'I- ',
+    2: 'US Hwy ',
+    3: 'State Rte/Hwy '
+}
+
+# lookup array of label(key) over the codes in values, and the index of every value into it. The
+# lookup covers the code range when it is shorter than the column, the distinct codes otherwise
+def _lookup(values, label):
+    values = np.asarray(values)
+    low, high = int(values.min()), int(values.max())
+    if high - low < len(values):
+        keys, index = np.arange(low, high + 1), values - low
+    else:
+        keys, index = np.unique(values, return_inverse=True)
+    return np.array([label(key) for key in keys.tolist()], dtype=object), index
+
+# decode an integer code column with a code table, codes missing from the table are kept as they are
+def decode(values, table):
+    values = np.asarray(values)
+    if values.dtype.kind not in 'iu':
+        return pd.Series(values).replace(table).to_numpy()
+    if not len(values):
+        return values.astype(object)
+    lookup, index = _lookup(values, lambda key: table.get(key, key))
+    return lookup[index]
+
+# zero padded text of integer codes, as str(code).zfill(width)
+def zero_pad(values, width):
+    values = np.asarray(values)
+    if not len(values):
+        return values.astype(object)
+    lookup, index = _lookup(values, lambda key: str(key).zfill(width))
+    return lookup[index]
+
+# numeric ratings from rating text, none_code ('N' or '*') and blank ratings become -1. The text is
+# converted once per distinct value. The result is always int8 (the snapshot dtype), so every chunk
+# or state writes a rating the same way whether or not it has blank ratings
+def rating_numbers(values, none_code):
+    codes, uniques = pd.factorize(np.asarray(values, dtype=object), use_na_sentinel=False)
+    numbers = pd.to_numeric(pd.Series(uniques, dtype=object).replace({none_code: '-1'}))
+    return numbers.fillna(-1).to_numpy(dtype=np.int8)[codes]
+
+# five digit county fips text from state and county codes (county codes have three digits)
+def fips_codes(state_code, county_code):
+    return zero_pad(np.asarray(state_code) * 1000 + np.asarray(county_code), 5)
+
+# full route numbers: leading zeros removed and the prefix of the route type added
+def route_numbers(route_pref, route_numb):
+    codes, numbers = pd.factorize(np.asarray(route_numb, dtype=object), use_na_sentinel=False)
+    stripped = [str(number).lstrip('0') for number in numbers]
+
+    # one row of labels per route prefix, row 0 without prefix
+    labels = np.empty((len(ROUTE_PREFIXES) + 1, len(stripped)), dtype=object)
+    row = np.zeros(len(codes), dtype=np.intp)
+    labels[0] = stripped
+    for i, (code, prefix) in enumerate(ROUTE_PREFIXES.items(), start=1):
+        labels[i] = [prefix + number for number in stripped]
+        row[np.asarray(route_pref) == code] = i
+    return labels[row, codes]
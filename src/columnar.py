@@ -0,0 +1,50 @@
+# Author: Austin Shih
+# Date: 18 Oct 2026
+
+"""Compact columnar encoding of the heatmap filter columns for the client-side filtering mode.
+The columns are sent once with the page layout as base64 typed arrays (category codes, int16 year
+and spans, float32 length, int8 rating) and filtered in the browser by assets/clientside.js; the
+server only sends the county geometry when the state selection changes.
+"""
+
+import os
+import numpy as np
+
+from src.serialize import narrow, typed_array
+
+# filter and aggregate the heatmap in the browser
+CLIENTSIDE = os.environ.get('BRIDGEMAP_CLIENTSIDE', '0') == '1'
+
+# slider columns and their browser dtypes
+RANGE_DTYPES = {
+    'year_built': np.int16,
+    'bridge_length': np.float32,
+    'num_span': np.int16,
+    'eval_rating': np.int8
+}
+
+
+# typed array columns and lookup tables used by the client-side heatmap callback
+def encode_columns(df, engine, cube):
+    columns = {'county': typed_array(narrow(cube.row_fips))}
+    tables = {}
+
+    # dropdown columns as codes into the sorted category tables of the filter engine
+    for col in ['route_type', 'bridge_type', 'route_num']:
+        columns[col] = typed_array(narrow(engine.codes[col]))
+        tables[col] = engine.categories[col].tolist()
+    for col, dtype in RANGE_DTYPES.items():
+        columns[col] = typed_array(df[col].to_numpy().astype(dtype))
+
+    # per county state and mean location of the rated bridges (map centre of state selections)
+    rated = cube.row_rated
+    n_rated = np.maximum(np.bincount(cube.row_fips[rated], minlength=len(cube.fips)), 1)
+    states, county_state = np.unique(cube.fips_state_name, return_inverse=True)
+    tables['state_name'] = states.tolist()
+    counties = {
+        'fips': cube.fips.tolist(),
+        'state': county_state.tolist(),
+        'latitude': (np.bincount(cube.row_fips[rated], weights=cube.row_lat[rated], minlength=len(cube.fips)) / n_rated).round(4).tolist(),
+        'longitude': (np.bincount(cube.row_fips[rated], weights=cube.row_lon[rated], minlength=len(cube.fips)) / n_rated).round(4).tolist()
+    }
+    return {'n_rows': len(df), 'columns': columns, 'tables': tables, 'counties': counties}
@@ -0,0 +1,202 @@
+# Author: Austin Shih
+# Date: 18 Oct 2026
+
+"""Vendors the US county GeoJSON used by the heatmap and writes topology-preserving simplified levels
+Usage: src/counties.py --out_dir=<out_dir>
+Options:
+--out_dir=<out_dir>      Path to directory where the county geometry levels should be written
+"""
+
+# python src/counties.py --out_dir=data/processed
+
+# County borders are split into arcs at the points where three or more borders meet,
+# every arc is simplified once (Douglas-Peucker with fixed end points) and the rings are
+# rebuilt from the simplified arcs, so neighbouring counties keep sharing the same edge
+# and no gaps or overlaps open up between them.
+
+from urllib.request import urlopen
+import numpy as np
+import json
+import os
+
+COUNTIES_URL = 'https://raw.githubusercontent.com/plotly/datasets/master/geojson-counties-fips.json'
+COUNTIES_DIR = 'data/processed'
+
+# simplification tolerance (degrees) and coordinate precision for each level
+LEVELS = {
+    'full':   (0, None),
+    'fine':   (0.005, 4),
+    'coarse': (0.02, 3)
+}
+
+# levels the app draws: coarse at national zoom, fine at state zoom
+APP_LEVELS = ('coarse', 'fine')
+
+def main(out_dir):
+
+    print('downloading county geometry...')
+    counties = download_counties()
+
+    os.makedirs(out_dir, exist_ok=True)
+    for level, (tolerance, precision) in LEVELS.items():
+        print('writing {} level...'.format(level))
+        geojson = simplify_counties(counties, tolerance, precision)
+        path = level_path(level, out_dir)
+        with open(path, 'w') as f:
+            json.dump(geojson, f, separators=(',', ':'))
+        print('  {:>8} vertices, {:>10} bytes'.format(count_vertices(geojson), os.path.getsize(path)))
+
+# download full resolution county geometry
+def download_counties(url=COUNTIES_URL):
+    with urlopen(url) as response:
+        return json.load(response)
+
+# file name of a simplification level
+def level_path(level, directory=COUNTIES_DIR):
+    return os.path.join(directory, 'counties_{}.json'.format(level))
+
+# load the given levels as {level: {fips: feature}}; the levels are written by the build step, they
+# are never downloaded here since the app imports this at startup
+def load_counties(directory=COUNTIES_DIR, levels=APP_LEVELS):
+    missing = [level_path(level, directory) for level in levels if not os.path.exists(level_path(level, directory))]
+    if missing:
+        raise FileNotFoundError('county geometry not found ({}), run: python src/counties.py --out_dir={}'.format(
+            ', '.join(missing), directory))
+    features = {}
+    for level in levels:
+        with open(level_path(level, directory)) as f:
+            features[level] = index_features(json.load(f))
+    return features
+
+# features keyed by county fips
+def index_features(geojson):
+    return {feature['id']: feature for feature in geojson['features']}
+
+# feature collection for the selected counties only
+def county_geojson(features, fips):
+    return {
+        'type': 'FeatureCollection',
+        'features': [features[f] for f in fips if f in features]
+    }
+
+# polygon rings of a feature geometry
+def geometry_rings(geometry):
+    if geometry['type'] == 'Polygon':
+        return [geometry['coordinates']]
+    return geometry['coordinates']
+
+# number of vertices in a feature collection
+def count_vertices(geojson):
+    return sum(len(ring) for feature in geojson['features']
+               for polygon in geometry_rings(feature['geometry']) for ring in polygon)
+
+# simplify all county borders with shared arcs
+def simplify_counties(geojson, tolerance, precision=None):
+    if tolerance == 0:
+        return geojson
+
+    # open rings as tuples, consecutive duplicate points removed
+    rings = {}
+    for i, feature in enumerate(geojson['features']):
+        for j, polygon in enumerate(geometry_rings(feature['geometry'])):
+            for k, ring in enumerate(polygon):
+                points = [tuple(p[:2]) for p in ring]
+                points = [p for n, p in enumerate(points) if n == 0 or p != points[n - 1]]
+                if len(points) > 1 and points[0] == points[-1]:
+                    points = points[:-1]
+                rings[(i, j, k)] = points
+
+    # junctions are points with more than two distinct neighbours
+    neighbours = {}
+    for points in rings.values():
+        for n, p in enumerate(points):
+            neighbours.setdefault(p, set()).update((points[n - 1], points[(n + 1) % len(points)]))
+    junctions = {p for p, near in neighbours.items() if len(near) > 2}
+
+    # simplify every ring arc by arc
+    arc_cache = {}
+    simple_rings = {}
+    for key, points in rings.items():
+        ring = simplify_ring(points, junctions, tolerance, arc_cache)
+        if len(ring) < 4:
+            ring = points + [points[0]]
+        if precision is not None:
+            ring = [[round(x, precision), round(y, precision)] for x, y in ring]
+        else:
+            ring = [list(p) for p in ring]
+        simple_rings[key] = ring
+
+    # rebuild features
+    features = []
+    for i, feature in enumerate(geojson['features']):
+        geometry = feature['geometry']
+        polygons = [[simple_rings[(i, j, k)] for k in range(len(polygon))]
+                    for j, polygon in enumerate(geometry_rings(geometry))]
+        coordinates = polygons[0] if geometry['type'] == 'Polygon' else polygons
+        features.append({
+            'type': 'Feature',
+            'id': feature['id'],
+            'properties': feature.get('properties', {}),
+            'geometry': {'type': geometry['type'], 'coordinates': coordinates}
+        })
+    return {'type': 'FeatureCollection', 'features': features}
+
+# split a ring at junctions, simplify the arcs and join them back into a closed ring
+def simplify_ring(points, junctions, tolerance, arc_cache):
+    if len(points) < 3:
+        return points + points[:1]
+    starts = [n for n, p in enumerate(points) if p in junctions]
+    if not starts:
+        # ring without junctions: start at the smallest point so shared rings split the same way
+        starts = [points.index(min(points))]
+    points = points[starts[0]:] + points[:starts[0]]
+    starts = [n - starts[0] for n in starts]
+    bounds = starts + [len(points)]
+    points = points + points[:1]
+
+    ring = [points[0]]
+    for a, b in zip(bounds[:-1], bounds[1:]):
+        ring.extend(simplify_arc(points[a:b + 1], tolerance, arc_cache)[1:])
+    return ring
+
+# simplify one arc, shared arcs are simplified once in a canonical direction
+def simplify_arc(arc, tolerance, arc_cache):
+    reverse = arc[::-1]
+    forward = arc <= reverse
+    key = tuple(arc if forward else reverse)
+    if key not in arc_cache:
+        coords = np.array(key, dtype=float)
+        arc_cache[key] = [key[n] for n in douglas_peucker(coords, tolerance)]
+    simple = arc_cache[key]
+    return simple if forward else simple[::-1]
+
+# indices of the points kept by the Douglas-Peucker algorithm (end points always kept)
+def douglas_peucker(coords, tolerance):
+    keep = np.zeros(len(coords), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(coords) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        start, end = coords[first], coords[last]
+        segment = coords[first + 1:last]
+        direction = end - start
+        length = np.hypot(direction[0], direction[1])
+        if length == 0:
+            dist = np.hypot(segment[:, 0] - start[0], segment[:, 1] - start[1])
+        else:
+            dist = np.abs(direction[0] * (segment[:, 1] - start[1]) - direction[1] * (segment[:, 0] - start[0])) / length
+        far = int(np.argmax(dist))
+        if dist[far] > tolerance:
+            mid = first + 1 + far
+            keep[mid] = True
+            stack.append((first, mid))
+            stack.append((mid, last))
+    return np.flatnonzero(keep)
+
+# docopt is only needed on the command line, the app imports this module
+if __name__ == "__main__":
+    from docopt import docopt
+    opt = docopt(__doc__)
+    main(opt['--out_dir'])
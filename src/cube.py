@@ -0,0 +1,258 @@
+# Author: Austin Shih
+# Date: 18 Oct 2026
+
+"""Pre-aggregated county cube for the heatmap.
+Bridge counts and rating/location sums are stored per fips x route type x bridge type cell. A
+heatmap query with the sliders at their full range sums the matching cells, so its cost depends on
+the number of cells rather than the number of bridges. Any other selection (a moved slider or a
+highway number) is answered by aggregating the rows selected by the filter engine: every slider bin
+or the route number multiplies the cells until there is about one cell per bridge.
+The cube is small enough to be written to disk as the national summary of the state partitioned data.
+"""
+
+import json
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from pyarrow import feather
+
+from src.dataset import fips_labels
+from src.serialize import narrow
+from src.filters import selected_states
+
+# dropdown dimensions of the cube
+CATEGORY_DIMS = ['state_name', 'route_type', 'bridge_type']
+
+# slider columns, the cube only answers them at their full range
+RANGE_DIMS = ['year_built', 'bridge_length', 'num_span', 'eval_rating']
+
+
+class CountyCube:
+
+    def __init__(self, df, category_dims=CATEGORY_DIMS):
+        self.n_rows = len(df)
+        self.category_dims = list(category_dims)
+
+        # per row county codes and values for the row level fallback
+        fips_codes, fips = pd.factorize(df['fips'].to_numpy(), sort=True)
+        self.fips = fips_labels(fips)
+        self.row_fips = fips_codes.astype(np.int32)
+        self.row_rating = df['eval_rating'].to_numpy()
+        self.row_rated = self.row_rating != -1
+        self.row_lat = df['latitude'].to_numpy()
+        self.row_lon = df['longitude'].to_numpy()
+        self.row_length = df['bridge_length'].to_numpy()
+
+        # state of each county
+        first = np.unique(self.row_fips, return_index=True)[1]
+        self.fips_state_abv = np.asarray(df['state_abv'].iloc[first], dtype=object)
+        self.fips_state_name = np.asarray(df['state_name'].iloc[first], dtype=object)
+
+        # dimension codes of every row
+        dims = []
+        self.categories = {}
+        self.lookup = {}
+        for col in self.category_dims:
+            codes, categories = pd.factorize(df[col], sort=True, use_na_sentinel=False)
+            self.categories[col] = categories = np.asarray(categories, dtype=object)
+            self.lookup[col] = {value: code for code, value in enumerate(categories)}
+            dims.append((codes, len(categories)))
+        dims.append((self.row_fips, len(self.fips)))
+
+        # value range of every slider column
+        self.extents = {col: (df[col].min().item(), df[col].max().item()) for col in RANGE_DIMS}
+
+        # cells: unique dimension combinations with their aggregates
+        keys = np.ravel_multi_index([codes for codes, size in dims], [size for codes, size in dims])
+        keys, cells = np.unique(keys, return_inverse=True)
+        cell_dims = np.unravel_index(keys, [size for codes, size in dims])
+        self.cell_codes = dict(zip(self.category_dims + ['fips'], cell_dims))
+        rated = self.row_rated
+        self.cell_count = np.bincount(cells, minlength=len(keys))
+        self.cell_rated = np.bincount(cells[rated], minlength=len(keys))
+        self.cell_rating_sum = np.bincount(cells[rated], weights=self.row_rating[rated], minlength=len(keys))
+        self.cell_lat_sum = np.bincount(cells[rated], weights=self.row_lat[rated], minlength=len(keys))
+        self.cell_lon_sum = np.bincount(cells[rated], weights=self.row_lon[rated], minlength=len(keys))
+        self.cell_length_sum = np.bincount(cells, weights=self.row_length, minlength=len(keys))
+
+    def __len__(self):
+        return len(self.cell_count)
+
+    # county summary and bridge count from the cube, None when a slider range leaves out some bridges
+    # or a dropdown filters on a dimension the cube does not have
+    def query(self, state, route, b_type, year, length, span, rating, hwy_num='All'):
+        for col, value in (('route_type', route), ('bridge_type', b_type), ('route_num', hwy_num)):
+            if value != 'All' and col not in self.lookup:
+                return None
+        for col, (low, high) in zip(RANGE_DIMS, (year, length, span, rating)):
+            if low > self.extents[col][0] or high < self.extents[col][1]:
+                return None
+        mask = np.ones(len(self), dtype=bool)
+
+        # dropdown filters
+        states = selected_states(state)
+        if states:
+            codes = [self.lookup['state_name'][s] for s in states if s in self.lookup['state_name']]
+            mask &= np.isin(self.cell_codes['state_name'], codes)
+        for col, value in (('route_type', route), ('bridge_type', b_type), ('route_num', hwy_num)):
+            if value != 'All':
+                mask &= self.cell_codes[col] == self.lookup[col].get(value, -1)
+
+        # sum matching cells by county
+        fips = self.cell_codes['fips'][mask]
+        df_sum = self.make_summary(
+            np.bincount(fips, weights=self.cell_count[mask], minlength=len(self.fips)),
+            np.bincount(fips, weights=self.cell_rated[mask], minlength=len(self.fips)),
+            np.bincount(fips, weights=self.cell_rating_sum[mask], minlength=len(self.fips)),
+            np.bincount(fips, weights=self.cell_lat_sum[mask], minlength=len(self.fips)),
+            np.bincount(fips, weights=self.cell_lon_sum[mask], minlength=len(self.fips)),
+            np.bincount(fips, weights=self.cell_length_sum[mask], minlength=len(self.fips))
+        )
+        return df_sum, int(self.cell_count[mask].sum())
+
+    # county summary and bridge count of selected row positions
+    def summarize(self, rows):
+        rows = np.asarray(rows, dtype=np.intp)
+        fips = self.row_fips[rows]
+        rated = self.row_rated[rows]
+        rated_rows = rows[rated]
+        df_sum = self.make_summary(
+            np.bincount(fips, minlength=len(self.fips)),
+            np.bincount(fips[rated], minlength=len(self.fips)),
+            np.bincount(fips[rated], weights=self.row_rating[rated_rows], minlength=len(self.fips)),
+            np.bincount(fips[rated], weights=self.row_lat[rated_rows], minlength=len(self.fips)),
+            np.bincount(fips[rated], weights=self.row_lon[rated_rows], minlength=len(self.fips)),
+            np.bincount(fips, weights=self.row_length[rows], minlength=len(self.fips))
+        )
+        return df_sum, len(rows)
+
+    # summary dataframe of the counties with rated bridges
+    def make_summary(self, count, rated, rating_sum, lat_sum, lon_sum, length_sum):
+        return county_summary(self.fips, self.fips_state_abv, self.fips_state_name,
+                              count, rated, rating_sum, lat_sum, lon_sum, length_sum)
+
+    # write the cells and the dimension tables to a feather file, extra json metadata is kept with them.
+    # The per row arrays are not written, so a cube read back only answers cube queries
+    def write(self, path, metadata=None):
+        columns = {'code_' + col: narrow(codes) for col, codes in self.cell_codes.items()}
+        columns.update({name: narrow(getattr(self, name)) for name in CELL_SUMS})
+        dims = {
+            'n_rows': self.n_rows,
+            'category_dims': self.category_dims,
+            'categories': {col: [None if pd.isna(v) else v for v in values.tolist()]
+                           for col, values in self.categories.items()},
+            'extents': self.extents,
+            'fips': self.fips.tolist(),
+            'fips_state_abv': self.fips_state_abv.tolist(),
+            'fips_state_name': self.fips_state_name.tolist()
+        }
+        table = pa.table(columns).replace_schema_metadata({
+            'cube': json.dumps(dims, default=lambda v: v.item()),
+            'metadata': json.dumps(metadata or {})
+        })
+        feather.write_feather(table, path, compression='uncompressed')
+
+    # cube written by write and its extra metadata
+    @classmethod
+    def read(cls, path):
+        table = feather.read_table(path, memory_map=True)
+        dims = json.loads(table.schema.metadata[b'cube'])
+        cube = cls.__new__(cls)
+        cube.n_rows = dims['n_rows']
+        cube.category_dims = dims['category_dims']
+        cube.categories = {col: np.array([np.nan if v is None else v for v in values], dtype=object)
+                           for col, values in dims['categories'].items()}
+        cube.lookup = {col: {value: code for code, value in enumerate(values)} for col, values in cube.categories.items()}
+        cube.extents = {col: tuple(extent) for col, extent in dims['extents'].items()}
+        cube.fips = np.array(dims['fips'], dtype=object)
+        cube.fips_state_abv = np.array(dims['fips_state_abv'], dtype=object)
+        cube.fips_state_name = np.array(dims['fips_state_name'], dtype=object)
+        cube.cell_codes = {col: table.column('code_' + col).to_numpy()
+                           for col in cube.category_dims + ['fips']}
+        for name in CELL_SUMS:
+            setattr(cube, name, table.column(name).to_numpy())
+        return cube, json.loads(table.schema.metadata[b'metadata'])
+
+    # cube of several cubes of disjoint rows (e.g. the states of a table) with the cells and dimension
+    # tables only, like a cube read back. Cells with the same dimension values are added up; the cubes
+    # are taken one at a time, so their per row arrays are not all held at once
+    @classmethod
+    def merge(cls, cubes):
+        parts = [{name: getattr(part, name) for name in CUBE_TABLES + CELL_SUMS} for part in cubes]
+        cube = cls.__new__(cls)
+        cube.n_rows = sum(part['n_rows'] for part in parts)
+        cube.category_dims = parts[0]['category_dims']
+        cube.extents = {col: (min(part['extents'][col][0] for part in parts),
+                              max(part['extents'][col][1] for part in parts)) for col in RANGE_DIMS}
+
+        # dimension tables of all cubes, sorted as the factorized columns of one cube
+        cube.categories = {col: np.asarray(pd.Index(np.concatenate([part['categories'][col] for part in parts]))
+                                           .unique().sort_values(), dtype=object) for col in cube.category_dims}
+        cube.lookup = {col: {value: code for code, value in enumerate(values)} for col, values in cube.categories.items()}
+        labels = np.concatenate([part['fips'] for part in parts])
+        fips, first = np.unique(labels, return_index=True)
+        cube.fips = fips.astype(object)
+        cube.fips_state_abv = np.concatenate([part['fips_state_abv'] for part in parts])[first]
+        cube.fips_state_name = np.concatenate([part['fips_state_name'] for part in parts])[first]
+
+        # cell codes of every cube in the merged tables, then the sums of the cells with equal codes
+        sizes = [len(cube.categories[col]) for col in cube.category_dims] + [len(cube.fips)]
+        keys = np.concatenate([np.ravel_multi_index(
+            [pd.Index(cube.categories[col]).get_indexer(part['categories'][col])[part['cell_codes'][col]]
+             for col in cube.category_dims] + [np.searchsorted(fips, part['fips'])[part['cell_codes']['fips']]],
+            sizes) for part in parts])
+        keys, cells = np.unique(keys, return_inverse=True)
+        cube.cell_codes = dict(zip(cube.category_dims + ['fips'], np.unravel_index(keys, sizes)))
+        for name in CELL_SUMS:
+            sums = np.concatenate([part[name] for part in parts])
+            setattr(cube, name, np.bincount(cells, weights=sums, minlength=len(keys)).astype(sums.dtype))
+        return cube
+
+
+# dimension tables and cells of a cube, the attributes written by CountyCube.write
+CUBE_TABLES = ['n_rows', 'category_dims', 'categories', 'extents', 'fips', 'fips_state_abv', 'fips_state_name',
+               'cell_codes']
+
+# cell aggregates of a cube
+CELL_SUMS = ['cell_count', 'cell_rated', 'cell_rating_sum', 'cell_lat_sum', 'cell_lon_sum', 'cell_length_sum']
+
+# summary dataframe of the counties with rated bridges from per county sums: mean rating and location
+# of the rated bridges, number and total length of all bridges
+def county_summary(fips, state_abv, state_name, count, rated, rating_sum, lat_sum, lon_sum, length_sum):
+    keep = rated > 0
+    return pd.DataFrame({
+        'fips': fips[keep],
+        'state_abv': state_abv[keep],
+        'state_name': state_name[keep],
+        'eval_rating': rating_sum[keep] / rated[keep],
+        'latitude': lat_sum[keep] / rated[keep],
+        'longitude': lon_sum[keep] / rated[keep],
+        'count': count[keep].astype(np.int64),
+        'bridge_length': length_sum[keep]
+    })
+
+# columns of an arrow table read for summarize_table
+TABLE_COLUMNS = ['fips', 'state_abv', 'state_name', 'eval_rating', 'latitude', 'longitude', 'bridge_length']
+
+# county summary and bridge count of the rows of an arrow table (e.g. a filtered dataset scan), as
+# CountyCube.summarize. State names are taken from the first row of every county without
+# converting the text columns
+def summarize_table(table):
+    fips_codes, fips = pd.factorize(table.column('fips').to_numpy(), sort=True)
+    rating = table.column('eval_rating').to_numpy()
+    rated = rating != -1
+    first = np.empty(len(fips), dtype=np.intp)
+    first[fips_codes[::-1]] = np.arange(len(fips_codes))[::-1]
+    rated_fips = fips_codes[rated]
+    df_sum = county_summary(
+        fips_labels(fips),
+        table.column('state_abv').take(first).combine_chunks().to_numpy(zero_copy_only=False),
+        table.column('state_name').take(first).combine_chunks().to_numpy(zero_copy_only=False),
+        np.bincount(fips_codes, minlength=len(fips)),
+        np.bincount(rated_fips, minlength=len(fips)),
+        np.bincount(rated_fips, weights=rating[rated], minlength=len(fips)),
+        np.bincount(rated_fips, weights=table.column('latitude').to_numpy()[rated], minlength=len(fips)),
+        np.bincount(rated_fips, weights=table.column('longitude').to_numpy()[rated], minlength=len(fips)),
+        np.bincount(fips_codes, weights=table.column('bridge_length').to_numpy(), minlength=len(fips))
+    )
+    return df_sum, table.num_rows
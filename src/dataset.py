@@ -0,0 +1,86 @@
+# Author: Austin Shih
+# Date: 18 Oct 2026
+
+"""Helpers to read and write the processed National Bridge Inventory data.
+The cleaning script writes a typed columnar snapshot next to the .csv file so 
+the dashboard can start without downloading and parsing the csv. The snapshot is
+uncompressed and memory mapped read-only, so the gunicorn workers on one machine
+share its pages through the OS page cache. Snapshots can be written chunk by chunk as record batches
+of one file, so the whole table is never held in memory.
+"""
+
+import os
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from pyarrow import feather, ipc
+
+# processed data locations
+CSV_URL = 'https://raw.githubusercontent.com/austin-shih/bridgemap_data/main/data/processed/nbi_clean.csv'
+SNAPSHOT_PATH = 'data/processed/nbi_clean.feather'
+
+# dtypes of the processed bridge dataframe: low cardinality text as categoricals, fips as an integer
+# (zero padded labels are made per county with fips_labels) and feature_intersect in one arrow string buffer
+DTYPES = {"eval_rating_v":'category', "route_type":"category", 'eval_rating': np.int8, 'deck_condition': np.int8,
+          'superstructure_condition': np.int8, 'substructure_condition': np.int8, 'fips': np.int32,
+          'year_built': np.int16, 'num_span': np.int16, 'max_span': np.float16, 'bridge_length':np.float32,
+          'bridge_width': np.float16, 'state_fips': np.int8, 'county_code': np.int16,
+          'state_name': 'category', 'state_abv': 'category', 'route_num': 'category', 'bridge_type': 'category',
+          'bridge_material': 'category', 'owner': 'category', 'feature_intersect': 'string[pyarrow]'}
+
+# read processed csv file (local path or url)
+def read_csv(path=CSV_URL):
+    df = pd.read_csv(path, dtype=DTYPES)
+    # the parser only sorts the categories within each block of rows it reads, sort them over the file
+    for col in df.select_dtypes('category'):
+        df[col] = df[col].cat.reorder_categories(sorted(df[col].cat.categories))
+    return df
+
+# write typed columnar snapshot (Arrow IPC / Feather), uncompressed so it can be memory mapped
+def write_snapshot(df, path=SNAPSHOT_PATH):
+    df = df.astype(DTYPES).reset_index(drop=True)
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    df.to_feather(path, compression='uncompressed')
+
+# appends typed chunks (arrow tables of dataframes) to one uncompressed snapshot, every chunk as a
+# record batch. All chunks need the schema (and categories) of the first one
+class SnapshotWriter:
+
+    def __init__(self, path=SNAPSHOT_PATH):
+        self.path = path
+        self.writer = None
+
+    def write(self, table):
+        if self.writer is None:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self.writer = ipc.new_file(self.path, table.schema)
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+# read typed columnar snapshot: numeric columns are zero copy read-only views of the memory mapped
+# file and strings stay in their arrow buffers
+def read_snapshot(path=SNAPSHOT_PATH):
+    return to_pandas(feather.read_table(path, memory_map=True))
+
+# arrow table of a dataframe chunk for SnapshotWriter
+def to_arrow(df):
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+# dataframe of an arrow table or record batch of a snapshot
+def to_pandas(table):
+    return table.to_pandas(split_blocks=True, types_mapper={pa.string(): pd.StringDtype('pyarrow')}.get)
+
+# load local snapshot, fall back to the csv file when no snapshot exists
+def load_bridges(path=SNAPSHOT_PATH, url=CSV_URL):
+    if os.path.exists(path):
+        return read_snapshot(path)
+    return read_csv(url)
+
+# zero padded five digit county fips labels of integer fips codes
+def fips_labels(fips):
+    return np.char.zfill(np.asarray(fips).astype(str), 5).astype(object)
@@ -2,41 +2,179 @@
 # Date: 20 Feb 2022
 
 """ Downloads csv file from the web and saves contents to a local directory.
-Usage: download.py --out_file=<out_file>
+Usage: download.py --out_file=<out_file> [--url=<url>] [--chunk_size=<chunk_size>] [--retries=<retries>] [--force]
 Options:
---out_file=<out_file>     Path to write the contents to 
+--out_file=<out_file>        Path to write the contents to
+--url=<url>                  Url of the csv file, defaults to the National Bridge Inventory csv
+--chunk_size=<chunk_size>    Bytes written at a time [default: 1048576]
+--retries=<retries>          Times an interrupted download is resumed [default: 5]
+--force                      Download even when the remote file has not changed
 """
 
 # python src/download.py --out_file=data/raw/nbi_raw.csv
 
+# The file is streamed to <out_file>.part and renamed when complete. <out_file>.manifest.json
+# records the url, ETag / Last-Modified, size and sha256 of the file: an interrupted download
+# resumes from the end of the .part file with a Range request (If-Range guards against the remote
+# file changing in between), and a complete download is skipped when the server answers the
+# conditional request with 304 Not Modified.
+
 import requests
 from docopt import docopt
+from datetime import datetime
+import hashlib
+import json
+import time
 import os
-import pandas as pd
-
-opt = docopt(__doc__)
-
-def main(out_file):
-    
-    # file updated January 13, 2023
-    url = 'https://opendata.arcgis.com/api/v3/datasets/2467101f84e447aebf164a6680d2f59d_0/downloads/data?format=csv&spatialRefId=3857&where=1%3D1'
-    #check if URL is valid
-    try:
-        print('checking URL...') 
-        request = requests.get(url, stream=True)
-        request.status_code == 200
-        print("URL valid")
-    except Exception as ex: 
-        print("the URL provided is invalid")
-        print(ex)
-    
-    print('downloading csv file...')
-    data = pd.read_csv(url, header=0)
-    try:
-      data.to_csv(out_file, index = False)
-    except:
-      os.makedirs(os.path.dirname(out_file))
-      data.to_csv(out_file, index = False)
+
+# file updated January 13, 2023
+NBI_URL = 'https://opendata.arcgis.com/api/v3/datasets/2467101f84e447aebf164a6680d2f59d_0/downloads/data?format=csv&spatialRefId=3857&where=1%3D1'
+
+# seconds between progress lines
+PROGRESS_INTERVAL = 2
+
+# errors after which the download is resumed
+RESUMABLE = (requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError,
+             requests.exceptions.Timeout)
+
+def main(out_file, url=NBI_URL, chunk_size=1 << 20, retries=5, force=False):
+    print('downloading {}...'.format(url))
+    manifest = download(url, out_file, chunk_size, retries, force)
+    print('{} ({:.1f} MB, sha256 {})'.format(out_file, manifest['bytes'] / 1e6, manifest['sha256']))
+
+# download url to out_file unless it is unchanged, returns the manifest of the local file
+def download(url, out_file, chunk_size=1 << 20, retries=5, force=False):
+    manifest_file = out_file + '.manifest.json'
+    part_file = out_file + '.part'
+    manifest = read_manifest(manifest_file)
+    if manifest.get('url') != url:
+        manifest = {}
+
+    for attempt in range(retries + 1):
+        try:
+            headers = request_headers(manifest, out_file, part_file, force)
+            with requests.get(url, headers=headers, stream=True, timeout=60) as response:
+                if response.status_code == 304:
+                    print('remote file unchanged, skipping download')
+                    return manifest
+                if response.status_code == 416:
+                    # the partial file does not match the remote file any more, start over
+                    os.remove(part_file)
+                    continue
+                response.raise_for_status()
+
+                # an encoded body is decoded while streaming, the partial file can not be resumed
+                encoded = content_encoded(response)
+                if encoded and response.status_code == 206:
+                    os.remove(part_file)
+                    manifest['resumable'] = False
+                    continue
+                manifest = {
+                    'url': url,
+                    'etag': response.headers.get('ETag'),
+                    'last_modified': response.headers.get('Last-Modified'),
+                    'resumable': not encoded,
+                    'complete': False
+                }
+                write_manifest(manifest_file, manifest)
+                resume = response.status_code == 206
+                total = None if encoded else remote_size(response)
+                size, sha256 = stream_to_file(response, part_file, chunk_size, resume, total)
+        except RESUMABLE as ex:
+            if attempt == retries:
+                raise
+            print('download interrupted ({}), resuming...'.format(type(ex).__name__))
+            time.sleep(min(2 ** attempt, 30))
+            continue
+
+        if total is not None and size != total:
+            if attempt == retries:
+                raise IOError('incomplete download: {} of {} bytes'.format(size, total))
+            print('incomplete download ({} of {} bytes), resuming...'.format(size, total))
+            continue
+
+        os.replace(part_file, out_file)
+        manifest.update({
+            'bytes': size,
+            'sha256': sha256,
+            'downloaded': datetime.now().isoformat(timespec='seconds'),
+            'complete': True
+        })
+        write_manifest(manifest_file, manifest)
+        return manifest
+    raise IOError('download of {} failed after {} retries'.format(url, retries))
+
+# conditional request for a complete file, range request for a partial one. The body is asked for
+# without a content encoding so sizes and range offsets count the bytes of the file itself
+def request_headers(manifest, out_file, part_file, force):
+    headers = {'Accept-Encoding': 'identity'}
+    validator = manifest.get('etag') or manifest.get('last_modified')
+    if (os.path.exists(part_file) and not manifest.get('complete') and validator
+            and manifest.get('resumable', True)):
+        headers.update({'Range': 'bytes={}-'.format(os.path.getsize(part_file)), 'If-Range': validator})
+    elif (manifest.get('complete') and not force and os.path.exists(out_file)
+            and os.path.getsize(out_file) == manifest.get('bytes')):
+        if manifest.get('etag'):
+            headers['If-None-Match'] = manifest['etag']
+        if manifest.get('last_modified'):
+            headers['If-Modified-Since'] = manifest['last_modified']
+    return headers
+
+# whether the server compressed the body anyway, its sizes and ranges are then of the compressed bytes
+def content_encoded(response):
+    return response.headers.get('Content-Encoding', 'identity').lower() not in ('', 'identity')
+
+# size of the whole remote file, None when the server does not send it
+def remote_size(response):
+    content_range = response.headers.get('Content-Range')
+    if content_range and '/' in content_range and not content_range.endswith('/*'):
+        return int(content_range.rsplit('/', 1)[1])
+    if response.headers.get('Content-Length') and response.status_code == 200:
+        return int(response.headers['Content-Length'])
+    return None
+
+# append (206) or write (200) the response body to path, returns the file size and its sha256
+def stream_to_file(response, path, chunk_size, resume, total):
+    sha256 = hashlib.sha256()
+    size = 0
+    if resume:
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(chunk_size), b''):
+                sha256.update(block)
+                size += len(block)
+        print('resuming at {:.1f} MB'.format(size / 1e6))
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    start, last, received = time.perf_counter(), 0.0, 0
+    with open(path, 'ab' if resume else 'wb') as f:
+        for block in response.iter_content(chunk_size):
+            f.write(block)
+            sha256.update(block)
+            size += len(block)
+            received += len(block)
+            elapsed = time.perf_counter() - start
+            if elapsed - last >= PROGRESS_INTERVAL:
+                last = elapsed
+                print_progress(size, total, received / elapsed)
+    elapsed = time.perf_counter() - start
+    print_progress(size, total, received / elapsed if elapsed else 0)
+    return size, sha256.hexdigest()
+
+def print_progress(size, total, rate):
+    done = ' of {:.1f} MB ({:.0%})'.format(total / 1e6, size / total) if total else ''
+    print('  {:.1f} MB{} at {:.1f} MB/s'.format(size / 1e6, done, rate / 1e6), flush=True)
+
+def read_manifest(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def write_manifest(path, manifest):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(manifest, f, indent=1)
 
 if __name__ == "__main__":
-    main(opt['--out_file'])
\ No newline at end of file
+    opt = docopt(__doc__)
+    main(opt['--out_file'], opt['--url'] or NBI_URL, int(opt['--chunk_size']), int(opt['--retries']), opt['--force'])
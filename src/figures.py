@@ -0,0 +1,232 @@
+# Author: Austin Shih
+# Date: 18 Oct 2026
+
+"""Lean scatterplot and heatmap figure builders.
+The layout and colorbar are built once as a go.Figure and reused; marker sizes are computed once
+for the whole table. A request only fills the lat/lon/color/customdata arrays of the selected rows,
+skipping the dataframe validation and copies done by plotly.express. The data arrays are also
+available on their own for partial (Patch) figure updates.
+"""
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import plotly.express as px
+
+from src.serialize import compact_figure, narrow
+
+# default map centre (continental US)
+US_CENTRE = {"lat": 38, "lon": -95.7129}
+
+# scatterplot hover columns and number formats
+HOVER_DATA = [('state_name', None), ('eval_rating', None), ('eval_rating_v', None), ('deck_condition', None),
+              ('superstructure_condition', None), ('substructure_condition', None), ('bridge_material', None),
+              ('bridge_type', None), ('year_built', None), ('num_span', None), ('max_span', '%.3f'),
+              ('bridge_length', '%.3f'), ('bridge_width', '%.3f')]
+
+# largest marker diameter in pixels
+SIZE_MAX = 30
+
+SCATTER_COLORBAR = dict(title="Bridge Evaluation Rate",
+                        thicknessmode="pixels",
+                        lenmode="pixels",
+                        yanchor="top",y=1,
+                        ticks="outside",
+                        tickvals=[0,1,2,3,4,5,6,7,8,9],
+                        ticktext=['0-Failed', '1-"Imminent" Failure',
+                                  '2-Critical', '3-Serious',
+                                  '4-Poor', '5-Fair', '6-Satisfactory',
+                                  '7-Good', '8-Very Good', '9-Excellent'],
+                        dtick=10)
+
+HEATMAP_COLORBAR = dict(title="Bridge Evaluation Rate",
+                        thicknessmode="pixels",
+                        lenmode="pixels",
+                        yanchor="top",y=1,
+                        ticks="outside",
+                        tickvals=[0,1,2,3,4,5,6,7,8,9],
+                        ticktext=['0-Closed', '1-N/A',
+                                  '2-Intolerable, replacement', '3-Intolerable, corrective',
+                                  '4-Meets tolerable crit.', '5-Above tolerable crit.', '6-Equal min. crit.',
+                                  '7-Above min. crit.', '8-Equal desirable crit.', '9-Superior desirable crit.'],
+                        dtick=10)
+
+# change of the county mean rating between two releases (history store)
+CHANGE_COLORBAR = dict(title="Rating change",
+                       thicknessmode="pixels",
+                       lenmode="pixels",
+                       yanchor="top",y=1,
+                       ticks="outside")
+
+# color range of the rating change, larger changes are clipped
+CHANGE_RANGE = 2
+
+
+class HeatmapFigure:
+
+    def __init__(self):
+        # layout template shared by every heatmap figure
+        template = go.Figure()
+        template.update_layout(
+            mapbox=dict(style="carto-positron", center=US_CENTRE, zoom=3),
+            coloraxis=dict(colorscale=px.colors.diverging.RdBu, cmin=0, cmax=9, colorbar=HEATMAP_COLORBAR),
+            legend=dict(tracegroupgap=0),
+            height=700,
+            margin={"r":0,"t":60,"l":0,"b":0}
+        )
+        self.layout = template.to_plotly_json()['layout']
+        self.hovertemplate = ('<b>%{hovertext}</b><br><br>fips=%{location}<br>state_name=%{customdata[0]}<br>'
+                              'eval_rating=%{z}<br>count=%{customdata[1]}<extra></extra>')
+
+        # change view: diverging colors centred on no change
+        template.update_layout(coloraxis=dict(colorscale=px.colors.diverging.RdBu, cmin=-CHANGE_RANGE, cmax=CHANGE_RANGE,
+                                              colorbar=CHANGE_COLORBAR), overwrite=True)
+        self.change_layout = template.to_plotly_json()['layout']
+        self.change_hovertemplate = self.hovertemplate.replace('eval_rating=%{z}', 'rating change=%{z:+.2f}')
+
+    # county value arrays of the choropleth trace
+    def arrays(self, df_sum):
+        return {
+            'locations': df_sum['fips'].to_numpy(),
+            'z': df_sum['eval_rating'].to_numpy(),
+            'hovertext': df_sum['fips'].to_numpy(),
+            'customdata': np.column_stack([df_sum['state_name'].to_numpy().astype(str),
+                                           df_sum['count'].to_numpy().astype(str)]) if len(df_sum) else []
+        }
+
+    # full choropleth figure with the county geometry, change=True for the rating change view
+    def figure(self, df_sum, geojson, centre, zoom, change=False):
+        trace = dict(self.arrays(df_sum),
+                     type='choroplethmapbox',
+                     geojson=geojson,
+                     coloraxis='coloraxis',
+                     hovertemplate=self.change_hovertemplate if change else self.hovertemplate,
+                     subplot='mapbox')
+        layout = self.change_layout if change else self.layout
+        layout = dict(layout, mapbox=dict(layout['mapbox'], center=centre, zoom=zoom))
+        return {'data': [trace], 'layout': layout}
+
+
+class ScatterFigure:
+
+    # without a bridge table only grid and county clusters can be drawn
+    def __init__(self, df=None, compact=True):
+        self.compact = compact
+
+        # layout template shared by every scatter figure
+        template = go.Figure()
+        template.update_layout(
+            mapbox=dict(style="open-street-map", center=US_CENTRE, zoom=3),
+            coloraxis=dict(colorscale=px.colors.diverging.RdBu, cmin=0, cmax=9, colorbar=SCATTER_COLORBAR),
+            legend=dict(itemsizing='constant', tracegroupgap=0),
+            height=700,
+            margin={"r":0,"t":50,"l":0,"b":0}
+        )
+        self.layout = template.to_plotly_json()['layout']
+        self.hovertemplate = '<b>%{hovertext}</b><br><br>' + '<br>'.join(
+            ['latitude=%{lat}', 'longitude=%{lon}'] +
+            ['{}=%{{customdata[{}]}}'.format(col, i) for i, (col, fmt) in enumerate(HOVER_DATA)])
+        if df is None:
+            return
+
+        # per bridge arrays, marker size precomputed once
+        self.lat = df['latitude'].to_numpy()
+        self.lon = df['longitude'].to_numpy()
+        self.rating = df['eval_rating'].to_numpy()
+        self.size = df['bridge_length'].to_numpy().astype(np.float64) * 50
+        self.name = df['feature_intersect'].array
+        # hover columns dictionary encoded: formatted string per distinct value and a code per bridge
+        self.hover = []
+        for col, fmt in HOVER_DATA:
+            codes, values = pd.factorize(df[col], use_na_sentinel=False)
+            values = np.asarray(values)
+            table = np.char.mod(fmt, values) if fmt else values.astype(str)
+            self.hover.append((table, narrow(codes)))
+
+    # figure of individual bridges at row positions
+    def points(self, rows, zoom, revision=None):
+        return self.points_figure(self.point_arrays(rows), zoom, revision)
+
+    # per bridge arrays of the selected rows
+    def point_arrays(self, rows):
+        rows = np.asarray(rows, dtype=np.intp)
+        return {
+            'lat': self.lat[rows],
+            'lon': self.lon[rows],
+            'hovertext': self.name[rows].to_numpy(dtype=object, na_value=None),
+            'customdata': self.hover_text(rows),
+            'color': self.rating[rows],
+            'size': self.size[rows]
+        }
+
+    # figure of individual bridges from point_arrays, or the joined arrays of several tables
+    def points_figure(self, arrays, zoom, revision=None):
+        size = arrays['size']
+        trace = {
+            'type': 'scattermapbox',
+            'mode': 'markers',
+            'lat': arrays['lat'],
+            'lon': arrays['lon'],
+            'hovertext': arrays['hovertext'],
+            'customdata': arrays['customdata'],
+            'hovertemplate': self.hovertemplate,
+            'marker': {
+                'color': arrays['color'],
+                'coloraxis': 'coloraxis',
+                'size': size,
+                'sizemode': 'area',
+                'sizeref': 2.0 * size.max() / SIZE_MAX ** 2 if len(size) and size.max() > 0 else 1,
+                'opacity': 1
+            },
+            'showlegend': False,
+            'subplot': 'mapbox'
+        }
+        return self.figure(trace, zoom, revision)
+
+    # hover columns of the selected rows as one string array (serialized without per value conversion)
+    def hover_text(self, rows):
+        if not len(rows):
+            return []
+        return np.column_stack([table[codes[rows]] for table, codes in self.hover])
+
+    # figure of grid clusters from lod.cluster_bridges
+    def clusters(self, clusters, zoom, revision=None):
+        count = clusters['count'].to_numpy()
+        trace = {
+            'type': 'scattermapbox',
+            'mode': 'markers',
+            'lat': clusters['latitude'].to_numpy(),
+            'lon': clusters['longitude'].to_numpy(),
+            'customdata': np.column_stack([count, clusters['eval_rating'].to_numpy(), clusters['bridge_length'].to_numpy()]),
+            'hovertemplate': 'bridges=%{customdata[0]}<br>mean eval_rating=%{customdata[1]:.2f}<br>'
+                             'total bridge_length=%{customdata[2]:.1f}<extra></extra>',
+            'marker': {
+                'color': clusters['eval_rating'].to_numpy(),
+                'coloraxis': 'coloraxis',
+                'size': count,
+                'sizemode': 'area',
+                'sizeref': 2.0 * count.max() / SIZE_MAX ** 2 if len(count) else 1,
+                'opacity': 1
+            },
+            'showlegend': False,
+            'subplot': 'mapbox'
+        }
+        return self.figure(trace, zoom, revision)
+
+    # figure dict with the shared layout, centred on the plotted points like plotly.express
+    def figure(self, trace, zoom, revision):
+        lat, lon = trace['lat'], trace['lon']
+        centre = {'lat': float(np.mean(lat)), 'lon': float(np.mean(lon))} if len(lat) else US_CENTRE
+        layout = dict(self.layout, mapbox=dict(self.layout['mapbox'], center=centre, zoom=zoom))
+        if revision is not None:
+            layout['uirevision'] = revision
+        fig = {'data': [trace], 'layout': layout}
+        return compact_figure(fig) if self.compact else fig
+
+
+# point_arrays of several tables joined in order
+def join_points(parts):
+    arrays = {key: np.concatenate([part[key] for part in parts]) for key in parts[0] if key != 'customdata'}
+    customdata = [part['customdata'] for part in parts if len(part['customdata'])]
+    arrays['customdata'] = np.concatenate(customdata) if customdata else []
+    return arrays
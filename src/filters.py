@@ -0,0 +1,130 @@
+# Author: Austin Shih
+# Date: 18 Oct 2026
+
+"""Index based filter engine shared by the dashboard map callbacks.
+The indexes are built once when the data is loaded; a query combines them into a single
+array of selected row positions without creating intermediate dataframes.
+"""
+
+import numpy as np
+import pandas as pd
+import pyarrow.dataset as ds
+
+# columns filtered by dropdown value and by slider range
+CATEGORY_COLS = ['state_name', 'route_type', 'bridge_type', 'route_num']
+RANGE_COLS = ['year_built', 'bridge_length', 'num_span', 'eval_rating']
+
+# low cardinality columns get one packed row bitmap per value, the others sorted row lists
+BITMAP_COLS = ['state_name', 'route_type', 'bridge_type']
+
+
+class FilterEngine:
+
+    def __init__(self, df):
+        self.n_rows = len(df)
+        self.categories = {}
+        self.lookup = {}
+        self.codes = {}
+        self.bitmaps = {}
+        self.row_lists = {}
+        self.sorted_values = {}
+        self.sorted_rows = {}
+
+        # integer coded categories with per value row bitmaps / row lists
+        for col in CATEGORY_COLS:
+            codes, categories = pd.factorize(df[col], sort=True)
+            self.categories[col] = categories = np.asarray(categories, dtype=object)
+            self.lookup[col] = {value: code for code, value in enumerate(categories)}
+            self.codes[col] = codes.astype(np.int32)
+            if col in BITMAP_COLS:
+                self.bitmaps[col] = [np.packbits(codes == code) for code in range(len(categories))]
+            else:
+                order = np.argsort(codes, kind='stable')
+                bounds = np.searchsorted(codes[order], np.arange(len(categories) + 1))
+                self.row_lists[col] = [order[bounds[i]:bounds[i + 1]] for i in range(len(categories))]
+
+        # sorted values for binary searched range filters
+        for col in RANGE_COLS:
+            values = df[col].to_numpy()
+            if values.dtype.kind == 'f':
+                values = values.astype(np.float64)
+            order = np.argsort(values, kind='stable')
+            self.sorted_values[col] = values[order]
+            self.sorted_rows[col] = order
+
+    # row positions matching all filters
+    def query(self, state, route, b_type, year, length, span, rating, hwy_num='All'):
+
+        # dropdown filters, combined on the packed bitmaps
+        bitmap = None
+        states = selected_states(state)
+        if states:
+            bitmap = self.union_bitmap('state_name', states)
+        for col, value in (('route_type', route), ('bridge_type', b_type)):
+            if value != 'All':
+                value_bitmap = self.union_bitmap(col, [value])
+                bitmap = value_bitmap if bitmap is None else bitmap & value_bitmap
+        if bitmap is None:
+            mask = np.ones(self.n_rows, dtype=bool)
+        else:
+            mask = np.unpackbits(bitmap, count=self.n_rows).view(bool)
+
+        # slider filters
+        for col, (low, high) in zip(RANGE_COLS, (year, length, span, rating)):
+            self.range_filter(mask, col, low, high)
+
+        rows = np.flatnonzero(mask)
+
+        # route number filter
+        if hwy_num != 'All':
+            code = self.lookup['route_num'].get(hwy_num)
+            route_rows = self.row_lists['route_num'][code] if code is not None else np.empty(0, dtype=np.intp)
+            rows = np.intersect1d(rows, route_rows, assume_unique=True)
+        return rows
+
+    # packed bitmap of the rows matching any of the values
+    def union_bitmap(self, col, values):
+        bitmap = np.zeros((self.n_rows + 7) // 8, dtype=np.uint8)
+        for value in values:
+            code = self.lookup[col].get(value)
+            if code is not None:
+                bitmap |= self.bitmaps[col][code]
+        return bitmap
+
+    # clear rows outside [low, high] from mask using the sorted values
+    def range_filter(self, mask, col, low, high):
+        values = self.sorted_values[col]
+        start = np.searchsorted(values, low, side='left')
+        stop = np.searchsorted(values, high, side='right')
+        if start == 0 and stop == len(values):
+            return
+        rows = self.sorted_rows[col]
+        if stop - start < len(values) // 2:
+            inside = np.zeros(self.n_rows, dtype=bool)
+            inside[rows[start:stop]] = True
+            mask &= inside
+        else:
+            mask[rows[:start]] = False
+            mask[rows[stop:]] = False
+
+
+# state dropdown value as a list of state names, empty for all states
+def selected_states(state):
+    if isinstance(state, str):
+        state = [state]
+    if not state or 'All' in state:
+        return []
+    return list(state)
+
+# pyarrow expression of the map filters, for dataset scans of the partitioned or history data
+def filter_expression(state, route, b_type, year, length, span, rating, hwy_num='All'):
+    expr = ds.scalar(True)
+    states = selected_states(state)
+    if states:
+        expr &= ds.field('state_name').isin(states)
+    for col, value in (('route_type', route), ('bridge_type', b_type), ('route_num', hwy_num)):
+        if value != 'All':
+            expr &= ds.field(col) == value
+    for col, (low, high) in zip(RANGE_COLS, (year, length, span, rating)):
+        expr &= (ds.field(col) >= low) & (ds.field(col) <= high)
+    return expr
@@ -0,0 +1,105 @@
+# Author: Austin Shih
+# Date: 18 Oct 2026
+
+"""Adds a processed National Bridge Inventory release to the multi-release history store
+Usage: src/history.py --release=<release> [--snapshot=<snapshot>] [--store=<store>]
+Options:
+--release=<release>      Year of the release, an existing release of that year is replaced
+--snapshot=<snapshot>    Processed snapshot of the release [default: data/processed/nbi_clean.feather]
+--store=<store>          Directory of the history store, defaults to BRIDGEMAP_HISTORY_DIR
+"""
+
+# python src/history.py --release=2023
+# python src/download.py --out_file=data/raw/2021/nbi_raw.csv --url=<url of the 2021 release>
+# python src/clean.py --in_file=data/raw/2021 --out_file=data/releases/2021
+# python src/history.py --release=2021 --snapshot=data/releases/2021/nbi_clean.feather
+
+# Every release is written as parquet files partitioned by release year and state fips
+# (<store>/release=2021/state_fips=6/part-0.parquet). The app never loads a whole release: a query
+# is a pyarrow.dataset scan with the release, the selected states and the filter values as the
+# predicate, so only the partitions of that release and those states are opened, and only the
+# columns of the county summary are read. The directory listing is all that is kept in memory.
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import numpy as np
+import shutil
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.dataset import read_snapshot
+from src.filters import selected_states, filter_expression
+from src.cube import TABLE_COLUMNS, summarize_table
+from src.codes import STATE_NAMES
+
+HISTORY_PATH = os.environ.get('BRIDGEMAP_HISTORY_DIR', 'data/history')
+
+# hive style partition directories release=<year>/state_fips=<code>
+PARTITIONING = ds.partitioning(pa.schema([('release', pa.int16()), ('state_fips', pa.int8())]), flavor='hive')
+
+# rows per parquet row group, the statistics of a row group let a scan skip it
+ROW_GROUP_SIZE = 1 << 16
+
+# state fips of the state names written by src/clean.py
+STATE_FIPS = {name: code for code, name in STATE_NAMES.items()}
+
+
+class HistoryStore:
+
+    def __init__(self, path=HISTORY_PATH):
+        self.path = path
+        self.dataset = None
+        self.releases = []
+        if os.path.isdir(path):
+            self.dataset = ds.dataset(path, format='parquet', partitioning=PARTITIONING)
+            # release years from the release=<year> directory names
+            self.releases = sorted(int(name.split('=', 1)[1]) for name in os.listdir(path)
+                                   if name.startswith('release=') and os.listdir(os.path.join(path, name)))
+
+    # county summary and bridge count of a release in the CountyCube.query format
+    def county_summary(self, release, state, route, b_type, year, length, span, rating, hwy_num='All'):
+        return summarize_table(self.dataset.to_table(
+            columns=TABLE_COLUMNS,
+            filter=predicate(release, state, route, b_type, year, length, span, rating, hwy_num)))
+
+
+# pyarrow expression selecting the rows of a release that match the map filters; the release and
+# state terms are resolved against the partition directories
+def predicate(release, state, route, b_type, year, length, span, rating, hwy_num='All'):
+    expr = ds.field('release') == int(release)
+    states = selected_states(state)
+    if states:
+        expr &= ds.field('state_fips').isin([STATE_FIPS.get(s, -1) for s in states])
+    return expr & filter_expression(state, route, b_type, year, length, span, rating, hwy_num)
+
+# county change of the mean rating between two county summaries, counties rated in both
+def county_change(df_sum, base_sum):
+    change = df_sum.merge(base_sum[['fips', 'eval_rating']], on='fips', suffixes=('', '_base'))
+    change['eval_rating'] = change['eval_rating'] - change.pop('eval_rating_base')
+    return change
+
+# write a processed snapshot as one release of the store, replacing an earlier copy of the release
+def write_release(df, release, path=HISTORY_PATH):
+    # categoricals as plain text so the releases share one schema (parquet dictionary encodes them),
+    # parquet has no float16
+    types = {col: object for col in df.select_dtypes('category')}
+    types.update({col: np.float32 for col in df.select_dtypes(np.float16)})
+    df = df.astype(types).assign(release=np.int16(release))
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    shutil.rmtree(os.path.join(path, 'release={}'.format(int(release))), ignore_errors=True)
+    ds.write_dataset(table, path, format='parquet', partitioning=PARTITIONING,
+                     basename_template='part-{i}.parquet', existing_data_behavior='overwrite_or_ignore',
+                     min_rows_per_group=ROW_GROUP_SIZE, max_rows_per_group=ROW_GROUP_SIZE)
+
+def main(release, snapshot, path):
+    print('adding {} as release {}...'.format(snapshot, release))
+    write_release(read_snapshot(snapshot), int(release), path)
+    store = HistoryStore(path)
+    print('releases in {}: {}'.format(path, ', '.join(str(r) for r in store.releases)))
+
+# docopt is only needed on the command line, the app imports this module
+if __name__ == "__main__":
+    from docopt import docopt
+    opt = docopt(__doc__)
+    main(opt['--release'], opt['--snapshot'], opt['--store'] or HISTORY_PATH)
@@ -0,0 +1,100 @@
+# Author: Austin Shih
+# Date: 18 Oct 2026
+
+"""Background job queue for the map callbacks.
+Callbacks run on a bounded thread pool, keyed by browser session and output. When a newer job for
+the same key arrives, an older job still waiting in the queue is cancelled and an older job that is
+already running has its result dropped, so a burst of slider updates only computes what is shown.
+"""
+
+import os
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, CancelledError
+
+# worker threads computing map callbacks per process, 0 runs them in the request thread; by default
+# one per gunicorn request thread (threads in gunicorn.conf.py) so no request waits for a free job thread
+JOB_WORKERS = int(os.environ.get('BRIDGEMAP_JOB_WORKERS', os.environ.get('BRIDGEMAP_THREADS', 4)))
+
+
+# raised when a job was superseded by a newer job for the same key
+class JobDropped(Exception):
+    pass
+
+
+class JobQueue:
+
+    def __init__(self, workers=JOB_WORKERS):
+        self.workers = workers
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bridgemap-job') if workers else None
+        self.submitted = 0
+        self.completed = 0
+        self.cancelled = 0
+        self.dropped = 0
+        self.failed = 0
+        self.queued = 0
+        self.running = 0
+        self._generation = 0
+        self._latest = {}
+        self._lock = threading.Lock()
+
+    # run fn(*args) as the latest job of key and return its result, JobDropped when superseded
+    def run(self, key, fn, *args):
+        if self.executor is None:
+            return fn(*args)
+
+        with self._lock:
+            self._generation += 1
+            generation = self._generation
+            previous = self._latest.get(key)
+            if previous is not None and previous[1].cancel():
+                self.cancelled += 1
+                self.queued -= 1
+            self.submitted += 1
+            self.queued += 1
+            # dash reads the callback context from context variables, so the job runs in a copy
+            future = self.executor.submit(contextvars.copy_context().run, self._execute, key, generation, fn, args)
+            self._latest[key] = (generation, future)
+
+        try:
+            result = future.result()
+        except CancelledError:
+            raise JobDropped(key)
+        finally:
+            with self._lock:
+                if self._latest.get(key, (None,))[0] == generation:
+                    del self._latest[key]
+        if result is _SUPERSEDED:
+            raise JobDropped(key)
+        return result
+
+    # job body, the result is dropped when a newer job for the key arrived while it was running
+    def _execute(self, key, generation, fn, args):
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+        try:
+            result = fn(*args)
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            raise
+        finally:
+            with self._lock:
+                self.running -= 1
+        with self._lock:
+            if self._latest.get(key, (None,))[0] != generation:
+                self.dropped += 1
+                return _SUPERSEDED
+            self.completed += 1
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {'workers': self.workers, 'queued': self.queued, 'running': self.running,
+                    'submitted': self.submitted, 'completed': self.completed,
+                    'cancelled': self.cancelled, 'dropped': self.dropped, 'failed': self.failed}
+
+
+# result of a job superseded while it was running
+_SUPERSEDED = object()
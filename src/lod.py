@@ -0,0 +1,50 @@
+# Author: Austin Shih
+# Date: 18 Oct 2026
+
+"""Level of detail for the scatterplot.
+Above the point budget, bridges are aggregated into grid cells sized for the map zoom level and
+each cell is drawn as one marker with the bridge count, mean evaluation rating and total length.
+"""
+
+import os
+import numpy as np
+import pandas as pd
+
+# maximum number of individual bridges drawn on the scatterplot
+POINT_BUDGET = int(os.environ.get('BRIDGEMAP_POINT_BUDGET', 20000))
+
+# grid cells across one map tile width, larger values give smaller clusters
+CELLS_PER_TILE = 32
+
+
+# grid cell size in degrees for a mapbox zoom level
+def cell_size(zoom):
+    return 360 / (2 ** zoom * CELLS_PER_TILE)
+
+# aggregate the selected rows into grid cells
+def cluster_bridges(df, rows, zoom):
+    lat = df['latitude'].to_numpy()[rows]
+    lon = df['longitude'].to_numpy()[rows]
+    rating = df['eval_rating'].to_numpy()[rows]
+    length = df['bridge_length'].to_numpy()[rows]
+
+    # cell of every bridge
+    size = cell_size(zoom)
+    col = np.floor((lon + 180) / size).astype(np.int64)
+    row = np.floor((lat + 90) / size).astype(np.int64)
+    keys, cells = np.unique(row * (int(360 / size) + 1) + col, return_inverse=True)
+
+    # cell aggregates, rating mean over rated bridges only
+    rated = rating != -1
+    count = np.bincount(cells, minlength=len(keys))
+    rated_count = np.bincount(cells[rated], minlength=len(keys))
+    rating_sum = np.bincount(cells[rated], weights=rating[rated], minlength=len(keys))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rating_mean = rating_sum / rated_count
+    return pd.DataFrame({
+        'latitude': np.bincount(cells, weights=lat, minlength=len(keys)) / count,
+        'longitude': np.bincount(cells, weights=lon, minlength=len(keys)) / count,
+        'count': count,
+        'eval_rating': rating_mean,
+        'bridge_length': np.bincount(cells, weights=length, minlength=len(keys))
+    })
@@ -0,0 +1,137 @@
+# Author: Austin Shih
+# Date: 18 Oct 2026
+
+"""Per-stage timing of the map callbacks.
+Stage latencies, selected / plotted rows and response sizes are kept as histograms and served in
+the Prometheus text format at /metrics (one set per gunicorn worker process). The stages of a
+request are also returned in a Server-Timing header so browser devtools show the breakdown.
+"""
+
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+# histogram bucket upper bounds
+SECONDS_BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+ROWS_BUCKETS = [10, 100, 1000, 10000, 100000, 1000000, 10000000]
+BYTES_BUCKETS = [1000, 10000, 100000, 1000000, 10000000, 100000000]
+
+# timings of the request being handled, shared with the job threads through the copied context
+_request = contextvars.ContextVar('bridgemap_request', default=None)
+
+
+class Histogram:
+
+    def __init__(self, name, help, labels, buckets):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_values, value):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = {'counts': [0] * (len(self.buckets) + 1), 'sum': 0.0}
+            series['counts'][bisect.bisect_left(self.buckets, value)] += 1
+            series['sum'] += value
+
+    # prometheus text exposition lines
+    def render(self):
+        lines = ['# HELP {} {}'.format(self.name, self.help), '# TYPE {} histogram'.format(self.name)]
+        with self._lock:
+            for label_values, series in sorted(self._series.items()):
+                labels = ','.join('{}="{}"'.format(k, v) for k, v in zip(self.labels, label_values))
+                cumulative = 0
+                for bound, count in zip(self.buckets + ['+Inf'], series['counts']):
+                    cumulative += count
+                    lines.append('{}_bucket{{{},le="{}"}} {}'.format(self.name, labels, bound, cumulative))
+                lines.append('{}_sum{{{}}} {}'.format(self.name, labels, series['sum']))
+                lines.append('{}_count{{{}}} {}'.format(self.name, labels, cumulative))
+        return lines
+
+
+class Metrics:
+
+    def __init__(self):
+        self.stage_seconds = Histogram('bridgemap_stage_seconds', 'Map callback stage latency in seconds',
+                                       ['callback', 'stage'], SECONDS_BUCKETS)
+        self.rows = Histogram('bridgemap_rows', 'Bridges selected and plotted by a map callback',
+                              ['callback', 'stage'], ROWS_BUCKETS)
+        self.response_bytes = Histogram('bridgemap_response_bytes', 'Callback response payload in bytes',
+                                        ['callback'], BYTES_BUCKETS)
+        self.response_seconds = Histogram('bridgemap_response_seconds',
+                                          'Callback request latency including json serialization in seconds',
+                                          ['callback'], SECONDS_BUCKETS)
+
+    # label the current request with the callback handling it
+    def callback(self, name):
+        request = _request.get()
+        if request is not None:
+            request['callback'] = name
+
+    # time a callback stage
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            request = _request.get()
+            callback = request['callback'] if request is not None else 'none'
+            self.stage_seconds.observe((callback, name), elapsed)
+            if request is not None:
+                request['stages'].append((name, elapsed))
+
+    # record the number of rows coming out of a stage
+    def count(self, name, rows):
+        request = _request.get()
+        self.rows.observe((request['callback'] if request is not None else 'none', name), rows)
+
+    # prometheus text of all histograms plus gauges and counters {name: (help, value)}; counters only
+    # go up (until the process restarts) and are named <name>_total so rate() handles the resets
+    def render(self, gauges=None, counters=None):
+        lines = []
+        for histogram in (self.stage_seconds, self.rows, self.response_bytes, self.response_seconds):
+            lines.extend(histogram.render())
+        for kind, values in (('gauge', gauges), ('counter', counters)):
+            for name, (help, value) in (values or {}).items():
+                lines.extend(['# HELP {} {}'.format(name, help), '# TYPE {} {}'.format(name, kind),
+                              '{} {}'.format(name, value)])
+        return '\n'.join(lines) + '\n'
+
+    # time dash callback requests, add Server-Timing headers and serve /metrics on a flask server;
+    # gauges and counters are functions returning the current values
+    def instrument(self, server, gauges=None, counters=None):
+        from flask import Response, request
+
+        @server.before_request
+        def start_timing():
+            if request.path.endswith('/_dash-update-component'):
+                _request.set({'callback': 'other', 'start': time.perf_counter(), 'stages': []})
+
+        @server.after_request
+        def server_timing(response):
+            timings = _request.get()
+            if timings is None or not request.path.endswith('/_dash-update-component'):
+                return response
+            _request.set(None)
+            total = time.perf_counter() - timings['start']
+            self.response_seconds.observe((timings['callback'],), total)
+            if not response.direct_passthrough:
+                self.response_bytes.observe((timings['callback'],), response.calculate_content_length() or 0)
+            entries = ['{}-{};dur={:.2f}'.format(timings['callback'], name, seconds * 1000)
+                       for name, seconds in timings['stages']]
+            entries.append('total;dur={:.2f}'.format(total * 1000))
+            response.headers['Server-Timing'] = ', '.join(entries)
+            return response
+
+        @server.route('/metrics')
+        def metrics():
+            return Response(self.render(gauges() if gauges else None, counters() if counters else None),
+                            mimetype='text/plain; version=0.0.4')
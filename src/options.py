@@ -0,0 +1,63 @@
+# Author: Austin Shih
+# Date: 18 Oct 2026
+
+"""Precomputed option lists for the Highway Number dropdowns.
+The sorted route numbers of every (state, route type, bridge type) combination are built once,
+with 'All' route and bridge types included as keys. A dropdown lists the union of the selected
+states, filtered by the search text and loaded on demand, so the page layout only carries 'All'.
+"""
+
+import numpy as np
+import pandas as pd
+
+from src.filters import selected_states
+
+# largest number of route numbers listed in a dropdown, typing narrows the list
+OPTION_LIMIT = 100
+
+
+class RouteOptions:
+
+    def __init__(self, df):
+        route_codes, routes = pd.factorize(df['route_num'], sort=True)
+        self.routes = np.asarray(routes, dtype=object)
+        self.search_text = np.char.lower(np.asarray(routes, dtype=str))
+
+        # sorted route number codes per (state, route type, bridge type), 'All' for any type
+        keep = route_codes >= 0
+        keys = pd.DataFrame({
+            'state_name': np.asarray(df['state_name'], dtype=object)[keep],
+            'route_type': np.asarray(df['route_type'], dtype=object)[keep],
+            'bridge_type': np.asarray(df['bridge_type'], dtype=object)[keep],
+            'route_num': route_codes[keep]
+        }).drop_duplicates()
+        self.state_routes = {}
+        for route, b_type in [('route_type', 'bridge_type'), ('route_type', None), (None, 'bridge_type'), (None, None)]:
+            cols = ['state_name'] + [col for col in (route, b_type) if col is not None]
+            for key, group in keys.groupby(cols)['route_num']:
+                key = key if isinstance(key, tuple) else (key,)
+                state = key[0]
+                route_value = key[1] if route is not None else 'All'
+                type_value = key[-1] if b_type is not None else 'All'
+                self.state_routes[(state, route_value, type_value)] = np.unique(group.to_numpy())
+        self.states = keys['state_name'].unique()
+
+    # sorted route number codes of the dropdown filters, merged over the selected states
+    def codes(self, state, route, b_type):
+        states = selected_states(state) or self.states
+        selected = np.zeros(len(self.routes), dtype=bool)
+        for s in states:
+            codes = self.state_routes.get((s, route, b_type))
+            if codes is not None:
+                selected[codes] = True
+        return np.flatnonzero(selected)
+
+    # dropdown options matching the search text, the current value is always kept
+    def options(self, state, route, b_type, search=None, value=None):
+        codes = self.codes(state, route, b_type)
+        if search:
+            codes = codes[np.char.find(self.search_text[codes], search.lower()) >= 0]
+        options = self.routes[codes[:OPTION_LIMIT]].tolist()
+        if value is not None and value != 'All' and value not in options:
+            options.append(value)
+        return options + ['All']
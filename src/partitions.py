@@ -0,0 +1,271 @@
+# Author: Austin Shih
+# Date: 18 Oct 2026
+
+"""State partitioned bridge data for the dashboard.
+src/clean.py writes every state of the processed snapshot to its own memory mapped snapshot
+(data/processed/states/nbi_<state fips>.feather), a national summary (a coarse county cube by state,
+route type and bridge type) and the route numbers of every state. The app starts from the summary
+alone: national views are answered by the coarse cube, or by a dataset scan of the partitions
+when a slider or highway number filter needs the bridges. Every state is loaded and indexed on
+first use and kept in a bounded LRU cache of states; a selection of several states is a view over
+the cached tables of its states, so overlapping selections share them. A selection of more states
+than the cache holds would evict its own states on every query, so it is answered like a national
+selection. Without partitions (or in client-side mode) the whole table is loaded as one table.
+"""
+
+import os
+import threading
+from concurrent.futures import Future
+import numpy as np
+import pandas as pd
+import pyarrow.dataset as ds
+
+from src.dataset import read_snapshot, load_bridges, to_arrow, SnapshotWriter
+from src.filters import FilterEngine, selected_states, filter_expression
+from src.cube import CountyCube, TABLE_COLUMNS, summarize_table
+from src.spatial import GridIndex
+from src.figures import ScatterFigure, join_points
+from src.lod import cluster_bridges
+from src.options import RouteOptions
+from src.cache import LRUCache
+
+# processed data locations
+PARTITION_DIR = 'data/processed/states'
+SUMMARY_PATH = 'data/processed/nbi_summary.feather'
+ROUTES_PATH = 'data/processed/nbi_routes.feather'
+
+# loaded states kept per process
+STATE_CACHE_SIZE = int(os.environ.get('BRIDGEMAP_STATE_CACHE', 8))
+
+# dropdown option columns, kept in the summary in their data order
+OPTION_COLS = ['state_name', 'route_type', 'bridge_type', 'bridge_material']
+
+# columns of the route number options
+ROUTE_COLS = ['state_name', 'route_type', 'bridge_type', 'route_num']
+
+
+# filter indexes, county cube, spatial index and scatter arrays of one bridge table (a state, or the
+# whole table without partitions)
+class BridgeTable:
+
+    def __init__(self, df):
+        self.df = df
+        self.engine = FilterEngine(df)
+        self.cube = CountyCube(df)
+        self.spatial = GridIndex(df['latitude'].to_numpy(), df['longitude'].to_numpy())
+        self.scatter = ScatterFigure(df)
+
+
+# bridges of the selected states over their loaded tables. Row positions run through the tables in
+# order, the rows of a table are offset by the rows of the tables before it; counties never cross
+# a state, so county summaries of the tables are joined as they are
+class BridgeView:
+
+    def __init__(self, tables):
+        self.tables = tables
+        self.offsets = np.cumsum([0] + [len(table.df) for table in tables])
+        self.scatter = tables[0].scatter
+
+    # county summary and bridge count from the county cubes, None when a cube can not answer
+    def summary(self, state, route, b_type, year, length, span, rating, hwy_num='All'):
+        parts = []
+        for table in self.tables:
+            part = table.cube.query(state, route, b_type, year, length, span, rating, hwy_num)
+            if part is None:
+                return None
+            parts.append(part)
+        return join_summaries(parts)
+
+    # sorted row positions matching all filters
+    def query(self, state, route, b_type, year, length, span, rating, hwy_num='All'):
+        return self.join_rows([table.engine.query(state, route, b_type, year, length, span, rating, hwy_num)
+                               for table in self.tables])
+
+    # county summary and bridge count of selected row positions
+    def summarize(self, rows):
+        return join_summaries([table.cube.summarize(part) for table, part in self.split(rows)])
+
+    # sorted row positions of the bridges near a (south, west, north, east) bounding box
+    def viewport(self, south, west, north, east):
+        return self.join_rows([table.spatial.query(south, west, north, east) for table in self.tables])
+
+    # grid clusters of the selected rows
+    def clusters(self, rows, zoom):
+        if len(self.tables) == 1:
+            return cluster_bridges(self.tables[0].df, rows, zoom)
+        cols = ['latitude', 'longitude', 'eval_rating', 'bridge_length']
+        df = pd.concat([table.df[cols].iloc[part] for table, part in self.split(rows)], ignore_index=True)
+        return cluster_bridges(df, np.arange(len(df)), zoom)
+
+    # figure of individual bridges at row positions
+    def points(self, rows, zoom, revision=None):
+        if len(self.tables) == 1:
+            return self.scatter.points(rows, zoom, revision)
+        arrays = join_points([table.scatter.point_arrays(part) for table, part in self.split(rows)])
+        return self.scatter.points_figure(arrays, zoom, revision)
+
+    # positions of every table offset into one sorted selection
+    def join_rows(self, parts):
+        if len(parts) == 1:
+            return parts[0]
+        return np.concatenate([part + offset for part, offset in zip(parts, self.offsets)])
+
+    # tables and their own row positions of a sorted selection
+    def split(self, rows):
+        rows = np.asarray(rows, dtype=np.intp)
+        bounds = np.searchsorted(rows, self.offsets)
+        return [(table, rows[bounds[i]:bounds[i + 1]] - self.offsets[i]) for i, table in enumerate(self.tables)]
+
+
+class BridgeData:
+
+    def __init__(self, partitioned=True, cache_size=STATE_CACHE_SIZE):
+        self.partitioned = partitioned and os.path.exists(SUMMARY_PATH)
+        self.tables = LRUCache(cache_size)
+        # futures of the states being loaded, a state is loaded once however many threads select it
+        self._loading = {}
+        self._lock = threading.Lock()
+
+        if self.partitioned:
+            # national summary, route options and the partition files, no bridge rows
+            self.summary, metadata = CountyCube.read(SUMMARY_PATH)
+            self.options = metadata['options']
+            self.state_fips = metadata['state_fips']
+            self.state_bounds = metadata['state_bounds']
+            self.route_options = RouteOptions(pd.read_feather(ROUTES_PATH))
+            self.dataset = ds.dataset([partition_path(code) for code in sorted(self.state_fips.values())],
+                                      format='feather')
+            self.national = None
+        else:
+            # local columnar snapshot, falls back to the processed csv url
+            df = load_bridges()
+            self.national = BridgeTable(df)
+            self.summary = self.national.cube
+            self.options = {col: df[col].unique().tolist() for col in OPTION_COLS}
+            self.route_options = RouteOptions(df)
+
+    # view of the selected states over their cached tables. The national view is the whole table,
+    # or None for partitioned data and for selections of more states than the cache holds, which are
+    # answered by the national summary or a scan of the partitions
+    def view(self, state):
+        if not self.partitioned:
+            return BridgeView([self.national])
+        states = sorted(s for s in selected_states(state) if s in self.state_fips)
+        if not states or len(states) > self.tables.maxsize:
+            return None
+        return BridgeView([self.table(s) for s in states])
+
+    # table of one state, loaded on first use. The lock only guards the cache lookup, a state is
+    # loaded outside of it and other threads selecting the same state wait for its future
+    def table(self, state):
+        with self._lock:
+            table = self.tables.get(state)
+            if table is not None:
+                return table
+            future = self._loading.get(state)
+            loading = future is None
+            if loading:
+                future = self._loading[state] = Future()
+        if not loading:
+            return future.result()
+
+        try:
+            table = BridgeTable(read_snapshot(partition_path(self.state_fips[state])))
+            self.tables.put(state, table)
+            future.set_result(table)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._loading[state]
+        return table
+
+    # states whose bridges reach into a (south, west, north, east) bounding box
+    def states_in(self, bounds):
+        south, west, north, east = bounds
+        return [s for s, (s_south, s_west, s_north, s_east) in self.state_bounds.items()
+                if s_south <= north and s_north >= south and s_west <= east and s_east >= west]
+
+    # county summary and bridge count of the national selection from the partitions
+    def scan_summary(self, state, route, b_type, year, length, span, rating, hwy_num='All'):
+        return summarize_table(self.dataset.to_table(
+            columns=TABLE_COLUMNS,
+            filter=filter_expression(state, route, b_type, year, length, span, rating, hwy_num)))
+
+    def stats(self):
+        return dict(self.tables.stats(), partitioned=self.partitioned)
+
+
+def partition_path(code, path=PARTITION_DIR):
+    return os.path.join(path, 'nbi_{:02d}.feather'.format(int(code)))
+
+# appends typed chunks of the processed bridges (in their row order) to the partitions of their
+# states, the chunks need the categories of the whole table. The dropdown options, state bounds and
+# route options are collected chunk by chunk and the national summary is merged from the county
+# cubes of the states when the writer is closed, so the whole table is never held in memory. The
+# partitions of the states in keep are up to date and left as they are, their rows only feed the
+# options and summary
+class PartitionWriter:
+
+    def __init__(self, path=PARTITION_DIR, summary_path=SUMMARY_PATH, routes_path=ROUTES_PATH, keep=()):
+        self.keep = {int(code) for code in keep}
+        kept = {os.path.basename(partition_path(code, path)) for code in self.keep}
+        os.makedirs(path, exist_ok=True)
+        for name in os.listdir(path):
+            if name not in kept:
+                os.remove(os.path.join(path, name))
+        self.path = path
+        self.summary_path = summary_path
+        self.routes_path = routes_path
+        self.writers, self.codes = {}, set()
+        self.options = {col: [] for col in OPTION_COLS}
+        self.states, self.south_west, self.north_east, self.routes = [], [], [], []
+
+    def write(self, df):
+        # rows of every state as slices of the chunk sorted by state
+        codes = df['state_fips'].to_numpy()
+        order = np.argsort(codes, kind='stable')
+        table = to_arrow(df).take(order)
+        codes, starts, counts = np.unique(codes[order], return_index=True, return_counts=True)
+        for code, start, count in zip(codes, starts, counts):
+            self.codes.add(int(code))
+            if code in self.keep:
+                continue
+            if code not in self.writers:
+                self.writers[code] = SnapshotWriter(partition_path(code, self.path))
+            self.writers[code].write(table.slice(start, count))
+
+        for col in OPTION_COLS:
+            self.options[col].append(np.asarray(df[col].unique(), dtype=object))
+        self.states.append(df[['state_name', 'state_fips']].drop_duplicates())
+        location = df.groupby('state_name', observed=True)[['latitude', 'longitude']]
+        self.south_west.append(location.min())
+        self.north_east.append(location.max())
+        self.routes.append(df[ROUTE_COLS].drop_duplicates())
+
+    def close(self):
+        for writer in self.writers.values():
+            writer.close()
+
+        states = pd.concat(self.states).drop_duplicates()
+        south_west = pd.concat(self.south_west).groupby(level=0, observed=True).min()
+        north_east = pd.concat(self.north_east).groupby(level=0, observed=True).max()
+        metadata = {
+            'options': {col: pd.unique(np.concatenate(values)).tolist() for col, values in self.options.items()},
+            'state_fips': dict(zip(states['state_name'].astype(str), states['state_fips'].astype(int))),
+            'state_bounds': {str(name): [float(south_west.at[name, 'latitude']), float(south_west.at[name, 'longitude']),
+                                         float(north_east.at[name, 'latitude']), float(north_east.at[name, 'longitude'])]
+                             for name in south_west.index}
+        }
+        cubes = (CountyCube(read_snapshot(partition_path(code, self.path))) for code in sorted(self.codes))
+        CountyCube.merge(cubes).write(self.summary_path, metadata)
+        pd.concat(self.routes).drop_duplicates().reset_index(drop=True).to_feather(self.routes_path,
+                                                                                   compression='uncompressed')
+
+# county summaries and bridge counts of several tables joined in fips order
+def join_summaries(parts):
+    if len(parts) == 1:
+        return parts[0]
+    df_sum = pd.concat([df_sum for df_sum, count in parts], ignore_index=True)
+    return df_sum.sort_values('fips', ignore_index=True), sum(count for df_sum, count in parts)
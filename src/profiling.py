@@ -0,0 +1,114 @@
+# Author: Austin Shih
+# Date: 18 Oct 2026
+
+"""Lists and summarizes the map callback profiles captured by the app (BRIDGEMAP_PROFILE_RATE)
+Usage: src/profiling.py [--dir=<dir>] [--top=<top>] [--show=<show>] [--lines=<lines>]
+Options:
+--dir=<dir>          Directory of the captured profiles, defaults to BRIDGEMAP_PROFILE_DIR
+--top=<top>          Number of slowest profiles to list [default: 10]
+--show=<show>        Profile to summarize, defaults to the slowest one
+--lines=<lines>      Functions printed in the summary, by cumulative time [default: 25]
+"""
+
+# python src/profiling.py --top=5
+# python src/profiling.py --show=/tmp/bridgemap_profiles/20261018-101500-123456_heatmap_412ms.prof
+
+# A sampled share of the map callbacks is run under cProfile. Every profile is written as a
+# .prof file (pstats / snakeviz) with a .json file holding the callback, its normalized inputs
+# and the wall time; only the newest BRIDGEMAP_PROFILE_KEEP profiles are kept. With the rate at 0
+# the callbacks are returned unwrapped.
+
+from datetime import datetime
+import cProfile
+import functools
+import tempfile
+import threading
+import pstats
+import random
+import time
+import json
+import glob
+import os
+
+# share of map callbacks profiled, 0 disables profiling and 1 profiles every callback
+PROFILE_RATE = float(os.environ.get('BRIDGEMAP_PROFILE_RATE', 0))
+PROFILE_DIR = os.environ.get('BRIDGEMAP_PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'bridgemap_profiles'))
+PROFILE_KEEP = int(os.environ.get('BRIDGEMAP_PROFILE_KEEP', 50))
+
+# one callback is profiled at a time, overlapping callbacks run unprofiled
+_lock = threading.Lock()
+
+# wrap fn so a sampled share of its calls is profiled, inputs(*args) gives the tag of a call
+def profiled(name, inputs, rate=PROFILE_RATE, out_dir=PROFILE_DIR, keep=PROFILE_KEEP):
+    def decorate(fn):
+        if rate <= 0:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args):
+            if random.random() >= rate or not _lock.acquire(blocking=False):
+                return fn(*args)
+            try:
+                profile = cProfile.Profile()
+                start = time.perf_counter()
+                try:
+                    return profile.runcall(fn, *args)
+                finally:
+                    wall = time.perf_counter() - start
+                    write_profile(profile, out_dir, keep, {
+                        'callback': name,
+                        'inputs': inputs(*args),
+                        'wall_ms': round(wall * 1000, 2),
+                        'date': datetime.now().isoformat(timespec='milliseconds')
+                    })
+            finally:
+                _lock.release()
+        return wrapper
+    return decorate
+
+# write the profile and its tags, then drop the oldest profiles above keep
+def write_profile(profile, out_dir, keep, tags):
+    os.makedirs(out_dir, exist_ok=True)
+    stem = os.path.join(out_dir, '{}_{}_{:.0f}ms'.format(
+        datetime.now().strftime('%Y%m%d-%H%M%S-%f'), tags['callback'], tags['wall_ms']))
+    profile.dump_stats(stem + '.prof')
+    with open(stem + '.json', 'w') as f:
+        json.dump(tags, f, default=str)
+
+    paths = sorted(glob.glob(os.path.join(out_dir, '*.prof')))
+    for path in paths[:max(len(paths) - keep, 0)]:
+        for old in (path, path[:-len('.prof')] + '.json'):
+            try:
+                os.remove(old)
+            except FileNotFoundError:
+                pass
+
+# tags of the captured profiles, slowest first
+def list_profiles(out_dir):
+    profiles = []
+    for path in glob.glob(os.path.join(out_dir, '*.json')):
+        prof = path[:-len('.json')] + '.prof'
+        if os.path.exists(prof):
+            with open(path) as f:
+                profiles.append(dict(json.load(f), path=prof))
+    return sorted(profiles, key=lambda p: p['wall_ms'], reverse=True)
+
+def main(out_dir, top, show, lines):
+    profiles = list_profiles(out_dir)
+    if not profiles and show is None:
+        print('no profiles in {}'.format(out_dir))
+        return
+
+    print('{:>10} {:<8} {:<24} {}'.format('wall ms', 'callback', 'date', 'inputs'))
+    for p in profiles[:top]:
+        print('{:>10.2f} {:<8} {:<24} {}'.format(p['wall_ms'], p['callback'], p['date'], p['inputs']))
+
+    path = show or profiles[0]['path']
+    print('\n{}'.format(path))
+    pstats.Stats(path).strip_dirs().sort_stats('cumulative').print_stats(lines)
+
+# docopt is only needed on the command line, the app imports this module
+if __name__ == "__main__":
+    from docopt import docopt
+    opt = docopt(__doc__)
+    main(opt['--dir'] or PROFILE_DIR, int(opt['--top']), opt['--show'], int(opt['--lines']))
@@ -0,0 +1,96 @@
+# Author: Austin Shih
+# Date: 18 Oct 2026
+
+"""Compact serialization of the numeric figure arrays returned by the map callbacks.
+Dash encodes callback responses with plotly.io.json, which uses orjson when it is installed and
+writes numpy arrays natively. Trace arrays are narrowed to the smallest dtype that keeps the
+plotted precision, and when the plotly.js bundled with dash supports typed arrays (v2.28+) they
+are sent as base64 binary instead of number lists.
+"""
+
+import base64
+import os
+import re
+import numpy as np
+import plotly.io as pio
+
+# json engine used by plotly.io (and dash) to encode responses: auto, orjson or json
+JSON_ENGINE = os.environ.get('BRIDGEMAP_JSON_ENGINE', 'auto')
+
+# base64 typed arrays: auto (when plotly.js supports them), 1 or 0
+TYPED_ARRAYS = os.environ.get('BRIDGEMAP_TYPED_ARRAYS', 'auto')
+
+# plotly.js version that added typed array (bdata) support
+TYPED_ARRAY_PLOTLYJS = (2, 28)
+
+# trace array paths and the dtype they are narrowed to
+ARRAY_DTYPES = {
+    ('lat',): np.float32,
+    ('lon',): np.float32,
+    ('marker', 'size'): np.float32,
+    ('marker', 'color'): None
+}
+
+# integer dtypes tried when narrowing, smallest first
+INTEGER_DTYPES = [np.int8, np.uint8, np.int16, np.uint16, np.int32, np.uint32]
+
+# typed array dtypes understood by plotly.js
+TYPED_ARRAY_NAMES = {'f4', 'f8', 'i1', 'u1', 'i2', 'u2', 'i4', 'u4'}
+
+
+# set the plotly.io json engine, orjson when available
+def configure_json(engine=JSON_ENGINE):
+    pio.json.config.default_engine = engine
+
+# version of the plotly.js bundled with dash core components, None if unknown
+def plotlyjs_version():
+    try:
+        from dash import dcc
+        path = os.path.join(os.path.dirname(dcc.__file__), 'plotly.min.js')
+        with open(path) as f:
+            header = f.read(200)
+        match = re.search(r'plotly\.js v(\d+)\.(\d+)', header)
+        return (int(match.group(1)), int(match.group(2))) if match else None
+    except (ImportError, OSError):
+        return None
+
+# whether trace arrays are sent as base64 typed arrays
+def typed_arrays_enabled(setting=TYPED_ARRAYS):
+    if setting == 'auto':
+        version = plotlyjs_version()
+        return version is not None and version >= TYPED_ARRAY_PLOTLYJS
+    return setting == '1'
+
+USE_TYPED_ARRAYS = typed_arrays_enabled()
+
+# narrow numeric trace arrays in place, optionally as base64 typed arrays
+def compact_figure(fig, typed=None):
+    typed = USE_TYPED_ARRAYS if typed is None else typed
+    for trace in fig['data']:
+        for path, dtype in ARRAY_DTYPES.items():
+            parent = trace
+            for key in path[:-1]:
+                parent = parent.get(key) if isinstance(parent, dict) else None
+            if not isinstance(parent, dict) or not isinstance(parent.get(path[-1]), np.ndarray):
+                continue
+            values = narrow(parent[path[-1]], dtype)
+            parent[path[-1]] = typed_array(values) if typed else values
+    return fig
+
+# smallest dtype keeping the values (the given float dtype, smallest integer type for integers)
+def narrow(values, dtype=None):
+    if values.dtype.kind == 'f' and dtype is not None:
+        return values.astype(dtype)
+    if values.dtype.kind in 'iu' and len(values):
+        low, high = values.min(), values.max()
+        for candidate in INTEGER_DTYPES:
+            if np.iinfo(candidate).min <= low and high <= np.iinfo(candidate).max:
+                return values.astype(candidate, copy=False)
+    return values
+
+# plotly.js typed array spec {'dtype', 'bdata'}
+def typed_array(values):
+    name = values.dtype.str.lstrip('<|=')
+    if name not in TYPED_ARRAY_NAMES:
+        return values
+    return {'dtype': name, 'bdata': base64.b64encode(np.ascontiguousarray(values).tobytes()).decode('ascii')}
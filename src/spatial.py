@@ -0,0 +1,78 @@
+# Author: Austin Shih
+# Date: 18 Oct 2026
+
+"""Grid spatial index over bridge locations and helpers to read the visible map extent
+from the scatterplot relayoutData.
+"""
+
+import numpy as np
+
+# grid cell size of the spatial index (degrees)
+INDEX_CELL = 0.5
+
+# share of the visible extent added on every side of the viewport
+VIEW_MARGIN = 0.25
+
+
+class GridIndex:
+
+    def __init__(self, lat, lon, cell=INDEX_CELL):
+        self.cell = cell
+        self.n_cols = int(360 / cell) + 1
+        self.n_rows = int(180 / cell) + 1
+
+        # rows sorted by grid cell, a cell's bridges are one slice of self.rows
+        keys = self.cell_row(np.asarray(lat)) * self.n_cols + self.cell_col(np.asarray(lon))
+        self.rows = np.argsort(keys, kind='stable')
+        self.keys = keys[self.rows]
+
+    def cell_row(self, lat):
+        return np.clip(np.floor((lat + 90) / self.cell).astype(np.int64), 0, self.n_rows - 1)
+
+    def cell_col(self, lon):
+        return np.clip(np.floor((lon + 180) / self.cell).astype(np.int64), 0, self.n_cols - 1)
+
+    # sorted row positions of the bridges in the cells covering a bounding box
+    def query(self, south, west, north, east):
+        first_row, last_row = self.cell_row(np.array([south, north]))
+        first_col, last_col = self.cell_col(np.array([west, east]))
+        grid_rows = np.arange(first_row, last_row + 1) * self.n_cols
+        starts = np.searchsorted(self.keys, grid_rows + first_col, side='left')
+        stops = np.searchsorted(self.keys, grid_rows + last_col, side='right')
+        rows = np.concatenate([self.rows[a:b] for a, b in zip(starts, stops)] or [self.rows[:0]])
+        return np.sort(rows)
+
+
+# visible extent {'south', 'west', 'north', 'east', 'zoom'} from mapbox relayoutData, None if absent
+def parse_viewport(relayout):
+    if not relayout:
+        return None
+    zoom = relayout.get('mapbox.zoom')
+    derived = relayout.get('mapbox._derived')
+    if derived and 'coordinates' in derived:
+        lons, lats = zip(*derived['coordinates'])
+        view = {'south': min(lats), 'west': min(lons), 'north': max(lats), 'east': max(lons)}
+    elif 'mapbox.center' in relayout and zoom is not None:
+        # approximate extent of a 1000 x 700 pixel map with 512 pixel tiles
+        center = relayout['mapbox.center']
+        half_width = 360 / 2 ** zoom * 1000 / 512 / 2
+        half_height = 360 / 2 ** zoom * 700 / 512 / 2
+        view = {'south': center['lat'] - half_height, 'west': center['lon'] - half_width,
+                'north': center['lat'] + half_height, 'east': center['lon'] + half_width}
+    else:
+        return None
+    if zoom is None:
+        zoom = np.log2(360 / max(view['east'] - view['west'], 1e-6))
+    view['zoom'] = zoom
+    return view
+
+# viewport grown by VIEW_MARGIN on every side
+def with_margin(view, margin=VIEW_MARGIN):
+    lat_pad = (view['north'] - view['south']) * margin
+    lon_pad = (view['east'] - view['west']) * margin
+    return (view['south'] - lat_pad, view['west'] - lon_pad, view['north'] + lat_pad, view['east'] + lon_pad)
+
+# mask of the points inside a (south, west, north, east) bounding box
+def in_bounds(lat, lon, bounds):
+    south, west, north, east = bounds
+    return (lat >= south) & (lat <= north) & (lon >= west) & (lon <= east)